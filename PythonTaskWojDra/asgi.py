@@ -11,6 +11,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'PythonTaskWojDra.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'PythonTaskWojDra.settings_asgi')
 
 application = get_asgi_application()
+
+# Load (or generate) the API schema at startup, instead of on the first request
+from PythonTaskWojDra.schema import get_schema_document  # noqa: E402
+
+get_schema_document("json")
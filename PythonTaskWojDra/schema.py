@@ -0,0 +1,166 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import drf_yasg
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.renderers import SwaggerYAMLRenderer
+from drf_yasg.views import get_schema_view, SPEC_RENDERERS
+from rest_framework import permissions
+from rest_framework.response import Response
+
+from apps.images.conditional import conditional_response
+
+api_info = openapi.Info(
+    title="Python Task API",
+    default_version='v1',
+    description="""
+    An API to upload, store, resize and retrieve image files.
+
+    **Documentation links:**
+    - [This site](/swagger)
+    - [JSON export of this specification](/swagger.json)
+    - [YAML export of this specification](/swagger.yaml)
+    - [ReDoc version of this specification](/redoc)
+    """,
+)
+
+schema_view = get_schema_view(
+    api_info,
+    public=True,
+    permission_classes=[permissions.AllowAny],
+)
+
+SCHEMA_FILES = {"json": "swagger.json", "yaml": "swagger.yaml"}
+FINGERPRINT_FILE = "swagger.fingerprint"
+# Folders (relative to BASE_DIR) with the code the schema is generated from
+SOURCE_DIRS = ("apps", "PythonTaskWojDra")
+
+_schema: Optional[openapi.Swagger] = None
+_documents: Dict[str, Tuple[bytes, str]] = {}
+_fingerprint: Optional[str] = None
+_lock = threading.Lock()
+
+
+def get_source_fingerprint() -> str:
+    """
+    Function for getting a fingerprint of the code the schema is generated from.
+    It changes whenever any Python file of the project, or the version of drf-yasg, changes.
+
+    :return: Hex digest of the code
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(drf_yasg.__version__.encode())
+        digest.update(settings.SCHEMA_URL.encode())
+        for directory in SOURCE_DIRS:
+            for root, dirs, files in os.walk(os.path.join(settings.BASE_DIR, directory)):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(".py"):
+                        path = os.path.join(root, name)
+                        digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+                        with open(path, "rb") as file:
+                            digest.update(file.read())
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+
+def generate_schema() -> openapi.Swagger:
+    """
+    Function for generating the schema of the API.
+    It is generated without a request, so its "host" and "schemes" are set only if SCHEMA_URL is set
+    (otherwise, the host serving the documentation is used by its clients).
+
+    :return: Schema of the API
+    """
+    generator = schema_view.generator_class(api_info, url=settings.SCHEMA_URL or None)
+    return generator.get_schema(request=None, public=True)
+
+
+def encode_schema(schema: openapi.Swagger, fmt: str, pretty: bool = False) -> bytes:
+    """
+    Function for encoding the schema of the API.
+
+    :param schema: Schema of the API
+    :param fmt: Format of the document ("json" or "yaml")
+    :param pretty: Whether JSON should be indented
+    :return: Encoded document
+    """
+    if fmt == "yaml":
+        return OpenAPICodecYaml(validators=[]).encode(schema)
+    return OpenAPICodecJson(validators=[], pretty=pretty).encode(schema)
+
+
+def load_schema_file(fmt: str) -> Optional[bytes]:
+    """
+    Function for loading a schema document written by "write_schema" command.
+    Documents written from a different code than the current one are ignored.
+
+    :param fmt: Format of the document ("json" or "yaml")
+    :return: Content of the document, or None if it is missing or outdated
+    """
+    directory = settings.SCHEMA_DIR
+    if not directory:
+        return None
+    try:
+        with open(os.path.join(directory, FINGERPRINT_FILE)) as file:
+            if file.read().strip() != get_source_fingerprint():
+                return None
+        with open(os.path.join(directory, SCHEMA_FILES[fmt]), "rb") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def get_schema_document(fmt: str) -> Tuple[bytes, str]:
+    """
+    Function for getting a schema document, kept in memory of the process.
+    It is loaded from SCHEMA_DIR if it is up-to-date there, or generated once otherwise.
+
+    :param fmt: Format of the document ("json" or "yaml")
+    :return: Tuple of content and ETag of the document
+    """
+    global _schema
+    with _lock:
+        if fmt not in _documents:
+            content = load_schema_file(fmt)
+            if content is None:
+                if _schema is None:
+                    _schema = generate_schema()
+                content = encode_schema(_schema, fmt)
+            _documents[fmt] = content, quote_etag(hashlib.sha256(content).hexdigest()[:32])
+        return _documents[fmt]
+
+
+def get_ui_schema() -> openapi.Swagger:
+    """
+    Function for getting a schema passed to web UI pages. They only show its title and version,
+    and load the full schema with a separate request, so it has no paths and is not generated.
+
+    :return: Schema of the API without paths
+    """
+    return openapi.Swagger(info=api_info, _prefix="/", paths=openapi.Paths(paths={}))
+
+
+class PrecomputedSchemaView(schema_view):
+    """
+    Schema view serving schema documents from memory (see get_schema_document), instead of
+    generating them on every request. Web UI pages (which load the schema with a separate request)
+    are rendered without generating the schema (see get_ui_schema).
+    """
+
+    def get(self, request, version='', format=None):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, SPEC_RENDERERS):
+            return Response(get_ui_schema())
+        content, etag = get_schema_document("yaml" if isinstance(renderer, SwaggerYAMLRenderer) else "json")
+        return conditional_response(
+            request, etag, None,
+            lambda: HttpResponse(content, content_type=f"{renderer.media_type}; charset=utf-8")
+        )
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 from dotenv import load_dotenv
+import json
 import os
 
 load_dotenv()
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.db.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,14 +80,29 @@ WSGI_APPLICATION = 'PythonTaskWojDra.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+# Connections are kept open for DB_CONN_MAX_AGE seconds ("none" - without a limit, 0 - closed after every request),
+# and checked before being reused by a new request, if DB_CONN_HEALTH_CHECKS is true.
+# If DB_POOL_SIZE is set, connections are taken from a pool shared by all threads of the process (see apps.db.pool),
+# holding at most DB_POOL_SIZE connections, and requests wait for a free one at most DB_POOL_TIMEOUT seconds.
+# Connections are returned to the pool when they are closed, so with the pool DB_CONN_MAX_AGE is ignored, and they
+# are closed (returned) after every request.
+
+DB_CONN_MAX_AGE = os.getenv("DB_CONN_MAX_AGE", "60")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'apps.db.postgresql' if DB_POOL_SIZE else 'django.db.backends.postgresql',
         'OPTIONS': {
             'service': 'task_service',
             'passfile': '.pgpass'
         },
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else None if DB_CONN_MAX_AGE.lower() == "none" else int(DB_CONN_MAX_AGE),
+        'CONN_HEALTH_CHECKS': os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() == "true",
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        },
     },
     'test': {
         "ENGINE": "django.db.backends.sqlite3",
@@ -93,6 +110,24 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, given as comma-separated connection services (like "task_service"),
+# e.g. DB_REPLICA_SERVICES="task_replica_1,task_replica_2". Reads of requests go to a random replica, and writes
+# to the default database (see apps.db.routers). Clients which wrote to the database keep reading from the default one
+# for DB_REPLICA_PIN_SECONDS, which should exceed the replication lag.
+
+DB_REPLICAS = []
+for _index, _service in enumerate(filter(None, os.getenv("DB_REPLICA_SERVICES", "").split(",")), 1):
+    DATABASES[f"replica_{_index}"] = {
+        **DATABASES["default"],
+        'OPTIONS': {**DATABASES["default"]["OPTIONS"], 'service': _service.strip()},
+        # Tests use the default database in place of replicas
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS.append(f"replica_{_index}")
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+
+DATABASE_ROUTERS = ['apps.db.routers.ReplicaRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -135,3 +170,142 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema'}
+
+# Images app
+# Default and maximum amount of image objects returned by a single page of
+# the cursor-paginated image list (used when "limit" or "cursor" is provided)
+
+IMAGES_PAGE_SIZE = int(os.getenv("IMAGES_PAGE_SIZE", "100"))
+IMAGES_MAX_PAGE_SIZE = int(os.getenv("IMAGES_MAX_PAGE_SIZE", "1000"))
+
+# Amount of rows fetched and rendered at once by the streamed image list ("stream=true")
+
+IMAGES_STREAM_CHUNK_SIZE = int(os.getenv("IMAGES_STREAM_CHUNK_SIZE", "2000"))
+
+# Directory and maximum total size (in bytes) of cached image variants, created by the render endpoint.
+# Least recently used variants are removed, once the limit is exceeded (until 90% of the limit is used).
+
+IMAGES_VARIANT_CACHE_DIR = Path(os.getenv("IMAGES_VARIANT_CACHE_DIR", BASE_DIR / "cache" / "variants"))
+IMAGES_VARIANT_CACHE_MAX_BYTES = int(os.getenv("IMAGES_VARIANT_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+# Amount of worker threads processing asynchronous uploads ("async=true") in each process
+
+IMAGES_UPLOAD_WORKERS = int(os.getenv("IMAGES_UPLOAD_WORKERS", "2"))
+
+# Resizing strategy of uploaded images and variants, either "fidelity" or "speed".
+# "speed" decodes JPEG images at a reduced scale, and reduces large downscales by an integer
+# factor before resampling (IMAGES_RESIZE_REDUCING_GAP - the lower, the faster and less accurate).
+
+IMAGES_RESIZE_MODE = os.getenv("IMAGES_RESIZE_MODE", "fidelity")
+IMAGES_RESIZE_REDUCING_GAP = float(os.getenv("IMAGES_RESIZE_REDUCING_GAP", "2.0"))
+
+# Maximum amount of files in a single batch upload, and amount of processes
+# resizing them (all CPU cores, if not set). Their resizes also hold slots of IMAGES_RESIZE_CONCURRENCY
+
+IMAGES_BATCH_MAX_FILES = int(os.getenv("IMAGES_BATCH_MAX_FILES", "100"))
+IMAGES_BATCH_WORKERS = int(os.getenv("IMAGES_BATCH_WORKERS", "0")) or None
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", 'images'),
+    }
+}
+
+# Cache alias and timeout (in seconds) of serialized image objects and lists. Entries are keyed by ETags,
+# so each process may use its own (e.g. local memory) cache. Unpaginated lists longer than IMAGES_MAX_PAGE_SIZE
+# are not cached
+
+IMAGES_CACHE_ALIAS = os.getenv("IMAGES_CACHE_ALIAS", "default")
+IMAGES_CACHE_TIMEOUT = int(os.getenv("IMAGES_CACHE_TIMEOUT", "300"))
+
+# Handing off sending of media files to the front proxy: "x-accel-redirect" (nginx), "x-sendfile"
+# (Apache, lighttpd), or empty to send files from Django. With "x-accel-redirect", files are
+# redirected to IMAGES_MEDIA_ACCEL_PREFIX, which must be an internal location aliasing MEDIA_ROOT.
+
+IMAGES_MEDIA_ACCEL = os.getenv("IMAGES_MEDIA_ACCEL", "")
+IMAGES_MEDIA_ACCEL_PREFIX = os.getenv("IMAGES_MEDIA_ACCEL_PREFIX", "/protected-media/")
+
+# API schema
+# Base URL of the API (e.g. "https://example.com"), setting "host" and "schemes" of the schema.
+# If empty, they are omitted, so the host serving the documentation is used.
+# SCHEMA_DIR is a folder with documents written by "write_schema" command (empty to always generate them).
+
+SCHEMA_URL = os.getenv("SCHEMA_URL", "")
+SCHEMA_DIR = os.getenv("SCHEMA_DIR", str(BASE_DIR))
+
+# Storage of uploaded files. The default one stores image files under random names,
+# without checking if they are taken (see apps.images.storage.ImageStorage)
+
+DEFAULT_FILE_STORAGE = os.getenv("DEFAULT_FILE_STORAGE", "apps.images.storage.ImageStorage")
+
+# Upload handlers, which hash uploaded files while receiving them (used to find already stored images)
+
+FILE_UPLOAD_HANDLERS = [
+    "apps.images.uploads.HashingMemoryFileUploadHandler",
+    "apps.images.uploads.HashingTemporaryFileUploadHandler",
+]
+
+# Limits of uploaded images (0 disables a limit). Files larger than IMAGES_MAX_UPLOAD_SIZE bytes,
+# and images with more than IMAGES_MAX_PIXELS pixels (read from their headers) are rejected with 413,
+# before any of their pixels are decoded (data of too large files is dropped by the upload handlers while
+# receiving it). Requested sizes above IMAGES_MAX_OUTPUT_SIZE are rejected with 400.
+
+IMAGES_MAX_UPLOAD_SIZE = int(os.getenv("IMAGES_MAX_UPLOAD_SIZE", str(50 * 1024 ** 2)))
+IMAGES_MAX_PIXELS = int(os.getenv("IMAGES_MAX_PIXELS", "50000000"))
+IMAGES_MAX_OUTPUT_SIZE = int(os.getenv("IMAGES_MAX_OUTPUT_SIZE", "8192"))
+
+# Admission control of resizing (see apps.images.admission). At most IMAGES_RESIZE_CONCURRENCY images
+# (all CPU cores by default, 0 disables the limit) are decoded, scaled and encoded at once. Requests wait
+# for a free slot at most IMAGES_RESIZE_QUEUE_TIMEOUT seconds, and are then rejected with 503 and
+# "Retry-After: IMAGES_RESIZE_RETRY_AFTER". If IMAGES_RESIZE_LOCK_DIR is set, the limit is shared
+# by all processes using the same folder (through file locks), instead of applying to each process.
+
+IMAGES_RESIZE_CONCURRENCY = int(os.getenv("IMAGES_RESIZE_CONCURRENCY", str(os.cpu_count() or 1)))
+IMAGES_RESIZE_QUEUE_TIMEOUT = float(os.getenv("IMAGES_RESIZE_QUEUE_TIMEOUT", "0.5"))
+IMAGES_RESIZE_RETRY_AFTER = int(os.getenv("IMAGES_RESIZE_RETRY_AFTER", "1"))
+IMAGES_RESIZE_LOCK_DIR = os.getenv("IMAGES_RESIZE_LOCK_DIR", "")
+
+# Encoder profiles of output formats (Pillow's format names). "resample" is the filter used to scale images
+# saved in the format (nearest, box, bilinear, hamming, bicubic or lanczos), other options are passed to
+# Pillow's encoder (e.g. JPEG "quality", "optimize", "progressive", PNG "compress_level", WebP "quality", "method",
+# AVIF "quality", "speed").
+# IMAGES_ENCODER_PROFILES environmental variable can contain a JSON object with options overriding these, per format,
+# e.g. {"JPEG": {"quality": 85}, "WEBP": {"method": 6}}.
+
+IMAGES_ENCODER_PROFILES = {
+    "JPEG": {"resample": "bicubic", "quality": 75, "optimize": True, "progressive": True},
+    "PNG": {"resample": "bicubic", "compress_level": 6},
+    "WEBP": {"resample": "bicubic", "quality": 80, "method": 4},
+    "GIF": {"resample": "bicubic"},
+    "BMP": {"resample": "bicubic"},
+    "TIFF": {"resample": "bicubic"},
+    # Only used for files re-encoded for clients accepting it (see IMAGES_NEGOTIATED_FORMATS)
+    "AVIF": {"quality": 60, "speed": 8},
+}
+for _img_format, _options in json.loads(os.getenv("IMAGES_ENCODER_PROFILES", "{}")).items():
+    IMAGES_ENCODER_PROFILES.setdefault(_img_format.upper(), {}).update(_options)
+
+# Widths of renditions (smaller copies of uploaded images, keeping their aspect ratio), created
+# together with every image object, out of a single decode. Widths not smaller than the image's one are skipped.
+
+IMAGES_RENDITION_WIDTHS = [
+    int(width) for width in os.getenv("IMAGES_RENDITION_WIDTHS", "320,640,1280").split(",") if width
+]
+
+# Formats (file extensions, in the order of preference), which stored JPEG and PNG files are re-encoded into,
+# when clients accept them (e.g. "avif,webp"). Re-encoded files are kept next to the stored ones. Empty disables it.
+
+IMAGES_NEGOTIATED_FORMATS = [
+    extension.strip().lower() for extension in os.getenv("IMAGES_NEGOTIATED_FORMATS", "avif,webp").split(",")
+    if extension.strip()
+]
+
+# Serving reads of image objects (list and single object endpoints) with async views, which use the async ORM.
+# It should only be enabled under an ASGI server (see settings_asgi), since WSGI servers run every async view
+# inside a new event loop.
+
+IMAGES_ASYNC_VIEWS = os.getenv("IMAGES_ASYNC_VIEWS", "False").lower() == "true"
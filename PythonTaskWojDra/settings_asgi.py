@@ -0,0 +1,8 @@
+"""
+Settings of ASGI deployments (see asgi.py), e.g. served by uvicorn:
+
+    uvicorn PythonTaskWojDra.asgi:application --workers 4
+"""
+from .settings import *
+
+IMAGES_ASYNC_VIEWS = True
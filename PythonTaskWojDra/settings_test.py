@@ -4,5 +4,11 @@ DATABASES = {
     'default': {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    # Stand-in of a read replica, only used by tests enabling it in DB_REPLICAS
+    'replica': {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db_replica.sqlite3",
+    },
 }
+DB_REPLICAS = []
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'PythonTaskWojDra.settings')
 
 application = get_wsgi_application()
+
+# Load (or generate) the API schema at startup, instead of on the first request
+from PythonTaskWojDra.schema import get_schema_document  # noqa: E402
+
+get_schema_document("json")
@@ -0,0 +1,52 @@
+from typing import Awaitable, Callable, Union
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponseBase
+
+from apps.db.routers import request_routing
+
+# Cookie of clients, whose reads go to the primary database, as replicas may not have received their writes yet
+PIN_COOKIE = "db_pin"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaPinningMiddleware:
+    """
+    Middleware setting up the routing of every request (see apps.db.routers.ReplicaRouter). Requests with unsafe
+    methods, and ones of clients having the pin cookie, read from the primary database. If a request wrote
+    to the database, its client gets the pin cookie for DB_REPLICA_PIN_SECONDS, so it keeps reading its own writes,
+    until replicas receive them. It handles both sync and async requests, so async views are not run in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Union[HttpResponseBase, Awaitable[HttpResponseBase]]]):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Union[HttpResponseBase, Awaitable[HttpResponseBase]]:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_routing(self.is_pinned(request)) as routing:
+            response = self.get_response(request)
+        return self.process_response(response, routing.wrote)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponseBase:
+        with request_routing(self.is_pinned(request)) as routing:
+            response = await self.get_response(request)
+        return self.process_response(response, routing.wrote)
+
+    @staticmethod
+    def is_pinned(request: HttpRequest) -> bool:
+        return request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    @staticmethod
+    def process_response(response: HttpResponseBase, wrote: bool) -> HttpResponseBase:
+        if wrote and settings.DB_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.DB_REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
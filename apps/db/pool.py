@@ -0,0 +1,267 @@
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
+from django.db.utils import OperationalError
+
+# Defaults of "POOL" options of a database (see PooledDatabaseWrapperMixin)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_POOL_TIMEOUT = 5.0
+
+# Pools of the process, with keys of their connection parameters, by database alias
+_pools: Dict[str, Tuple[str, "ConnectionPool"]] = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """
+    Exception raised when no connection of the pool becomes free in time.
+    """
+
+
+class ConnectionPool:
+    """
+    Pool of raw database connections (DB-API connections, not Django's wrappers), shared by all threads
+    and async contexts of the process. At most "size" connections are open at once, and checkouts wait
+    for a free one at most "timeout" seconds. Idle connections are reused from the most recently returned one,
+    so the ones not needed under lower load stay idle, instead of being checked out in turns.
+    """
+
+    def __init__(self, size: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        self.idle = deque()
+        # Idle and checked out connections (or ones being opened)
+        self.opened = 0
+        self.condition = threading.Condition()
+        self.counters = dict(checkouts=0, waits=0, timeouts=0, created=0, discarded=0)
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.closed = False
+
+    def checkout(self, connect: Callable[[], Any], is_usable: Callable[[Any], bool]) -> Any:
+        """
+        Method for taking a connection out of the pool. An idle connection is reused, if is_usable accepts it
+        (otherwise it's closed and replaced), and a new one is opened, if none is idle and the pool is not full.
+        Functions are passed by every checkout, so the pool does not keep the objects they belong to alive.
+
+        :param connect: Function opening a new connection
+        :param is_usable: Function checking if an idle connection still works
+        :return: Raw database connection
+        """
+        start = time.perf_counter()
+        with self.condition:
+            if not self.idle and self.opened >= self.size:
+                self.counters["waits"] += 1
+            while not self.idle and self.opened >= self.size:
+                remaining = start + self.timeout - time.perf_counter()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection became free within {self.timeout} s (pool size: {self.size})"
+                    )
+                self.condition.wait(remaining)
+            waited = time.perf_counter() - start
+            self.counters["checkouts"] += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+            if self.idle:
+                connection = self.idle.pop()
+            else:
+                connection = None
+                self.opened += 1
+
+        if connection is not None:
+            if is_usable(connection):
+                return connection
+            # Its slot is taken over by the new connection
+            self._close_quietly(connection)
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                self.opened -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.counters["created"] += 1
+        return connection
+
+    def release(self, connection: Any) -> None:
+        """
+        Method for returning a checked out connection to the pool.
+
+        :param connection: Raw database connection
+        """
+        with self.condition:
+            if not self.closed:
+                self.idle.append(connection)
+                self.condition.notify()
+                return
+        self.discard(connection)
+
+    def discard(self, connection: Any) -> None:
+        """
+        Method for closing a checked out connection, which must not be reused, and freeing its slot.
+
+        :param connection: Raw database connection
+        """
+        self._close_quietly(connection)
+        with self.condition:
+            self.opened -= 1
+            self.condition.notify()
+
+    def close(self) -> None:
+        """
+        Method for closing all idle connections. Connections returned afterwards are closed as well.
+        """
+        with self.condition:
+            self.closed = True
+            idle = list(self.idle)
+            self.idle.clear()
+            self.opened -= len(idle)
+            self.condition.notify_all()
+        for connection in idle:
+            connection.close()
+
+    def _close_quietly(self, connection: Any) -> None:
+        with self.condition:
+            self.counters["discarded"] += 1
+        try:
+            connection.close()
+        except Exception:
+            # Broken connections may fail to close, but they are dropped anyway
+            pass
+
+    def get_stats(self) -> dict:
+        """
+        Method for getting the state and counters of the pool.
+
+        :return: Dict with the pool's size, amounts of open, idle and checked out connections, counters of
+            checkouts, checkouts which had to wait, timed out checkouts, created and discarded connections,
+            and average and maximum time (in ms) of waiting for a connection
+        """
+        with self.condition:
+            return {
+                "size": self.size,
+                "open": self.opened,
+                "idle": len(self.idle),
+                "in_use": self.opened - len(self.idle),
+                **self.counters,
+                "avg_wait_ms": round(self.wait_time / max(self.counters["checkouts"], 1) * 1000, 3),
+                "max_wait_ms": round(self.max_wait_time * 1000, 3),
+            }
+
+
+def get_pool(alias: str, conn_params: dict, create: Callable[[], ConnectionPool]) -> ConnectionPool:
+    """
+    Function for getting the pool of a database, creating it on first use. If connection parameters change
+    (e.g. when tests switch to a test database), the pool is replaced, so connections to different databases never mix.
+
+    :param alias: Database alias
+    :param conn_params: Parameters passed to the database driver
+    :param create: Function creating the pool
+    :return: Connection pool
+    """
+    params_key = repr(sorted(conn_params.items()))
+    with _pools_lock:
+        previous = _pools.get(alias)
+        if previous and previous[0] == params_key:
+            return previous[1]
+        pool = create()
+        _pools[alias] = (params_key, pool)
+    if previous:
+        # Connections still checked out are closed, once they are returned
+        previous[1].close()
+    return pool
+
+
+def get_pool_stats() -> Dict[str, dict]:
+    """
+    Function for getting the state and counters of all connection pools of the process.
+
+    :return: Dict of pools' stats (see ConnectionPool.get_stats), by database alias
+    """
+    with _pools_lock:
+        pools = {alias: pool for alias, (_, pool) in _pools.items()}
+    return {alias: pool.get_stats() for alias, pool in pools.items()}
+
+
+def close_pools() -> None:
+    """
+    Function for closing idle connections of all pools, and forgetting the pools.
+    """
+    with _pools_lock:
+        pools = [pool for _, pool in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin of Django's DatabaseWrapper classes, which takes connections from a ConnectionPool instead of opening them,
+    and returns them to it instead of closing them. Options of the pool are set in "POOL" key of the database's
+    settings: "SIZE" (maximum amount of open connections) and "TIMEOUT" (in seconds).
+    If CONN_HEALTH_CHECKS is enabled, idle connections are checked with a query before being reused.
+    Wrappers belong to threads (or async contexts), which may end without closing them, so CONN_MAX_AGE must be 0
+    (connections are returned after every request), and connections of wrappers dropped while still holding them
+    are discarded, so that their slots are freed.
+    """
+
+    def __init__(self, settings_dict: dict, *args, **kwargs):
+        if settings_dict.get("CONN_MAX_AGE", 0) != 0:
+            raise ImproperlyConfigured("CONN_MAX_AGE of a database using a connection pool must be 0")
+        super().__init__(settings_dict, *args, **kwargs)
+        self._pool_finalizer: Optional[weakref.finalize] = None
+
+    def get_pool(self, conn_params: dict) -> ConnectionPool:
+        options = self.settings_dict.get("POOL") or {}
+        return get_pool(self.alias, conn_params, lambda: ConnectionPool(
+            int(options.get("SIZE", DEFAULT_POOL_SIZE)),
+            float(options.get("TIMEOUT", DEFAULT_POOL_TIMEOUT)),
+        ))
+
+    def is_connection_usable(self, connection: Any) -> bool:
+        if not self.settings_dict["CONN_HEALTH_CHECKS"]:
+            return True
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            # Ends the transaction started by the query, if autocommit is off
+            connection.rollback()
+        except self.Database.Error:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params: dict) -> Any:
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.checkout(
+            lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params), self.is_connection_usable
+        )
+        self._pool_finalizer = weakref.finalize(self, self.pool.discard, connection)
+        return connection
+
+    def _close(self) -> None:
+        if self.connection is None:
+            return
+        if self._pool_finalizer is not None:
+            self._pool_finalizer.detach()
+            self._pool_finalizer = None
+        if self.in_atomic_block:
+            # The wrapper keeps using its connection until the atomic block ends, so it can't be shared
+            self.pool.discard(self.connection)
+            return
+        try:
+            with self.wrap_database_errors:
+                # Leftovers of a transaction must not leak into the next checkout
+                self.connection.rollback()
+        except DatabaseError:
+            self.pool.discard(self.connection)
+        else:
+            self.pool.release(self.connection)
@@ -0,0 +1,17 @@
+from typing import Any
+
+from django.db.backends.postgresql import base
+
+from apps.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    PostgreSQL database backend using a pool of connections (see PooledDatabaseWrapperMixin).
+    """
+
+    def get_new_connection(self, conn_params: dict) -> Any:
+        connection = super().get_new_connection(conn_params)
+        # Set by Django's backend only when it opens a connection, not when it's reused
+        self.isolation_level = self.settings_dict["OPTIONS"].get("isolation_level", connection.isolation_level)
+        return connection
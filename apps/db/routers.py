@@ -0,0 +1,101 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Type
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Model
+
+# Routing of the current request (None outside requests, e.g. in management commands and background workers)
+_routing: ContextVar[Optional["Routing"]] = ContextVar("db_routing", default=None)
+
+
+class Routing:
+    """
+    Routing state of a request. It's mutable, so that writes made in threads running the request's code
+    (which get copies of its context) are seen by the request itself.
+    """
+
+    def __init__(self, pinned: bool):
+        # If pinned, reads go to the primary database
+        self.pinned = pinned
+        self.wrote = False
+        self.replica: Optional[str] = None
+
+    def get_replica(self) -> str:
+        # All reads of a request go to the same replica, so e.g. validators and the data they describe agree
+        if self.replica not in settings.DB_REPLICAS:
+            self.replica = random.choice(settings.DB_REPLICAS)
+        return self.replica
+
+
+@contextmanager
+def request_routing(pinned: bool) -> Iterator[Routing]:
+    """
+    Context manager of the routing of a request. Within it, reads go to replicas (unless pinned),
+    and writes pin reads of the rest of the request to the primary database.
+
+    :param pinned: Whether reads should go to the primary database from the start
+    :return: Routing state, telling if the request wrote to the database
+    """
+    routing = Routing(pinned)
+    token = _routing.set(routing)
+    try:
+        yield routing
+    finally:
+        _routing.reset(token)
+
+
+def reads_from_replica() -> bool:
+    """
+    Function checking if reads of the current context go to a replica, which may lag behind the primary database.
+
+    :return: True, if reads go to a replica
+    """
+    routing = _routing.get()
+    return (
+        bool(settings.DB_REPLICAS) and routing is not None and not routing.pinned
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class ReplicaRouter:
+    """
+    Database router, which sends reads of each request to a random one of DB_REPLICAS,
+    and all writes to the primary ("default") database. Reads go to the primary database:
+    - outside requests (e.g. in background workers, which process objects right after they are created),
+    - inside transactions of the primary database,
+    - for the rest of a request, which wrote to the database,
+    - for clients pinned by ReplicaPinningMiddleware, after they wrote to the database.
+    Without replicas, routing is left to Django.
+    """
+
+    def db_for_read(self, model: Type[Model], **hints) -> Optional[str]:
+        if not settings.DB_REPLICAS:
+            return None
+        if reads_from_replica():
+            return _routing.get().get_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model: Type[Model], **hints) -> Optional[str]:
+        if not settings.DB_REPLICAS:
+            return None
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+            routing.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints) -> Optional[bool]:
+        # Replicas hold the same data as the primary database
+        databases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None, **hints) -> Optional[bool]:
+        # Replicas receive schema changes from the primary database
+        if db in settings.DB_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,9 @@
+from django.db.backends.sqlite3 import base
+
+from apps.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    SQLite database backend using a pool of connections (see PooledDatabaseWrapperMixin).
+    """
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from apps.db.views import DatabasePoolStatsView
+
+urlpatterns = [
+    path("stats", DatabasePoolStatsView.as_view(), name="db_pool_stats_view"),
+]
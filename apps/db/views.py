@@ -0,0 +1,31 @@
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.db.pool import get_pool_stats
+
+
+class DatabasePoolStatsView(APIView):
+    # Pool's state tells about the load of the server, so it's only shown to staff users
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Get database connection pool statistics",
+        responses={
+            200: openapi.Response('response description'),
+            403: openapi.Response('User is not a staff user'),
+        }
+    )
+    def get(self, request: Request) -> Response:
+        """
+        API Endpoint for retrieving the state and counters of database connection pools of the process
+        (only used if DB_POOL_SIZE is set, so the response is empty otherwise). Only available to staff users.
+
+        Response has the form: `{"<database alias>": {"size": <int>, "open": <int>, "idle": <int>, "in_use": <int>,
+        "checkouts": <int>, "waits": <int>, "timeouts": <int>, "created": <int>, "discarded": <int>,
+        "avg_wait_ms": <float>, "max_wait_ms": <float>}}`.
+        """
+        return Response(get_pool_stats())
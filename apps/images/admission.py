@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where slots are not shared between processes
+    fcntl = None
+
+# Slots are polled with growing delays, up to this one (in seconds), while waiting for another process
+MAX_POLL_DELAY = 0.05
+
+# How long the current context waits for a slot (None - indefinitely), overriding IMAGES_RESIZE_QUEUE_TIMEOUT
+_queue_timeout: ContextVar[Optional[float]] = ContextVar("resize_queue_timeout")
+
+
+class ResizeCapacityError(Exception):
+    """
+    Exception raised when no resize slot becomes free in time.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy processing other images, please retry later")
+        self.retry_after = retry_after
+
+
+class ResizeLimiter:
+    """
+    Limiter of the amount of images resized at once. Every resize holds a slot, while it runs.
+    Within a process, slots are counted by a semaphore. If a lock directory is provided,
+    slots are also shared by all processes using it: each slot is an exclusively locked file
+    ("slot-<n>.lock"), and locks are released by the system even if their process dies.
+    """
+
+    def __init__(self, concurrency: int, lock_dir: Optional[str] = None):
+        self.concurrency = concurrency
+        self.lock_dir = lock_dir if lock_dir and fcntl else None
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def acquire(self, timeout: Optional[float]) -> Tuple[bool, Optional[int]]:
+        """
+        Method for taking a free slot.
+
+        :param timeout: How long to wait for a slot, in seconds (None - indefinitely)
+        :return: Tuple of whether a slot was taken, and a descriptor of its locked file (if slots are shared)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._semaphore.acquire(timeout=timeout):
+            return False, None
+        if not self.lock_dir:
+            return True, None
+        delay = 0.001
+        while True:
+            fd = self._lock_free_slot()
+            if fd is not None:
+                return True, fd
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._semaphore.release()
+                    return False, None
+                delay = min(delay, remaining)
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_DELAY)
+
+    def release(self, fd: Optional[int]) -> None:
+        """
+        Method for freeing a slot taken by acquire.
+
+        :param fd: Descriptor of slot's locked file, returned by acquire
+        """
+        if fd is not None:
+            os.close(fd)
+        self._semaphore.release()
+
+    def _lock_free_slot(self) -> Optional[int]:
+        for index in range(self.concurrency):
+            fd = os.open(os.path.join(self.lock_dir, f"slot-{index}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+
+_limiters: Dict[Tuple[int, str], ResizeLimiter] = {}
+_limiters_lock = threading.Lock()
+# Whether slots of resizes of this process are taken by another one (see use_parent_slots)
+_parent_slots = False
+
+
+def get_resize_limiter() -> Optional[ResizeLimiter]:
+    """
+    Function for getting the resize limiter configured in settings.
+
+    :return: Process-wide ResizeLimiter instance, or None if the amount of resizes is not limited
+    """
+    config = (settings.IMAGES_RESIZE_CONCURRENCY, settings.IMAGES_RESIZE_LOCK_DIR)
+    if not config[0] or _parent_slots:
+        return None
+    with _limiters_lock:
+        if config not in _limiters:
+            _limiters[config] = ResizeLimiter(*config)
+        return _limiters[config]
+
+
+@contextmanager
+def resize_slot() -> Iterator[None]:
+    """
+    Context manager holding a resize slot (see ResizeLimiter), while the image is resized.
+    If no slot becomes free within IMAGES_RESIZE_QUEUE_TIMEOUT seconds, ResizeCapacityError is raised,
+    so that requests are rejected instead of piling up, and cheaper requests can still be handled.
+    """
+    limiter = get_resize_limiter()
+    if limiter is None:
+        yield
+        return
+    acquired, fd = limiter.acquire(_queue_timeout.get(settings.IMAGES_RESIZE_QUEUE_TIMEOUT))
+    if not acquired:
+        raise ResizeCapacityError(settings.IMAGES_RESIZE_RETRY_AFTER)
+    try:
+        yield
+    finally:
+        limiter.release(fd)
+
+
+@contextmanager
+def waiting_for_slots() -> Iterator[None]:
+    """
+    Context manager, inside which resize slots are waited for indefinitely
+    (e.g. by background workers, which have no client to reject).
+    """
+    token = _queue_timeout.set(None)
+    try:
+        yield
+    finally:
+        _queue_timeout.reset(token)
+
+
+def use_parent_slots() -> None:
+    """
+    Function making resizes of the current process run without taking slots, as the process submitting them
+    holds their slots instead (e.g. in workers of apps.images.batch's process pool). Limiters copied
+    from the parent process are dropped, so slots it held while starting the process are not kept.
+    """
+    global _parent_slots
+    with _limiters_lock:
+        _limiters.clear()
+        _parent_slots = True
@@ -0,0 +1,117 @@
+from typing import Any, Awaitable, Callable, Type
+
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from apps.images.cache import aget_cached_image, aget_cached_list
+from apps.images.conditional import aconditional_response, aget_image_validators, aget_list_etag
+from apps.images.models import Image
+from apps.images.pagination import ImageCursorPagination
+from apps.images.serializers import ImageRowSerializer, PublicImageSerializer
+from apps.images.views import ImagesView, SingleImageView
+
+
+def get_json_response(data: Any, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+    """
+    Function for creating a JSON response, with the same content as DRF's Response rendered by JSONRenderer.
+
+    :param data: A JSON-able object
+    :param status_code: HTTP status code
+    :return: Response
+    """
+    response = HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+    # Like DRF's responses, which depend on the content negotiation
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def is_async_handled(request: HttpRequest) -> bool:
+    # Browsable API (HTML) and other renderers, chosen with "format" parameter, are only handled by DRF views
+    return "format" not in request.GET and "text/html" not in request.META.get("HTTP_ACCEPT", "")
+
+
+def async_read_view(
+        view_class: Type[APIView], get: Callable[..., Awaitable[HttpResponseBase]]
+) -> Callable[..., Awaitable[HttpResponseBase]]:
+    """
+    Function for creating an async view, which handles GET and HEAD requests with provided coroutine function,
+    and other requests (e.g. uploads) with view_class, run in a thread. It's meant for ASGI servers,
+    where reads do not wait for a free thread, as long as they await the async ORM.
+    The view keeps DRF view's attributes, so the schema generator still documents it.
+
+    :param view_class: DRF view class of the endpoint
+    :param get: Coroutine function taking a request and URL parameters, and returning a response
+    :return: Async view
+    """
+    sync_view = view_class.as_view()
+    threaded_view = sync_to_async(sync_view)
+
+    async def view(request: HttpRequest, *args, **kwargs) -> HttpResponseBase:
+        if request.method in ("GET", "HEAD") and is_async_handled(request):
+            return await get(request, *args, **kwargs)
+        return await threaded_view(request, *args, **kwargs)
+
+    view.cls = sync_view.cls
+    view.initkwargs = sync_view.initkwargs
+    view.csrf_exempt = True
+    return view
+
+
+_threaded_images_view = sync_to_async(ImagesView.as_view())
+
+
+async def get_images(request: HttpRequest) -> HttpResponseBase:
+    """
+    Async version of ImagesView.get. Paginated and streamed lists are served by ImagesView,
+    as DRF's paginator and streamed responses read the database synchronously.
+
+    :param request: Handled request
+    :return: Response with the list
+    """
+    request = Request(request)
+    params = request.query_params
+    is_paginated = ImageCursorPagination().get_page_size(request) is not None
+    if is_paginated or params.get("stream", "").lower() in ("true", "1"):
+        return await _threaded_images_view(request._request)
+    images = Image.objects.filter(ImagesView.create_image_query(params))
+
+    etag = await aget_list_etag(images, request)
+
+    async def get_response() -> HttpResponseBase:
+        data = await aget_cached_list(
+            request, etag, lambda: ImageRowSerializer(ImageRowSerializer.get_rows(images), many=True).adata()
+        )
+        return get_json_response(data)
+
+    return await aconditional_response(request, etag, None, get_response)
+
+
+async def get_image(request: HttpRequest, image_id: int) -> HttpResponseBase:
+    """
+    Async version of SingleImageView.get.
+
+    :param request: Handled request
+    :param image_id: Image object's id
+    :return: Response with the image object
+    """
+    etag, last_modified = await aget_image_validators(image_id)
+    if not etag:
+        return get_json_response({"error": f"Image with id.{image_id} not found"}, status.HTTP_404_NOT_FOUND)
+
+    async def serialize() -> dict:
+        image = await Image.objects.prefetch_related("renditions").aget(pk=image_id)
+        return PublicImageSerializer(image).data
+
+    async def get_response() -> HttpResponseBase:
+        return get_json_response(await aget_cached_image(image_id, etag, serialize))
+
+    return await aconditional_response(request, etag, last_modified, get_response)
+
+
+images_view = async_read_view(ImagesView, get_images)
+single_image_view = async_read_view(SingleImageView, get_image)
@@ -0,0 +1,222 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from io import BytesIO
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+
+from apps.images.admission import resize_slot, waiting_for_slots
+from apps.images.models import Image, Rendition
+from apps.images.utils import TemporaryImageFile, get_content_hash, prepare_image_with_renditions
+from apps.images.workers import init_worker
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Function for getting the process-wide pool of processes resizing batch uploads.
+    Its processes are spawned, rather than forked, as forking a process running other threads
+    (e.g. of a server) copies their state, like held locks and resize slots, which would never be released.
+
+    :return: Process pool
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGES_BATCH_WORKERS or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker
+            )
+        return _process_pool
+
+
+def prepare_image_file(
+        source: Union[str, bytes], name: str, width: int, height: int, rendition_widths: List[int]
+) -> (Optional[str], int, int, List[Tuple[str, int, int]]):
+    """
+    Picklable wrapper of prepare_image_with_renditions, which is run inside pool's processes.
+    Large uploads are passed by paths of their temporary files, and resulting files are left
+    in temporary files as well, so no file's content is sent between processes as a whole.
+
+    :param source: Path of an image file, or its content
+    :param name: Name of the image file
+    :param width: Intended resulting width of the image
+    :param height: Intended resulting height of the image
+    :param rendition_widths: Widths of renditions
+    :return: Tuple of resulting temporary file's path (None if the file was not changed), its final width and height,
+        and list of renditions' temporary files' paths with their widths and heights
+    """
+    if isinstance(source, bytes):
+        source = File(BytesIO(source), name=name)
+    else:
+        source = TemporaryImageFile(name, source)
+    try:
+        # Processes of the pool do not take slots (see submit_with_slot), but the saving process does,
+        # when it prepares the image itself
+        with waiting_for_slots():
+            result, width, height, renditions = prepare_image_with_renditions(
+                source, width, height, rendition_widths
+            )
+    finally:
+        # Source is not closed itself, as it would remove the uploaded temporary file
+        source.file.close()
+    # Resulting files are removed by the process saving them
+    for rendition_file, _, _ in renditions:
+        rendition_file.file.close()
+    renditions = [
+        (rendition_file.temporary_file_path(), rendition_width, rendition_height)
+        for rendition_file, rendition_width, rendition_height in renditions
+    ]
+    if result is source:
+        return None, width, height, renditions
+    result.file.close()
+    return result.temporary_file_path(), width, height, renditions
+
+
+def create_images(items: List[dict]) -> List[Union[Image, Exception]]:
+    """
+    Function for resizing and saving many images at once. Images are resized
+    in parallel by the process pool, and saved with bulk inserts.
+    Files already stored for the same content and parameters (see Image.create),
+    or repeated within the batch, are prepared only once and shared.
+
+    :param items: List of dicts with "title", "width", "height" and "image" (UploadedFile) keys
+    :return: List of created image objects, or exceptions for failed items, in input order
+    """
+    keys = [
+        Image.get_derivative_key(
+            get_content_hash(item["image"]), item["width"], item["height"], item["image"].name
+        )
+        for item in items
+    ]
+    # Stored files are only looked up here, to skip resizing them. They are locked before new objects are saved
+    with transaction.atomic():
+        stored = set(Image.find_derivatives(keys))
+
+    pool = get_process_pool()
+    futures = {}
+    for item, key in zip(items, keys):
+        if key not in stored and key not in futures:
+            futures[key] = submit_with_slot(pool, *get_prepare_args(item))
+    prepared = {key: get_result(future.result) for key, future in futures.items()}
+
+    opened = []
+    try:
+        with transaction.atomic():
+            derivatives = Image.find_derivatives(keys)
+            results: List[Union[Image, Exception]] = []
+            first_images = {}
+            shared = []
+            derived = []
+            renditions = []
+            for item, key in zip(items, keys):
+                fields = dict(
+                    title=Image.get_default_title(item["title"], item["image"]),
+                    original_name=Image.get_original_name(item["image"].name),
+                    content_hash=key[0], requested_width=key[1], requested_height=key[2]
+                )
+                if key in derivatives:
+                    derivative = derivatives[key]
+                    image = Image(
+                        width=derivative.width, height=derivative.height, image=derivative.image.name, **fields
+                    )
+                    derived.append((image, derivative))
+                    results.append(image)
+                    continue
+                if key not in prepared:
+                    # Stored file was removed in the meantime
+                    prepared[key] = get_result(lambda: prepare_image_file(*get_prepare_args(item)))
+                if isinstance(prepared[key], Exception):
+                    results.append(prepared[key])
+                elif key in first_images:
+                    image = Image(width=first_images[key].width, height=first_images[key].height, **fields)
+                    shared.append((image, first_images[key]))
+                    results.append(image)
+                else:
+                    path, width, height, rendition_paths = prepared[key]
+                    image_file = item["image"]
+                    if path is not None:
+                        image_file = TemporaryImageFile(image_file.name, path)
+                        opened.append(image_file)
+                    first_images[key] = Image(width=width, height=height, image=image_file, **fields)
+                    results.append(first_images[key])
+                    for rendition_path, rendition_width, rendition_height in rendition_paths:
+                        rendition_file = TemporaryImageFile(item["image"].name, rendition_path)
+                        opened.append(rendition_file)
+                        renditions.append(Rendition(
+                            image=first_images[key], width=rendition_width, height=rendition_height,
+                            file=rendition_file
+                        ))
+
+            shared_ids = {id(image) for image, _ in shared}
+            Image.objects.bulk_create([
+                result for result in results if isinstance(result, Image) and id(result) not in shared_ids
+            ])
+            # Files of repeated items are known only once their first occurrences are saved
+            for image, first in shared:
+                image.image = first.image.name
+            Image.objects.bulk_create([image for image, _ in shared])
+            Rendition.objects.bulk_create(renditions)
+            Image.share_renditions(derived + shared)
+    finally:
+        # Prepared temporary files are moved into the storage, when their objects are saved.
+        # Closing them removes the ones left over
+        for image_file in opened:
+            image_file.close()
+        for result in prepared.values():
+            if isinstance(result, tuple):
+                paths = [result[0], *(rendition[0] for rendition in result[3])]
+                for path in paths:
+                    if path is not None and os.path.exists(path):
+                        os.remove(path)
+    return results
+
+
+def submit_with_slot(pool: ProcessPoolExecutor, *args) -> Future:
+    """
+    Function for submitting an image to be prepared by the process pool (see prepare_image_file),
+    once a resize slot becomes free. The slot is held by this process, until the image is prepared,
+    so images resized by the pool count against IMAGES_RESIZE_CONCURRENCY, like all others.
+
+    :param pool: Process pool
+    :param args: Arguments of prepare_image_file
+    :return: Future of prepare_image_file's result
+    """
+    slot = ExitStack()
+    with waiting_for_slots():
+        slot.enter_context(resize_slot())
+    try:
+        future = pool.submit(prepare_image_file, *args)
+    except BaseException:
+        slot.close()
+        raise
+    future.add_done_callback(lambda _: slot.close())
+    return future
+
+
+def get_prepare_args(item: dict) -> tuple:
+    image: UploadedFile = item["image"]
+    if hasattr(image, "temporary_file_path"):
+        source = image.temporary_file_path()
+    else:
+        # Uploads kept in memory are small (see FILE_UPLOAD_MAX_MEMORY_SIZE)
+        image.seek(0)
+        source = image.read()
+    # Settings are passed to workers, as they are read only by the saving process
+    return source, image.name, item["width"] or 0, item["height"] or 0, settings.IMAGES_RENDITION_WIDTHS
+
+
+def get_result(func: Callable[[], Any]) -> Any:
+    try:
+        return func()
+    except Exception as e:
+        return e
@@ -0,0 +1,146 @@
+import hashlib
+from typing import Any, Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches, BaseCache
+from rest_framework.request import Request
+
+KEY_PREFIX = "images"
+STATS_KINDS = ("image", "list")
+
+
+def get_cache() -> BaseCache:
+    """
+    Function for getting the cache used for serialized image objects.
+
+    :return: Cache configured by IMAGES_CACHE_ALIAS setting
+    """
+    return caches[settings.IMAGES_CACHE_ALIAS]
+
+
+def get_image_key(image_id: int, etag: str) -> str:
+    digest = etag.strip('"')
+    return f"{KEY_PREFIX}:image:{image_id}:{digest}"
+
+
+def get_list_key(request: Request, etag: str) -> str:
+    # Paginated responses contain absolute links, so the host is a part of the key
+    params = sorted(request.query_params.lists())
+    digest = hashlib.sha256(repr((request.get_host(), params, etag)).encode()).hexdigest()
+    return f"{KEY_PREFIX}:list:{digest}"
+
+
+def _record(kind: str, hit: bool) -> None:
+    cache = get_cache()
+    key = f"{KEY_PREFIX}:stats:{kind}:{'hits' if hit else 'misses'}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.add(key, 1, timeout=None)
+
+
+def _is_cacheable(data: Any) -> bool:
+    # Unpaginated lists can be arbitrarily long, so only ones not longer than the largest page are kept
+    return not isinstance(data, list) or len(data) <= settings.IMAGES_MAX_PAGE_SIZE
+
+
+def _get_or_build(kind: str, key: str, build: Callable[[], Any]) -> Any:
+    cache = get_cache()
+    data = cache.get(key)
+    if data is not None:
+        _record(kind, True)
+        return data
+    _record(kind, False)
+    data = build()
+    if _is_cacheable(data):
+        cache.set(key, data, timeout=settings.IMAGES_CACHE_TIMEOUT)
+    return data
+
+
+async def _aget_or_build(kind: str, key: str, build: Callable[[], Awaitable[Any]]) -> Any:
+    cache = get_cache()
+    # Statistics take several cache calls, and every async call of a cache backend is a thread hop in Django 4.1,
+    # so they are grouped into one
+    data = await cache.aget(key)
+    if data is not None:
+        await sync_to_async(_record)(kind, True)
+        return data
+    await sync_to_async(_record)(kind, False)
+    data = await build()
+    if _is_cacheable(data):
+        await cache.aset(key, data, timeout=settings.IMAGES_CACHE_TIMEOUT)
+    return data
+
+
+def get_cached_image(image_id: int, etag: str, build: Callable[[], Any]) -> Any:
+    """
+    Function for getting serialized image object from the cache, serializing it on a miss.
+    Entries are keyed by the object's current ETag (read from the database by the caller), so a changed object
+    is never served from the cache, even if the change was made by another process with its own cache.
+
+    :param image_id: Image object's id
+    :param etag: Current ETag of the image object
+    :param build: Callable returning serialized image object
+    :return: Serialized image object
+    """
+    return _get_or_build("image", get_image_key(image_id, etag), build)
+
+
+async def aget_cached_image(image_id: int, etag: str, build: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Async version of get_cached_image.
+
+    :param image_id: Image object's id
+    :param etag: Current ETag of the image object
+    :param build: Coroutine function returning serialized image object
+    :return: Serialized image object
+    """
+    return await _aget_or_build("image", get_image_key(image_id, etag), build)
+
+
+def get_cached_list(request: Request, etag: str, build: Callable[[], Any]) -> Any:
+    """
+    Function for getting serialized list (or page) of image objects from the cache, serializing it on a miss.
+    Lists are cached per host, normalized (sorted) query parameters and their current ETag,
+    so a changed list is never served from the cache. Unpaginated lists longer than IMAGES_MAX_PAGE_SIZE
+    are not cached.
+
+    :param request: Request for the list
+    :param etag: Current ETag of the list or page
+    :param build: Callable returning serialized list
+    :return: Serialized list
+    """
+    return _get_or_build("list", get_list_key(request, etag), build)
+
+
+async def aget_cached_list(request: Request, etag: str, build: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Async version of get_cached_list.
+
+    :param request: Request for the list
+    :param etag: Current ETag of the list
+    :param build: Coroutine function returning serialized list
+    :return: Serialized list
+    """
+    return await _aget_or_build("list", get_list_key(request, etag), build)
+
+
+def get_cache_stats() -> dict:
+    """
+    Function for getting hit and miss counters of the cache.
+
+    :return: Dict with "hits" and "misses" counters, for single images and lists
+    """
+    cache = get_cache()
+    keys = {
+        f"{KEY_PREFIX}:stats:{kind}:{counter}": (kind, counter)
+        for kind in STATS_KINDS for counter in ("hits", "misses")
+    }
+    values = cache.get_many(keys.keys())
+    stats = {"hits": {}, "misses": {}}
+    for key, (kind, counter) in keys.items():
+        stats[counter][kind] = values.get(key, 0)
+    return stats
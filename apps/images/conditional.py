@@ -0,0 +1,155 @@
+import hashlib
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from django.db.models import Count, Max, QuerySet
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+
+from apps.images.models import Image
+
+# Aggregates of a list, which change whenever the list changes (see get_list_etag)
+LIST_STATS = dict(count=Count("id"), max_id=Max("id"), last=Max("updated_at"))
+
+
+def make_etag(*parts: object) -> str:
+    """
+    Function for creating a strong, quoted ETag out of values describing a representation.
+
+    :param parts: Values, which change whenever the representation changes
+    :return: ETag
+    """
+    return quote_etag(hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()[:32])
+
+
+def get_image_validators(image_id: int) -> (Optional[str], Optional[datetime]):
+    """
+    Function for getting validators of a single image object, using only its indexed columns.
+
+    :param image_id: Image object's id
+    :return: Tuple of ETag and last modification time, or Nones if the object does not exist
+    """
+    updated_at = Image.objects.filter(pk=image_id).values_list("updated_at", flat=True).first()
+    return get_image_validators_from(image_id, updated_at)
+
+
+async def aget_image_validators(image_id: int) -> (Optional[str], Optional[datetime]):
+    """
+    Async version of get_image_validators, using the async ORM.
+
+    :param image_id: Image object's id
+    :return: Tuple of ETag and last modification time, or Nones if the object does not exist
+    """
+    updated_at = await Image.objects.filter(pk=image_id).values_list("updated_at", flat=True).afirst()
+    return get_image_validators_from(image_id, updated_at)
+
+
+def get_image_validators_from(image_id: int, updated_at: Optional[datetime]) -> (Optional[str], Optional[datetime]):
+    if updated_at is None:
+        return None, None
+    return make_etag(image_id, updated_at.isoformat()), updated_at
+
+
+def get_list_etag(queryset: QuerySet, request: Request) -> str:
+    """
+    Function for getting ETag of a list of image objects, without fetching its rows.
+    Adding or changing an object changes the highest id or modification time,
+    and removing one changes the count, so any change of the list changes the ETag.
+
+    :param queryset: Filtered queryset of listed objects
+    :param request: Request for the list. Its host and query parameters are a part of the ETag
+    :return: ETag
+    """
+    stats = queryset.order_by().aggregate(**LIST_STATS)
+    return get_list_etag_from(stats, request)
+
+
+async def aget_list_etag(queryset: QuerySet, request: Request) -> str:
+    """
+    Async version of get_list_etag, using the async ORM.
+
+    :param queryset: Filtered queryset of listed objects
+    :param request: Request for the list. Its host and query parameters are a part of the ETag
+    :return: ETag
+    """
+    stats = await queryset.order_by().aaggregate(**LIST_STATS)
+    return get_list_etag_from(stats, request)
+
+
+def get_page_etag(queryset: QuerySet, request: Request, paginator: BasePagination) -> str:
+    """
+    Function for getting ETag of a page of a paginated list, out of ids and modification times of the objects
+    on the page only, so its cost does not grow with the length of the whole list. Any change of the page's
+    objects, and appearing or disappearing of neighbouring pages (which changes the page's links), changes the ETag.
+
+    :param queryset: Filtered queryset of listed objects
+    :param request: Request for the page. Its host and query parameters are a part of the ETag
+    :param paginator: Paginator of the list (it's used to fetch the page, so a new one should be passed)
+    :return: ETag
+    """
+    page = paginator.paginate_queryset(queryset.values_list("id", "updated_at", named=True), request)
+    rows = [(row.id, row.updated_at.isoformat()) for row in page]
+    params = sorted(request.query_params.lists())
+    return make_etag(request.get_host(), params, rows, paginator.has_next, paginator.has_previous)
+
+
+def get_list_etag_from(stats: dict, request: Request) -> str:
+    last = stats["last"].isoformat() if stats["last"] else ""
+    params = sorted(request.query_params.lists())
+    return make_etag(request.get_host(), params, stats["count"], stats["max_id"], last)
+
+
+def conditional_response(
+        request: Request, etag: Optional[str], last_modified: Optional[datetime],
+        get_response: Callable[[], HttpResponseBase]
+) -> HttpResponseBase:
+    """
+    Function handling conditional GET requests ("If-None-Match" and "If-Modified-Since").
+    If the client already holds the current representation, a "304 Not Modified"
+    response is returned, without creating the full response.
+
+    :param request: Handled request
+    :param etag: Current ETag of the resource, if known
+    :param last_modified: Current modification time of the resource, if known
+    :param get_response: Callable creating the full response
+    :return: Response with the validators' headers set
+    """
+    last_modified_timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+    if response is None:
+        response = get_response()
+    return set_validators(response, etag, last_modified_timestamp)
+
+
+async def aconditional_response(
+        request: Request, etag: Optional[str], last_modified: Optional[datetime],
+        get_response: Callable[[], Awaitable[HttpResponseBase]]
+) -> HttpResponseBase:
+    """
+    Async version of conditional_response.
+
+    :param request: Handled request
+    :param etag: Current ETag of the resource, if known
+    :param last_modified: Current modification time of the resource, if known
+    :param get_response: Coroutine function creating the full response
+    :return: Response with the validators' headers set
+    """
+    last_modified_timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_timestamp)
+    if response is None:
+        response = await get_response()
+    return set_validators(response, etag, last_modified_timestamp)
+
+
+def set_validators(
+        response: HttpResponseBase, etag: Optional[str], last_modified_timestamp: Optional[int]
+) -> HttpResponseBase:
+    if response.status_code in (200, 304):
+        if etag:
+            response["ETag"] = etag
+        if last_modified_timestamp is not None:
+            response["Last-Modified"] = http_date(last_modified_timestamp)
+    return response
@@ -1,5 +1,46 @@
 from django import forms
-from django.core.validators import MinValueValidator
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.template.defaultfilters import filesizeformat
+
+from apps.images.utils import (
+    ImagePreparationError, ImageTooLargeError, check_image_limits, get_image_size, get_output_size, image_types
+)
+
+# Error codes of limits, which are exceeded by the uploaded file itself (responded with 413)
+TOO_LARGE_ERROR_CODES = ("file_too_large", "too_many_pixels")
+
+
+class LimitedImageField(forms.ImageField):
+    """
+    Image field, which rejects files larger than IMAGES_MAX_UPLOAD_SIZE bytes, or images with more than
+    IMAGES_MAX_PIXELS pixels. Image's size is read from its header, before the file is verified,
+    so pixels of oversized images (like decompression bombs) are never decoded.
+    """
+    default_error_messages = {
+        "file_too_large": "File is too large (%(size)s), at most %(max_size)s can be uploaded.",
+        "too_many_pixels": "%(error)s",
+    }
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+        max_size = settings.IMAGES_MAX_UPLOAD_SIZE
+        if max_size and data.size > max_size:
+            raise ValidationError(
+                self.error_messages["file_too_large"], code="file_too_large",
+                params={"size": filesizeformat(data.size), "max_size": filesizeformat(max_size)}
+            )
+        try:
+            check_image_limits(get_image_size(data))
+        except ImageTooLargeError as e:
+            raise ValidationError(self.error_messages["too_many_pixels"], code="too_many_pixels",
+                                  params={"error": e})
+        except Exception:
+            # Invalid images are reported by ImageField
+            pass
+        return super().to_python(data)
 
 
 class UploadImageForm(forms.Form):
@@ -12,4 +53,39 @@ class UploadImageForm(forms.Form):
     height = forms.IntegerField(
         required=False, initial=0, validators=[MinValueValidator(0)]
     )
-    image = forms.ImageField()
+    image = LimitedImageField()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        image = cleaned_data.get("image")
+        width, height = cleaned_data.get("width") or 0, cleaned_data.get("height") or 0
+        if image and (width or height):
+            # Size of the image was read by ImageField
+            output_size = get_output_size(*image.image.size, width, height)
+            try:
+                check_image_limits(image.image.size, output_size)
+            except ImagePreparationError as e:
+                self.add_error(None, ValidationError(str(e), code="output_too_large"))
+        return cleaned_data
+
+    def is_too_large(self) -> bool:
+        """
+        Method for checking, if the form is invalid because the uploaded file exceeds a limit.
+
+        :return: Whether the uploaded file is too large
+        """
+        return any(self.has_error("image", code) for code in TOO_LARGE_ERROR_CODES)
+
+
+class RenderImageForm(forms.Form):
+    w = forms.IntegerField(
+        required=False, initial=0,
+        validators=[MinValueValidator(0), MaxValueValidator(lambda: settings.IMAGES_MAX_OUTPUT_SIZE)]
+    )
+    h = forms.IntegerField(
+        required=False, initial=0,
+        validators=[MinValueValidator(0), MaxValueValidator(lambda: settings.IMAGES_MAX_OUTPUT_SIZE)]
+    )
+    format = forms.ChoiceField(
+        required=False, choices=[(extension, extension) for extension in image_types]
+    )
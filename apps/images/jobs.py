@@ -0,0 +1,124 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from apps.images.admission import waiting_for_slots
+from apps.images.models import Image, UploadJob
+from apps.images.utils import get_content_hash
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Function for getting the process-wide pool of upload workers.
+
+    :return: Thread pool processing upload jobs
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGES_UPLOAD_WORKERS, thread_name_prefix="upload-worker"
+            )
+        return _executor
+
+
+def create_upload_job(title: str, width: int, height: int, image: File) -> UploadJob:
+    """
+    Function for storing an uploaded image and queueing it for processing.
+    The job is handed to the worker pool once the current transaction commits.
+
+    :param title: Image's title
+    :param width: Intended resulting width of the image
+    :param height: Intended resulting height of the image
+    :param image: Uploaded image file
+    :return: Created upload job
+    """
+    job = UploadJob.objects.create(
+        title=title, width=width, height=height,
+        filename=str(image.name), upload=image, content_hash=get_content_hash(image)
+    )
+    transaction.on_commit(lambda: get_executor().submit(run_upload_job, job.id))
+    return job
+
+
+def run_upload_job(job_id: int) -> None:
+    """
+    Function processing an upload job inside a worker thread.
+
+    :param job_id: Id of the processed job
+    """
+    close_old_connections()
+    try:
+        process_upload_job(job_id)
+    except Exception:
+        logger.exception("Upload job %s could not be processed", job_id)
+    finally:
+        close_old_connections()
+
+
+def process_upload_job(job_id: int) -> Optional[UploadJob]:
+    """
+    Function for processing a pending upload job: resizing the uploaded image
+    and creating its Image object. Jobs are claimed with an atomic status update,
+    so every job is processed only once, even with many workers.
+
+    :param job_id: Id of the processed job
+    :return: Processed job, or None if the job was not pending
+    """
+    claimed = UploadJob.objects.filter(pk=job_id, status=UploadJob.Status.PENDING).update(
+        status=UploadJob.Status.PROCESSING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    job = UploadJob.objects.get(pk=job_id)
+    created = None
+    try:
+        # Image.create runs its own short transactions, so none is held while the image waits for a slot,
+        # and while it's resized
+        with job.upload.open("rb") as upload:
+            image = File(upload, name=job.filename)
+            image.content_hash = job.content_hash
+            # Background jobs wait for resize slots, instead of failing when all are taken
+            with waiting_for_slots():
+                created = Image.create(
+                    title=job.title, width=job.width, height=job.height, image=image
+                )
+        with transaction.atomic():
+            job.image = created
+            job.status = UploadJob.Status.DONE
+            job.save()
+    except Exception as e:
+        if created is not None:
+            # The job is not done, so its image object is not kept
+            created.delete()
+        job.image = None
+        job.status = UploadJob.Status.FAILED
+        job.error = str(e)
+        job.save()
+    job.upload.delete(save=True)
+    return job
+
+
+def requeue_stale_jobs(older_than: timedelta) -> int:
+    """
+    Function for returning jobs left in processing state (e.g. by a stopped worker)
+    back to the queue.
+
+    :param older_than: How long a job has to be processed, to be considered stale
+    :return: Amount of requeued jobs
+    """
+    return UploadJob.objects.filter(
+        status=UploadJob.Status.PROCESSING, updated_at__lt=timezone.now() - older_than
+    ).update(status=UploadJob.Status.PENDING, updated_at=timezone.now())
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.images.storage import create_missing_renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates renditions (see IMAGES_RENDITION_WIDTHS setting) of image objects stored without them, "
+        "e.g. uploaded before renditions were introduced, updating image objects in batches. "
+        "If interrupted, it can be started again and continues with the remaining objects."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=100,
+            help="Amount of image objects selected at once"
+        )
+
+    def handle(self, *args, **options):
+        total_updated = total_failed = 0
+        for updated, failed in create_missing_renditions(options["batch_size"]):
+            total_updated += updated
+            total_failed += failed
+            self.stdout.write(f"Created renditions of {total_updated} image(s), {total_failed} failed")
+        self.stdout.write(f"Done: created renditions of {total_updated} image(s), {total_failed} failed")
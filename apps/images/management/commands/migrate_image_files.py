@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.images.storage import migrate_image_files
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves image files stored in the old, flat layout (\"images/<name>\") into the sharded one "
+        "(\"images/ab/cd/<hash>.<ext>\"), rewriting image objects in batches. "
+        "If interrupted, it can be started again and continues with the remaining files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Amount of image objects updated in a single transaction"
+        )
+        parser.add_argument(
+            "--keep-old", action="store_true",
+            help="Leave old files in place, instead of removing them once their objects are updated"
+        )
+
+    def handle(self, *args, **options):
+        total_migrated = total_failed = 0
+        for migrated, failed in migrate_image_files(options["batch_size"], options["keep_old"]):
+            total_migrated += migrated
+            total_failed += failed
+            self.stdout.write(f"Migrated {total_migrated} file(s), {total_failed} failed")
+        self.stdout.write(f"Done: migrated {total_migrated} file(s), {total_failed} failed")
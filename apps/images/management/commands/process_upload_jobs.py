@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.images.jobs import process_upload_job, requeue_stale_jobs
+from apps.images.models import UploadJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Processes pending asynchronous uploads. Jobs are normally handled by the web process' "
+        "worker pool, this command picks up jobs left behind (e.g. after a restart), "
+        "or works as a standalone worker with --interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-minutes", type=int, default=30,
+            help="Jobs processed for longer than this are considered abandoned and are requeued"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="If provided, the command keeps polling for pending jobs every this many seconds"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale_jobs(timedelta(minutes=options["stale_minutes"]))
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s)")
+            pending = UploadJob.objects.filter(status=UploadJob.Status.PENDING).order_by("id")
+            for job_id in pending.values_list("id", flat=True):
+                job = process_upload_job(job_id)
+                if job:
+                    self.stdout.write(f"Job {job.id}: {job.status}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,44 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from PythonTaskWojDra import schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the API schema to swagger.json and swagger.yaml, which are then served by the app "
+        "instead of generating the schema. Documents are only regenerated when the code changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir", default=settings.SCHEMA_DIR or settings.BASE_DIR,
+            help="Folder the documents are written to (SCHEMA_DIR setting by default)"
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Write the documents even if the code has not changed"
+        )
+
+    def handle(self, *args, **options):
+        directory = options["dir"]
+        fingerprint = schema.get_source_fingerprint()
+        fingerprint_path = os.path.join(directory, schema.FINGERPRINT_FILE)
+        if not options["force"] and os.path.exists(fingerprint_path):
+            with open(fingerprint_path) as file:
+                if file.read().strip() == fingerprint:
+                    self.stdout.write("Schema is up-to-date")
+                    return
+
+        # Documents are not used without the fingerprint, so they are never read partially written
+        if os.path.exists(fingerprint_path):
+            os.remove(fingerprint_path)
+        document = schema.generate_schema()
+        for fmt, name in schema.SCHEMA_FILES.items():
+            with open(os.path.join(directory, name), "wb") as file:
+                file.write(schema.encode_schema(document, fmt, pretty=True))
+            self.stdout.write(f"Written {name}")
+        with open(fingerprint_path, "w") as file:
+            file.write(fingerprint + "\n")
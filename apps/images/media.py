@@ -0,0 +1,134 @@
+import mimetypes
+import os
+import re
+from typing import BinaryIO, Optional
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseBase, HttpRequest
+from django.utils.http import http_date
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CONTROL_CHARS_RE = re.compile(r"[\x00-\x1f\x7f]")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[tuple]:
+    """
+    Function for parsing a single-range "Range" header.
+    Headers with many ranges, or in unknown units, are ignored (the whole file is sent).
+
+    :param header: Value of the "Range" header
+    :param size: Size of the file in bytes
+    :return: Tuple of first and last byte of the range (inclusive), or None to send the whole file
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range - last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        raise RangeNotSatisfiable()
+    return first, last
+
+
+class FileRangeReader:
+    """
+    File-like object reading only a range of bytes of a file.
+    """
+
+    def __init__(self, file: BinaryIO, first: int, last: int):
+        self.file = file
+        self.file.seek(first)
+        self.remaining = last - first + 1
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def get_content_disposition(filename: str) -> str:
+    """
+    Function for getting "Content-Disposition" header, which shows a file in the browser
+    and suggests its name, if it's saved.
+
+    :param filename: Suggested name of the file
+    :return: Value of the header
+    """
+    filename = CONTROL_CHARS_RE.sub("", filename)
+    try:
+        filename.encode("ascii")
+        return 'inline; filename="{}"'.format(filename.replace("\\", "\\\\").replace('"', r'\"'))
+    except UnicodeEncodeError:
+        return f"inline; filename*=utf-8''{quote(filename)}"
+
+
+def serve_file(
+        request: HttpRequest, path: str, content_type: Optional[str] = None, filename: Optional[str] = None
+) -> HttpResponseBase:
+    """
+    Function for sending a file from the disk.
+
+    If IMAGES_MEDIA_ACCEL is set, sending is handed off to the front proxy:
+    - "x-accel-redirect" (nginx) - with a URI made of IMAGES_MEDIA_ACCEL_PREFIX and the path relative to MEDIA_ROOT,
+    - "x-sendfile" (Apache, lighttpd) - with the absolute path of the file.
+
+    Otherwise, the file is sent by a FileResponse. Full files are passed to the WSGI server's
+    "wsgi.file_wrapper", which servers like gunicorn or uWSGI send with os.sendfile.
+    Single-range "Range" requests are answered with "206 Partial Content".
+
+    :param request: Handled request
+    :param path: Absolute path of the file
+    :param content_type: Content type of the file (guessed from its name, if not provided)
+    :param filename: Name of the file suggested to the client (name of the file on the disk, if not provided)
+    :return: Response sending the file
+    """
+    stat = os.stat(path)
+    content_type = content_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    accel = settings.IMAGES_MEDIA_ACCEL.lower()
+    if accel in ("x-accel-redirect", "x-sendfile"):
+        response = HttpResponse(content_type=content_type)
+        if accel == "x-accel-redirect":
+            relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+            response["X-Accel-Redirect"] = settings.IMAGES_MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + relative
+        else:
+            response["X-Sendfile"] = path
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        response["Content-Disposition"] = get_content_disposition(filename or os.path.basename(path))
+        return response
+
+    try:
+        byte_range = parse_range(request.META.get("HTTP_RANGE", ""), stat.st_size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    file = open(path, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        first, last = byte_range
+        response = FileResponse(FileRangeReader(file, first, last), status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {first}-{last}/{stat.st_size}"
+        response["Content-Length"] = str(last - first + 1)
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Content-Disposition"] = get_content_disposition(filename or os.path.basename(path))
+    return response
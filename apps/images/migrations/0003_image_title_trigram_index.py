@@ -0,0 +1,21 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+from django.db.models.functions import Upper
+
+from apps.images.operations import PostgreSQLOnlyAddIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0002_remove_image_url'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        PostgreSQLOnlyAddIndex(
+            model_name='image',
+            index=GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='images_title_upper_trgm'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:27
+
+import apps.images.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0006_image_image_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to=apps.images.storage.image_upload_to),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0007_image_sharded_upload_to'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
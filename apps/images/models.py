@@ -1,30 +1,210 @@
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
 from django.core.files import File
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 
-from apps.images.utils import prepare_image
+from apps.images.storage import image_upload_to
+from apps.images.utils import get_content_hash, prepare_image_with_renditions
 
 
 class Image(models.Model):
+    # On PostgreSQL, "title__icontains" lookups (UPPER("title") LIKE UPPER('%...%'))
+    # are backed by a trigram index on UPPER("title"), created by migration 0003
     title = models.CharField(max_length=80)
     width = models.IntegerField()
     height = models.IntegerField()
-    image = models.ImageField(upload_to='images')
+    # Files are spread between subfolders, like "images/ab/cd/abcd....png" (see apps.images.storage)
+    image = models.ImageField(upload_to=image_upload_to, db_index=True)
+    # Name of the uploaded file, which is not a part of the stored file's name
+    original_name = models.CharField(max_length=255, blank=True)
+    # Digest of the uploaded file's content and requested size. Image objects created from
+    # the same content with the same parameters share the same stored file
+    content_hash = models.CharField(max_length=64, blank=True)
+    requested_width = models.IntegerField(default=0)
+    requested_height = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["content_hash", "requested_width", "requested_height"], name="images_derivative_idx"
+            ),
+        ]
 
     @staticmethod
-    def create(title: str, width: int, height: int, image: File) -> "Image":
+    def get_default_title(title: str, image: File) -> str:
         if not title and image:
             title = str(image.name).split(".")[0]
-        image, width, height = prepare_image(image, width, height)
-        new_obj = Image.objects.create(
-            title=title,
-            width=width, height=height,
-            image=image
+        return title
+
+    @staticmethod
+    def get_original_name(filename: str) -> str:
+        return os.path.basename(filename.replace("\\", "/"))[:255]
+
+    @staticmethod
+    def get_derivative_key(content_hash: str, width: int, height: int, filename: str) -> tuple:
+        # Output format depends on the file's extension, so it's a part of the key
+        return content_hash, width or 0, height or 0, os.path.splitext(filename)[1].lower()
+
+    @staticmethod
+    def find_derivatives(keys: Iterable[tuple]) -> Dict[tuple, "Image"]:
+        """
+        Static method for finding stored files prepared from the same content, with the same parameters.
+        It must be called inside a transaction. Found objects are locked until it ends, so that
+        their files are not released (see release_image_files), before new objects sharing them are saved.
+
+        :param keys: Keys of prepared files (see get_derivative_key)
+        :return: Dict of image objects, whose files match the keys
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        query = Q()
+        for content_hash, width, height, extension in keys:
+            query |= Q(content_hash=content_hash, requested_width=width, requested_height=height,
+                       image__endswith=extension)
+        derivatives = {}
+        candidates = Image.objects.select_for_update().filter(query).only(
+            "id", "image", "width", "height", "content_hash", "requested_width", "requested_height"
         )
+        for candidate in candidates:
+            key = Image.get_derivative_key(
+                candidate.content_hash, candidate.requested_width, candidate.requested_height, candidate.image.name
+            )
+            if key in keys:
+                derivatives.setdefault(key, candidate)
+        return derivatives
+
+    @staticmethod
+    def create(title: str, width: int, height: int, image: File) -> "Image":
+        title = Image.get_default_title(title, image)
+        original_name = Image.get_original_name(str(image.name))
+        width, height = width or 0, height or 0
+        content_hash = get_content_hash(image)
+        fields = dict(
+            title=title, original_name=original_name,
+            content_hash=content_hash, requested_width=width, requested_height=height
+        )
+        key = Image.get_derivative_key(content_hash, width, height, original_name)
+        with transaction.atomic():
+            derivative = Image.find_derivatives([key]).get(key)
+            if derivative:
+                # Same content was already prepared with the same parameters, so its files are shared
+                new_obj = Image.objects.create(
+                    width=derivative.width, height=derivative.height, image=derivative.image.name, **fields
+                )
+                Image.share_renditions([(new_obj, derivative)])
+                return new_obj
+        prepared, width, height, renditions = prepare_image_with_renditions(
+            image, width, height, settings.IMAGES_RENDITION_WIDTHS
+        )
+        try:
+            with transaction.atomic():
+                new_obj = Image.objects.create(
+                    width=width, height=height,
+                    image=prepared, **fields
+                )
+                Rendition.objects.bulk_create(
+                    Rendition(image=new_obj, width=rendition_width, height=rendition_height, file=rendition_file)
+                    for rendition_file, rendition_width, rendition_height in renditions
+                )
+        finally:
+            # Removes temporary files, which were not moved into the storage
+            for file in [prepared, *(rendition[0] for rendition in renditions)]:
+                if file is not image:
+                    file.close()
         return new_obj
 
+    @staticmethod
+    def share_renditions(copies: Iterable[Tuple["Image", "Image"]]) -> None:
+        """
+        Static method for creating renditions of image objects, which share files of other image objects.
+        Renditions share their files as well.
+
+        :param copies: Pairs of saved image objects, and image objects whose files they share
+        """
+        copies = list(copies)
+        renditions = defaultdict(list)
+        for rendition in Rendition.objects.filter(image__in=[source for _, source in copies]):
+            renditions[rendition.image_id].append(rendition)
+        Rendition.objects.bulk_create(
+            Rendition(image=image, width=rendition.width, height=rendition.height, file=rendition.file.name)
+            for image, source in copies for rendition in renditions[source.pk]
+        )
+
     @property
     def url(self) -> str:
         return self.image.url
 
     def __str__(self) -> str:
         return f"Image \"{self.title}\", {self.width}x{self.height}"
+
+
+class Rendition(models.Model):
+    """
+    Smaller copy of an image object's file, in one of the standard widths (IMAGES_RENDITION_WIDTHS setting).
+    Renditions are created together with their image object, out of a single decode of the uploaded file.
+    """
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name="renditions")
+    width = models.IntegerField()
+    height = models.IntegerField()
+    # Like image files, rendition files are shared by image objects created from the same content
+    file = models.ImageField(upload_to=image_upload_to, db_index=True)
+
+    class Meta:
+        ordering = ["width"]
+        constraints = [
+            models.UniqueConstraint(fields=["image", "width"], name="images_rendition_unique_width"),
+        ]
+
+    @staticmethod
+    def get_original_name(image_original_name: str, width: int) -> str:
+        """
+        Static method for getting a name, under which a rendition's file is served.
+
+        :param image_original_name: Original name of the image object's file
+        :param width: Width of the rendition
+        :return: Name like "photo_320w.jpg", or an empty string if the image object has no original name
+        """
+        stem, extension = os.path.splitext(image_original_name)
+        return f"{stem}_{width}w{extension}" if stem else ""
+
+    @property
+    def url(self) -> str:
+        return self.file.url
+
+    def __str__(self) -> str:
+        return f"Rendition of image {self.image_id}, {self.width}x{self.height}"
+
+
+class UploadJob(models.Model):
+    """
+    Upload of an image, which is processed asynchronously by a worker.
+    Image object is created only once the processing has finished.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        PROCESSING = "processing"
+        DONE = "done"
+        FAILED = "failed"
+
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING, db_index=True)
+    title = models.CharField(max_length=80)
+    width = models.IntegerField()
+    height = models.IntegerField()
+    filename = models.CharField(max_length=255)
+    upload = models.FileField(upload_to='uploads', blank=True)
+    # Digest of the uploaded file, computed while it was received
+    content_hash = models.CharField(max_length=64, blank=True)
+    image = models.ForeignKey(Image, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Upload job {self.id} of \"{self.filename}\", {self.status}"
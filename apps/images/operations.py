@@ -0,0 +1,25 @@
+from django.db.migrations import AddIndex
+
+
+class PostgreSQLOnlyAddIndex(AddIndex):
+    """
+    AddIndex migration operation, which only creates the index on PostgreSQL.
+    Other backends (e.g. SQLite used by tests) skip it.
+
+    The index is not added to the migration state (nor to model's Meta), because
+    SQLite recreates tables with every index from the state, when altering them.
+    """
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f"{super().describe()} (PostgreSQL only)"
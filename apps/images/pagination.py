@@ -0,0 +1,35 @@
+from typing import Optional
+
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+
+
+class ImageCursorPagination(CursorPagination):
+    """
+    Opt-in keyset pagination of image objects, ordered by their id.
+
+    Pagination is only applied when the request contains either a "limit"
+    or a "cursor" query parameter, so plain list requests keep returning
+    every matching object. Every page is fetched with an indexed
+    "id > last seen id" filter, which keeps deep pages as fast as the first one.
+    """
+    ordering = "id"
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    template = None
+
+    def get_page_size(self, request: Request) -> Optional[int]:
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        self.page_size = settings.IMAGES_PAGE_SIZE
+        self.max_page_size = settings.IMAGES_MAX_PAGE_SIZE
+        return min(super().get_page_size(request), self.max_page_size)
+
+    def decode_cursor(self, request: Request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None and not cursor.position.isdigit():
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
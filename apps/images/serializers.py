@@ -1,11 +1,174 @@
+from collections import defaultdict
+from typing import Callable, Iterable, List, Sequence, Tuple
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import QuerySet
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
 
-from apps.images.models import Image
+from apps.images.models import Image, Rendition, UploadJob
+
+# Renditions of listed rows are fetched in queries for at most that many image objects
+RENDITIONS_QUERY_CHUNK_SIZE = 500
+
+
+def get_srcset(url: str, width: int, renditions: Iterable[Tuple[str, int]]) -> str:
+    """
+    Function for building a "srcset" attribute of an image, out of its renditions and its own file.
+
+    :param url: URL of image object's file
+    :param width: Width of image object's file
+    :param renditions: URLs and widths of image object's renditions, ordered by width
+    :return: Candidates like "<url> 320w, <url> 640w", from the smallest
+    """
+    candidates = [*renditions, (url, width)]
+    return ", ".join(f"{candidate_url} {candidate_width}w" for candidate_url, candidate_width in candidates)
+
+
+class RenditionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Rendition
+        fields = [
+            "url", "width", "height"
+        ]
 
 
 class PublicImageSerializer(serializers.ModelSerializer):
+    renditions = RenditionSerializer(many=True, read_only=True)
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Image
         fields = [
-            "id", "url", "title", "width", "height"
+            "id", "url", "title", "width", "height", "renditions", "srcset"
+        ]
+
+    def get_srcset(self, obj: Image) -> str:
+        renditions = [(rendition.url, rendition.width) for rendition in obj.renditions.all()]
+        return get_srcset(obj.url, obj.width, renditions)
+
+
+def get_image_url_builder() -> Callable[[str], str]:
+    """
+    Function for getting a callable, which builds URLs of stored image files out of their names.
+    For FileSystemStorage, URLs are built by concatenation, which gives the same result
+    as its "url" method (urljoin with the base URL), at a fraction of its cost.
+
+    :return: Callable returning URL of a stored file, given its name
+    """
+    storage = Image._meta.get_field("image").storage
+    # Default storage is a lazy object, its "__class__" is the class of the wrapped storage
+    if storage.__class__.url is not FileSystemStorage.url or not (storage.base_url or "").endswith("/"):
+        return storage.url
+    base_url = storage.base_url
+
+    def url(name: str) -> str:
+        path = filepath_to_uri(name).lstrip("/")
+        if path.startswith(".") or "/." in path or "//" in path:
+            # Dot and empty segments are resolved by urljoin
+            return storage.url(name)
+        return base_url + path
+
+    return url
+
+
+class ImageRowSerializer:
+    """
+    Fast, read-only equivalent of PublicImageSerializer for lists of image objects.
+    It serializes rows fetched with "values_list" (see get_rows), without creating
+    model instances, and builds "url" directly from the storage of "image" field.
+    Renditions of all rows are fetched together, in a single query per RENDITIONS_QUERY_CHUNK_SIZE rows.
+    Its output renders to exactly the same JSON as PublicImageSerializer's.
+    """
+    columns = ("id", "image", "title", "width", "height")
+
+    def __init__(self, rows: Iterable, many: bool = True):
+        assert many, "ImageRowSerializer only serializes lists"
+        self.rows = rows
+
+    @classmethod
+    def get_rows(cls, queryset: QuerySet) -> QuerySet:
+        """
+        Method for limiting a queryset of image objects to serialized columns.
+
+        :param queryset: Queryset of image objects
+        :return: Queryset of named tuples with serialized columns
+        """
+        return queryset.values_list(*cls.columns, named=True)
+
+    @staticmethod
+    def get_renditions(image_ids: Sequence[int], url: Callable[[str], str]) -> dict:
+        """
+        Static method for fetching serialized renditions of many image objects.
+
+        :param image_ids: IDs of image objects
+        :param url: Callable building URLs of stored files (see get_image_url_builder)
+        :return: Dict of lists of serialized renditions, ordered by width, by IDs of their image objects
+        """
+        renditions = defaultdict(list)
+        for start in range(0, len(image_ids), RENDITIONS_QUERY_CHUNK_SIZE):
+            rows = Rendition.objects.filter(
+                image_id__in=image_ids[start:start + RENDITIONS_QUERY_CHUNK_SIZE]
+            ).order_by("image_id", "width").values_list("image_id", "file", "width", "height")
+            for image_id, name, width, height in rows:
+                renditions[image_id].append({"url": url(name), "width": width, "height": height})
+        return renditions
+
+    @staticmethod
+    async def aget_renditions(image_ids: Sequence[int], url: Callable[[str], str]) -> dict:
+        """
+        Async version of get_renditions, using the async ORM.
+
+        :param image_ids: IDs of image objects
+        :param url: Callable building URLs of stored files (see get_image_url_builder)
+        :return: Dict of lists of serialized renditions, ordered by width, by IDs of their image objects
+        """
+        renditions = defaultdict(list)
+        for start in range(0, len(image_ids), RENDITIONS_QUERY_CHUNK_SIZE):
+            rows = Rendition.objects.filter(
+                image_id__in=image_ids[start:start + RENDITIONS_QUERY_CHUNK_SIZE]
+            ).order_by("image_id", "width").values_list("image_id", "file", "width", "height")
+            async for image_id, name, width, height in rows:
+                renditions[image_id].append({"url": url(name), "width": width, "height": height})
+        return renditions
+
+    @property
+    def data(self) -> List[dict]:
+        url = get_image_url_builder()
+        rows = list(self.rows)
+        return self.serialize(rows, self.get_renditions([row.id for row in rows], url), url)
+
+    async def adata(self) -> List[dict]:
+        """
+        Async version of "data", which reads rows (a queryset) and renditions with the async ORM.
+
+        :return: Serialized rows
+        """
+        url = get_image_url_builder()
+        rows = [row async for row in self.rows]
+        return self.serialize(rows, await self.aget_renditions([row.id for row in rows], url), url)
+
+    @staticmethod
+    def serialize(rows: List, renditions: dict, url: Callable[[str], str]) -> List[dict]:
+        data = []
+        for row in rows:
+            image_url = url(row.image)
+            image_renditions = renditions.get(row.id, [])
+            data.append({
+                "id": row.id, "url": image_url, "title": row.title, "width": row.width, "height": row.height,
+                "renditions": image_renditions,
+                "srcset": get_srcset(
+                    image_url, row.width, [(rendition["url"], rendition["width"]) for rendition in image_renditions]
+                ),
+            })
+        return data
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    image = PublicImageSerializer(read_only=True)
+
+    class Meta:
+        model = UploadJob
+        fields = [
+            "id", "status", "error", "image", "created_at", "updated_at"
         ]
@@ -0,0 +1,18 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.images.models import Image, Rendition
+from apps.images.storage import release_image_files
+
+
+@receiver(post_delete, sender=Image)
+def release_image_file(sender, instance: Image, **kwargs) -> None:
+    transaction.on_commit(partial(release_image_files, [instance.image.name]))
+
+
+@receiver(post_delete, sender=Rendition)
+def release_rendition_file(sender, instance: Rendition, **kwargs) -> None:
+    transaction.on_commit(partial(release_image_files, [instance.file.name]))
@@ -0,0 +1,267 @@
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import uuid
+from collections import defaultdict
+from functools import partial
+from typing import Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+IMAGES_DIR = "images"
+# Sharded names have the form "images/ab/cd/abcd<28 more hex digits>.ext"
+SHARDED_NAME_RE = r"^images/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}(\.[^/]*)?$"
+
+
+def get_sharded_name(directory: str, key: str, filename: str) -> str:
+    """
+    Function for getting a name of a stored file inside a sharded layout,
+    where files are spread between subfolders named after the first 2 pairs of the key's digits.
+    It keeps the amount of files in a single folder low, even with millions of stored files.
+
+    :param directory: Top folder of stored files
+    :param key: 32 hex digits identifying the file
+    :param filename: Original name of the file (only its extension is kept)
+    :return: Name of the stored file, like "directory/ab/cd/abcd....ext"
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return posixpath.join(directory, key[:2], key[2:4], key + extension)
+
+
+def image_upload_to(instance, filename: str) -> str:
+    """
+    Function used as "upload_to" of image files. Every file gets a random key.
+
+    :param instance: Image object the file belongs to
+    :param filename: Original name of the file
+    :return: Name of the stored file
+    """
+    return get_sharded_name(IMAGES_DIR, uuid.uuid4().hex, filename)
+
+
+def is_sharded_name(name: str) -> bool:
+    return re.match(SHARDED_NAME_RE, name) is not None
+
+
+class ImageStorage(FileSystemStorage):
+    """
+    File system storage, which does not look for an available name of files in the sharded layout.
+    Their keys are random (see image_upload_to), so checking if they are taken with "exists" calls
+    would only cost disk accesses on every upload. In the practically impossible case of a collision,
+    _save draws a new key instead of overwriting the file: written files are created exclusively (O_EXCL),
+    while temporary files are moved only if no file exists under the name. That check is not atomic
+    with the move, so it only guards against collisions, not against concurrent saves of the same name.
+    Other files are named like in FileSystemStorage.
+    """
+
+    def save(self, name: Optional[str], content, max_length: Optional[int] = None) -> str:
+        if name is None or not is_sharded_name(name):
+            return super().save(name, content, max_length)
+        # Sharded names are already valid, and are not probed (get_available_name is called
+        # by _save only if the file turns out to exist)
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        return self._save(name, content)
+
+    def get_available_name(self, name: str, max_length: Optional[int] = None) -> str:
+        if not is_sharded_name(name):
+            return super().get_available_name(name, max_length)
+        # Name is taken - the first 4 digits of the key (which name the folders) are kept,
+        # since _save does not create folders for the new name
+        directory, filename = posixpath.split(name)
+        key = filename[:4] + uuid.uuid4().hex[4:]
+        return posixpath.join(directory, key + os.path.splitext(filename)[1])
+
+
+def get_migrated_name(name: str) -> str:
+    """
+    Function for getting a sharded name of a file stored in the old, flat layout.
+    The key is derived from the old name, so a migration interrupted after copying
+    a file finds the same copy, when it's resumed.
+
+    :param name: Name of the file in the flat layout
+    :return: Name of the file in the sharded layout
+    """
+    key = hashlib.sha256(name.encode()).hexdigest()[:32]
+    return get_sharded_name(IMAGES_DIR, key, name)
+
+
+def migrate_image_files(batch_size: int = 1000, keep_old: bool = False) -> Iterator[Tuple[int, int]]:
+    """
+    Function moving image files stored in the old, flat layout into the sharded one.
+    Files are processed in batches: a batch is copied first, then its rows are updated
+    in a single transaction, and old files are removed only after it commits.
+    Only rows with non-sharded names are selected, so an interrupted migration
+    can simply be started again. Old names are kept as original names of the objects, if they have none.
+
+    :param batch_size: Amount of image objects processed in a single transaction
+    :param keep_old: Whether old files should be left in place
+    :return: Iterator of amounts of migrated and failed image objects, for every batch
+    """
+    from apps.images.models import Image
+
+    storage = Image._meta.get_field("image").storage
+    pending = Image.objects.exclude(image__regex=SHARDED_NAME_RE).exclude(image="").order_by("id")
+    last_id = 0
+    while True:
+        rows = list(pending.filter(id__gt=last_id).values_list("id", "image", "original_name")[:batch_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        copied = {}
+        failed = 0
+        for image_id, name, original_name in rows:
+            new_name = get_migrated_name(name)
+            try:
+                # Copy left by an interrupted migration may be incomplete
+                if storage.exists(new_name) and storage.size(new_name) != storage.size(name):
+                    storage.delete(new_name)
+                if not storage.exists(new_name):
+                    with storage.open(name, "rb") as file:
+                        new_name = storage.save(new_name, file)
+            except OSError as e:
+                logger.error("File of image %s (%s) could not be migrated: %s", image_id, name, e)
+                failed += 1
+                continue
+            copied[image_id] = (name, new_name, original_name or Image.get_original_name(name))
+
+        migrated = set()
+        with transaction.atomic():
+            now = timezone.now()
+            for image_id, (name, new_name, original_name) in copied.items():
+                # Objects changed or removed in the meantime are skipped
+                updated = Image.objects.filter(id=image_id, image=name).update(
+                    image=new_name, original_name=original_name, updated_at=now
+                )
+                if updated:
+                    migrated.add(image_id)
+            # Copies of skipped objects, and old files of migrated ones
+            obsolete = [copied[image_id][1] for image_id in copied if image_id not in migrated]
+            if not keep_old:
+                obsolete += [copied[image_id][0] for image_id in migrated]
+            transaction.on_commit(partial(_delete_files, storage, obsolete))
+
+        yield len(migrated), failed
+
+
+def create_missing_renditions(batch_size: int = 100) -> Iterator[Tuple[int, int]]:
+    """
+    Function creating renditions of image objects stored without them (e.g. uploaded before renditions were
+    introduced), out of their stored files. Image objects sharing a file share its renditions as well,
+    including ones created for other image objects earlier. Images are resized while holding resize slots,
+    which are waited for. Modification times of updated objects are bumped, so their ETags change.
+    Only objects wider than the smallest rendition width, and without any renditions, are selected,
+    so an interrupted run can simply be started again.
+
+    :param batch_size: Amount of image objects processed in a single transaction
+    :return: Iterator of amounts of updated and failed image objects, for every batch
+    """
+    from apps.images.admission import waiting_for_slots
+    from apps.images.models import Image, Rendition
+    from apps.images.utils import prepare_image_with_renditions
+
+    widths = [width for width in settings.IMAGES_RENDITION_WIDTHS if width > 0]
+    if not widths:
+        return
+    storage = Image._meta.get_field("image").storage
+    pending = Image.objects.filter(renditions__isnull=True, width__gt=min(widths)).exclude(image="").order_by("id")
+    last_id = 0
+    while True:
+        rows = list(pending.filter(id__gt=last_id).values_list("id", "image")[:batch_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        image_ids = defaultdict(list)
+        for image_id, name in rows:
+            image_ids[name].append(image_id)
+
+        # Renditions of files, which other image objects already have
+        shared = defaultdict(dict)
+        for rendition in Rendition.objects.filter(image__image__in=image_ids).select_related("image"):
+            shared[rendition.image.image.name].setdefault(rendition.image_id, []).append(rendition)
+
+        updated = failed = 0
+        for name, ids in image_ids.items():
+            renditions = []
+            try:
+                if shared[name]:
+                    renditions = [
+                        (rendition.file.name, rendition.width, rendition.height)
+                        for rendition in next(iter(shared[name].values()))
+                    ]
+                else:
+                    with storage.open(name, "rb") as file, waiting_for_slots():
+                        # Stored names are not valid names of new files
+                        file.name = posixpath.basename(name)
+                        _, _, _, renditions = prepare_image_with_renditions(file, 0, 0, widths)
+                # Files in unsupported formats get no renditions
+                if renditions:
+                    updated += _save_renditions(name, ids, renditions)
+            except Exception as e:
+                logger.error("Renditions of image(s) %s (%s) could not be created: %s", ids, name, e)
+                failed += len(ids)
+            finally:
+                # Removes temporary files, which were not moved into the storage
+                for file, _, _ in renditions:
+                    if isinstance(file, File):
+                        file.close()
+
+        yield updated, failed
+
+
+def _save_renditions(name: str, image_ids: Iterable[int], renditions: Iterable[tuple]) -> int:
+    from apps.images.models import Image, Rendition
+
+    with transaction.atomic():
+        # Objects changed or removed in the meantime are skipped
+        image_ids = list(Image.objects.select_for_update().filter(id__in=image_ids, image=name).values_list(
+            "id", flat=True
+        ))
+        for image_id in image_ids:
+            created = Rendition.objects.bulk_create([
+                Rendition(image_id=image_id, width=width, height=height, file=file)
+                for file, width, height in renditions
+            ], ignore_conflicts=True)
+            # Files are moved into the storage only once, and the rest of the objects share them
+            renditions = [(rendition.file.name, rendition.width, rendition.height) for rendition in created]
+        Image.objects.filter(id__in=image_ids).update(updated_at=timezone.now())
+    return len(image_ids)
+
+
+def release_image_files(names: Iterable[str]) -> None:
+    """
+    Function for removing image files, which are no longer used. Files can be shared by many
+    image and rendition objects (see Image.create), so they are reference-counted by the objects pointing at them,
+    and are removed only when none are left. It should be called after removing objects is committed.
+
+    :param names: Names of files, whose image or rendition objects were removed
+    """
+    from apps.images.models import Image, Rendition
+
+    names = {name for name in names if name}
+    if not names:
+        return
+    used = set(Image.objects.filter(image__in=names).values_list("image", flat=True))
+    used.update(Rendition.objects.filter(file__in=names - used).values_list("file", flat=True))
+    _delete_files(Image._meta.get_field("image").storage, names - used)
+
+
+def _delete_files(storage, names) -> None:
+    from apps.images.variants import NEGOTIABLE_FORMATS, get_negotiated_name
+
+    for name in names:
+        # Variants in negotiated formats are kept next to their files (see apps.images.variants.get_negotiated_file)
+        for removed in [name, *(get_negotiated_name(name, extension) for extension in NEGOTIABLE_FORMATS)]:
+            try:
+                storage.delete(removed)
+            except OSError as e:
+                logger.warning("File %s could not be removed: %s", removed, e)
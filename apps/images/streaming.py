@@ -0,0 +1,51 @@
+from itertools import islice
+from typing import Iterable, Iterator, Type
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+
+
+def stream_json_array(
+        objects: Iterable, serializer_class: Type[BaseSerializer], chunk_size: int
+) -> Iterator[bytes]:
+    """
+    Generator rendering objects into a JSON array piece by piece.
+    Objects are serialized and rendered in chunks, so only a single chunk
+    is kept in memory at a time. Produced bytes are identical to rendering
+    the whole serialized list at once with DRF's JSONRenderer.
+
+    :param objects: Iterable of objects to serialize (e.g. queryset's iterator)
+    :param serializer_class: Serializer used for every object
+    :param chunk_size: Amount of objects serialized and rendered at once
+    :return: Iterator of JSON fragments
+    """
+    renderer = JSONRenderer()
+    objects = iter(objects)
+    yield b"["
+    separator = b""
+    while chunk := list(islice(objects, chunk_size)):
+        rendered = renderer.render(serializer_class(chunk, many=True).data)
+        # Strip the enclosing brackets of the rendered chunk
+        yield separator + rendered[1:-1]
+        separator = b","
+    yield b"]"
+
+
+def get_streaming_json_response(
+        queryset, serializer_class: Type[BaseSerializer], chunk_size: int
+) -> StreamingHttpResponse:
+    """
+    Function for creating a response, which streams a queryset as a JSON array.
+    Queryset is read with a server-side cursor, chunk by chunk, so memory usage
+    does not depend on the amount of matching rows.
+
+    :param queryset: Queryset of objects to return
+    :param serializer_class: Serializer used for every object
+    :param chunk_size: Amount of rows fetched from the database and rendered at once
+    :return: Streaming response
+    """
+    return StreamingHttpResponse(
+        stream_json_array(queryset.iterator(chunk_size=chunk_size), serializer_class, chunk_size),
+        content_type="application/json"
+    )
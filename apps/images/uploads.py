@@ -0,0 +1,48 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingUploadHandlerMixin:
+    """
+    Mixin of upload handlers, which computes SHA-256 digest of received files while they are streamed in,
+    and stores it as "content_hash" attribute of the resulting uploaded files (see get_content_hash).
+    Received data of files exceeding IMAGES_MAX_UPLOAD_SIZE is dropped, and the rest is only counted,
+    so they are not kept in memory or on disk. Such files are completed empty, with their full size,
+    and rejected by validation of their size (see apps.images.forms.LimitedImageField).
+    """
+
+    def new_file(self, *args, **kwargs) -> None:
+        # Memory handler stops other handlers with an exception, so the digest is created first
+        self.digest = hashlib.sha256()
+        self.oversized = False
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data: bytes, start: int):
+        if self.oversized:
+            return None
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            # Chunk was consumed by this handler, so it's a part of its file
+            self.digest.update(raw_data)
+            max_size = settings.IMAGES_MAX_UPLOAD_SIZE
+            if max_size and start + len(raw_data) > max_size:
+                self.oversized = True
+                self.file.seek(0)
+                self.file.truncate()
+        return remaining
+
+    def file_complete(self, file_size: int):
+        file = super().file_complete(file_size)
+        if file is not None and not self.oversized:
+            file.content_hash = self.digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
@@ -1,8 +1,21 @@
+from django.conf import settings
 from django.urls import path
 
-from apps.images.views import ImagesView, SingleImageView
+from apps.images.views import (
+    ImagesView, BatchImagesView, SingleImageView, RenderImageView, UploadJobView, CacheStatsView
+)
+
+if settings.IMAGES_ASYNC_VIEWS:
+    # Reads are served by async views, which only make sense under an ASGI server
+    from apps.images.async_views import images_view, single_image_view
+else:
+    images_view, single_image_view = ImagesView.as_view(), SingleImageView.as_view()
 
 urlpatterns = [
-    path("images/", ImagesView.as_view(), name="images_view"),
-    path("images/<int:image_id>", SingleImageView.as_view(), name="single_image_view"),
+    path("images/", images_view, name="images_view"),
+    path("images/batch", BatchImagesView.as_view(), name="batch_images_view"),
+    path("images/<int:image_id>", single_image_view, name="single_image_view"),
+    path("images/<int:image_id>/render", RenderImageView.as_view(), name="render_image_view"),
+    path("images/jobs/<int:job_id>", UploadJobView.as_view(), name="upload_job_view"),
+    path("images/cache/stats", CacheStatsView.as_view(), name="cache_stats_view"),
 ]
@@ -1,10 +1,16 @@
-from io import BytesIO
-from typing import Any
+import hashlib
+import os
+import tempfile
+import warnings
+from typing import Any, BinaryIO, Iterable, List, Optional, Tuple, Union
 
 from PIL import Image
+from django.conf import settings
 from django.core.files import File
 from rest_framework.response import Response
 
+from apps.images.admission import resize_slot
+
 image_types = {
     "jpg": "JPEG",
     "jpeg": "JPEG",
@@ -17,6 +23,17 @@ image_types = {
 }
 
 
+# Resampling filters, which can be set in encoder profiles
+resample_filters = {
+    "nearest": Image.Resampling.NEAREST,
+    "box": Image.Resampling.BOX,
+    "bilinear": Image.Resampling.BILINEAR,
+    "hamming": Image.Resampling.HAMMING,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+
 def get_error_response(error: Any, status: int) -> Response:
     """
     Function for creating a predictable error response.
@@ -32,32 +49,314 @@ class ImagePreparationError(Exception):
     pass
 
 
+class ImageTooLargeError(ImagePreparationError):
+    pass
+
+
+class TemporaryImageFile(File):
+    """
+    Image file written to a temporary file on disk (in FILE_UPLOAD_TEMP_DIR). Like uploaded
+    temporary files, it's moved into place by file system storage, instead of being copied.
+    The temporary file is removed when it's closed, unless it has been moved already.
+    """
+
+    def __init__(self, name: str, path: Optional[str] = None):
+        """
+        :param name: Name of the image file
+        :param path: Path of an existing temporary file. If not provided, a new empty file is created
+        """
+        if path is None:
+            fd, path = tempfile.mkstemp(
+                suffix=".upload" + os.path.splitext(name)[1], dir=settings.FILE_UPLOAD_TEMP_DIR
+            )
+            file = os.fdopen(fd, "w+b")
+        else:
+            file = open(path, "rb")
+        super().__init__(file, name)
+        self.path = path
+
+    def temporary_file_path(self) -> str:
+        return self.path
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def get_content_hash(image_file: File) -> str:
+    """
+    Function for getting SHA-256 digest of a file's content. Files uploaded through
+    hashing upload handlers (see apps.images.uploads) carry the digest computed while
+    they were received, other files are read once.
+
+    :param image_file: Image file
+    :return: Hex digest of the file's content
+    """
+    content_hash = getattr(image_file, "content_hash", None)
+    if content_hash:
+        return content_hash
+    digest = hashlib.sha256()
+    for chunk in image_file.chunks():
+        digest.update(chunk)
+    image_file.seek(0)
+    return digest.hexdigest()
+
+
+def get_image_format(filename: str) -> str:
+    """
+    Function for getting Pillow's format name for a file, based on its extension.
+
+    :param filename: Name of the image file
+    :return: Pillow's image format name (e.g. "JPEG")
+    """
+    img_suffix = filename.split(".")[-1].lower()
+    if img_suffix not in image_types:
+        raise ImagePreparationError(f"File format \"{img_suffix}\" is not supported")
+    return image_types[img_suffix]
+
+
+def get_mime_type(img_format: str) -> str:
+    """
+    Function for getting MIME type of Pillow's image format.
+
+    :param img_format: Pillow's image format name (e.g. "JPEG")
+    :return: MIME type (e.g. "image/jpeg")
+    """
+    Image.init()
+    return Image.MIME.get(img_format, "application/octet-stream")
+
+
+def get_output_size(img_width: int, img_height: int, width: int, height: int) -> (int, int):
+    """
+    Function for calculating final size of a scaled image.
+    If either width or height are 0, it will be calculated from the other
+    one, keeping the original aspect ratio.
+
+    :param img_width: Original width of the image
+    :param img_height: Original height of the image
+    :param width: Intended resulting width of the image
+    :param height: Intended resulting height of the image
+    :return: Tuple of final width and height
+    """
+    if not width:
+        width = int(img_width * height / img_height)
+    if not height:
+        height = int(img_height * width / img_width)
+    return width, height
+
+
+def get_encoder_profile(img_format: str) -> dict:
+    """
+    Function for getting the encoder profile of an output format (see IMAGES_ENCODER_PROFILES setting).
+
+    :param img_format: Pillow's image format name
+    :return: Dict with "resample" filter (one of resample_filters, or None for Pillow's default),
+    and "options" passed to Pillow's encoder
+    """
+    options = dict(settings.IMAGES_ENCODER_PROFILES.get(img_format, {}))
+    resample = options.pop("resample", None)
+    return {"resample": resample_filters[resample.lower()] if resample else None, "options": options}
+
+
+def resize_image(img: Image.Image, output_size: (int, int), img_format: Optional[str] = None) -> Image.Image:
+    """
+    Function for scaling a Pillow image to the provided size.
+    Resampling filter is taken from the encoder profile of the output format.
+
+    With IMAGES_RESIZE_MODE set to "speed", large downscales are done in two steps.
+    JPEG images are decoded directly at a reduced scale (DCT draft mode), and
+    the remaining ratio is first reduced by an integer factor (Image.reduce),
+    before the final resampling. With "fidelity", the whole image is decoded
+    and resampled at once.
+
+    :param img: Pillow image. To use draft mode, it must not be loaded yet
+    :param output_size: Tuple of resulting width and height
+    :param img_format: Pillow's name of the output format (Pillow's default filter is used, if not provided)
+    :return: Scaled Pillow image
+    """
+    resample = get_encoder_profile(img_format)["resample"] if img_format else None
+    if settings.IMAGES_RESIZE_MODE == "speed":
+        if img.format == "JPEG":
+            img.draft(img.mode, output_size)
+        return img.resize(output_size, resample=resample, reducing_gap=settings.IMAGES_RESIZE_REDUCING_GAP)
+    return img.resize(output_size, resample=resample)
+
+
+def encode_image(img: Image.Image, output: BinaryIO, img_format: str, **options) -> None:
+    """
+    Function for saving a Pillow image in the provided format,
+    with options from the format's encoder profile.
+
+    :param img: Pillow image
+    :param output: Binary file-like object, the image will be written into
+    :param img_format: Pillow's image format name
+    :param options: Additional options of the encoder (e.g. "exif" or "icc_profile" metadata)
+    """
+    if img_format == "JPEG" and img.mode not in ("RGB", "L", "CMYK"):
+        img = img.convert("RGB")
+    img.save(output, format=img_format, **{**get_encoder_profile(img_format)["options"], **options})
+
+
+def check_image_limits(image_size: (int, int), output_size: Optional[Tuple[int, int]] = None) -> None:
+    """
+    Function for checking sizes of an image against the configured limits
+    (IMAGES_MAX_PIXELS and IMAGES_MAX_OUTPUT_SIZE).
+
+    :param image_size: Tuple of the image's width and height
+    :param output_size: Tuple of the resulting width and height, if the image is scaled
+    """
+    max_pixels = settings.IMAGES_MAX_PIXELS
+    if max_pixels and image_size[0] * image_size[1] > max_pixels:
+        raise ImageTooLargeError(
+            f"Image has {image_size[0]}x{image_size[1]} pixels, at most {max_pixels} pixels are allowed"
+        )
+    max_output_size = settings.IMAGES_MAX_OUTPUT_SIZE
+    if output_size and max_output_size and max(output_size) > max_output_size:
+        raise ImagePreparationError(
+            f"Resulting size {output_size[0]}x{output_size[1]} is too large, "
+            f"at most {max_output_size} pixels are allowed on each side"
+        )
+
+
+def get_image_size(image_file: File) -> (int, int):
+    """
+    Function for reading size of an image from its header, without decoding any of its pixels.
+    Images, whose sizes exceed Pillow's own decompression bomb limit, are reported as too large.
+
+    :param image_file: Image file
+    :return: Tuple of the image's width and height
+    """
+    try:
+        with warnings.catch_warnings():
+            # Pillow warns about images above its limit, which is checked separately
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(get_image_source(image_file)) as img:
+                return img.size
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    finally:
+        image_file.seek(0)
+
+
+def get_image_source(image_file: File) -> Union[str, File]:
+    """
+    Function for getting what an image file should be opened from with Pillow.
+    Files stored on disk (like large uploads) are opened by their paths, so Pillow reads
+    them directly (memory-mapping them, where the format allows it).
+
+    :param image_file: Image file
+    :return: Path of the file, or the file itself
+    """
+    if hasattr(image_file, "temporary_file_path"):
+        return image_file.temporary_file_path()
+    return image_file
+
+
+def encode_temporary_image(img: Image.Image, name: str, img_format: str) -> TemporaryImageFile:
+    """
+    Function for encoding a Pillow image into a temporary file (see TemporaryImageFile).
+
+    :param img: Pillow image
+    :param name: Name of the resulting file
+    :param img_format: Pillow's image format name
+    :return: Temporary file with the encoded image, positioned at its beginning
+    """
+    output = TemporaryImageFile(name)
+    try:
+        encode_image(img, output, img_format)
+        output.seek(0)
+    except BaseException:
+        output.close()
+        raise
+    return output
+
+
 def prepare_image(image_file: File, width: int, height: int) -> (File, int, int):
     """
     Function for scaling an image, given as a File, to fit provided size.
     If either width or height are 0, image will be scaled to one of
     the sizes (non-zero one), while keeping its aspect ratio.
-    If both are 0, image will not be scaled.
+    If both are 0, or the resulting size is the same as the original one,
+    image will not be scaled, and the original file is returned.
+    Sizes are read from the file's header, and checked against configured limits (see check_image_limits),
+    before any pixel data is decoded. Images are decoded, scaled and encoded only while holding
+    a resize slot (see apps.images.admission.resize_slot), which raises ResizeCapacityError, if all are taken.
+
+    Scaled images are encoded straight into a temporary file (see TemporaryImageFile),
+    which is then moved into the storage. Neither the uploaded, nor the resulting file's content
+    is ever buffered in memory as a whole, so the peak memory used by an upload is bounded
+    by its decoded pixels: width * height * bands bytes of the source image (less for JPEG
+    in "speed" resize mode) and the same for the scaled one, plus encoders' fixed-size buffers.
 
     :param image_file: A file containing an image
     :param width: Intended resulting width of the image
     :param height: Intended resulting height of the image
     :return: Tuple of resulting image file, and its final width and height
     """
-    img = Image.open(image_file)
-    if width or height:
-        if not width:
-            width = int(img.width * height / img.height)
-        if not height:
-            height = int(img.height * width / img.width)
-        output_size = (width, height)
-        img = img.resize(output_size)
-        img_suffix = image_file.name.split(".")[-1].lower()
-        if img_suffix not in image_types:
-            raise ImagePreparationError(f"File format \"{img_suffix}\" is not supported")
-        img_format = image_types[img_suffix]
-        buffer = BytesIO()
-        img.save(buffer, format=img_format)
-        return File(buffer, name=image_file.name), width, height
-    return image_file, img.width, img.height
+    result, width, height, _ = prepare_image_with_renditions(image_file, width, height, ())
+    return result, width, height
+
+
+def prepare_image_with_renditions(
+        image_file: File, width: int, height: int, rendition_widths: Iterable[int]
+) -> (File, int, int, List[Tuple[File, int, int]]):
+    """
+    Function for scaling an image, like prepare_image, and creating its renditions
+    (smaller copies in provided widths, keeping the aspect ratio) out of the same, single decode.
+    Renditions are scaled step by step, from the largest to the smallest, each one out of the previous one,
+    and encoded into temporary files in the same format. Only widths smaller than the resulting image's are created,
+    and none are created for files in unsupported formats, which are not scaled.
+
+    :param image_file: A file containing an image
+    :param width: Intended resulting width of the image
+    :param height: Intended resulting height of the image
+    :param rendition_widths: Widths of renditions
+    :return: Tuple of resulting image file, its final width and height,
+    and a list of renditions' files with their widths and heights (from the largest)
+    """
+    with Image.open(get_image_source(image_file)) as img:
+        output_size = get_output_size(img.width, img.height, width, height) if width or height else None
+        # Limits are checked before any pixel data is decoded
+        check_image_limits(img.size, output_size)
+        final_size = output_size or img.size
+        if output_size:
+            img_format = get_image_format(image_file.name)
+        else:
+            img_format = image_types.get(os.path.splitext(image_file.name)[1][1:].lower())
+        rendition_sizes = [
+            get_output_size(*final_size, rendition_width, 0)
+            for rendition_width in sorted(set(rendition_widths), reverse=True)
+            if img_format and 0 < rendition_width < final_size[0]
+        ]
+        rendition_sizes = [size for size in rendition_sizes if size[1] > 0]
+        scaled = output_size is not None and (output_size != img.size or img.format != img_format)
+        if not scaled and not rendition_sizes:
+            image_file.seek(0)
+            return image_file, *final_size, []
 
+        created = []
+        try:
+            with resize_slot():
+                output = image_file
+                if scaled:
+                    img = resize_image(img, output_size, img_format)
+                    output = encode_temporary_image(img, image_file.name, img_format)
+                    created.append(output)
+                renditions = []
+                for size in rendition_sizes:
+                    img = resize_image(img, size, img_format)
+                    rendition = encode_temporary_image(img, image_file.name, img_format)
+                    created.append(rendition)
+                    renditions.append((rendition, *size))
+        except BaseException:
+            for file in created:
+                file.close()
+            raise
+    if output is image_file:
+        image_file.seek(0)
+    return output, *final_size, renditions
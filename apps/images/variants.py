@@ -0,0 +1,386 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, BinaryIO, Dict, Optional, Tuple
+
+from PIL import Image as PillowImage, ImageOps
+from django.conf import settings
+
+from apps.images.admission import ResizeCapacityError, resize_slot
+from apps.images.utils import (
+    image_types, get_encoder_profile, get_mime_type, get_output_size, resize_image, encode_image
+)
+
+logger = logging.getLogger(__name__)
+
+# Formats, which stored files can be re-encoded into, when clients accept them (see get_negotiated_file),
+# by extensions of their files
+NEGOTIABLE_FORMATS = {
+    "avif": "AVIF",
+    "webp": "WEBP",
+}
+# Formats of stored files, which are re-encoded into negotiated formats
+NEGOTIATED_SOURCE_FORMATS = ("JPEG", "PNG")
+# Part of the size limit, which the cache is shrunk to, once it exceeds the limit. The free space left below
+# the limit lets many variants be added before the cache directory is scanned again
+EVICTION_LOW_WATER = 0.9
+
+
+class VariantCache:
+    """
+    Size-bounded disk cache of image variants (e.g. resized or re-encoded copies of stored images).
+
+    Each variant is stored under a deterministic key, so every process serving
+    the same cache directory can reuse it. Least recently used variants are
+    removed, once the total size of the cache exceeds the configured limit
+    (down to EVICTION_LOW_WATER of the limit, so evictions are not repeated on every miss).
+    Concurrent misses of the same key within a process are coalesced, so the
+    variant is built only once, while other requests wait for the result.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        self._size_lock = threading.Lock()
+        self._key_locks = KeyLocks()
+
+    @staticmethod
+    def make_key(*parts: object) -> str:
+        """
+        Method for creating a deterministic cache key out of variant's parameters.
+
+        :param parts: Values describing the variant (source file name, size, format, etc.)
+        :return: Cache key
+        """
+        return hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()
+
+    def get_path(self, key: str, extension: str) -> Path:
+        """
+        Method for getting the location of a variant inside the cache directory.
+
+        :param key: Variant's cache key
+        :param extension: Variant's file extension
+        :return: Path to variant's file
+        """
+        return self.directory / key[:2] / f"{key}.{extension}"
+
+    def get_or_create(self, key: str, extension: str, build: Callable[[BinaryIO], None]) -> BinaryIO:
+        """
+        Method for retrieving a variant from the cache, building it on a miss.
+
+        :param key: Variant's cache key
+        :param extension: Variant's file extension
+        :param build: Callable writing variant's content into provided binary file
+        :return: Variant's file, opened for reading
+        """
+        path = self.get_path(key, extension)
+        variant = self._open(path)
+        if variant:
+            return variant
+        with self._lock_key(key):
+            # Another request might have built the variant while this one was waiting
+            variant = self._open(path)
+            if variant:
+                return variant
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as temp_file:
+                    build(temp_file)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            # Opened before eviction, so the file stays readable even if it gets removed
+            variant = open(path, "rb")
+        self._add_size(os.fstat(variant.fileno()).st_size)
+        return variant
+
+    def evict(self) -> None:
+        """
+        Method for removing least recently used variants, until the cache shrinks to EVICTION_LOW_WATER
+        of its size limit.
+        """
+        target = int(self.max_bytes * EVICTION_LOW_WATER)
+        entries = []
+        for path in self.directory.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._size_lock:
+            self._size = total
+
+    @staticmethod
+    def _open(path: Path) -> Optional[BinaryIO]:
+        # Modification time marks the last use of a variant
+        try:
+            os.utime(path)
+            return open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+    def _add_size(self, size: int) -> None:
+        with self._size_lock:
+            if self._size is not None:
+                self._size += size
+            needs_eviction = self._size is None or self._size > self.max_bytes
+        if needs_eviction:
+            self.evict()
+
+    def _lock_key(self, key: str) -> "_KeyLock":
+        return self._key_locks.lock(key)
+
+
+class KeyLocks:
+    """
+    Set of per-key locks, coalescing concurrent builds of the same file within a process.
+    Locks are reference-counted, so they are removed once no request is waiting for them.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._locks_lock = threading.Lock()
+
+    def lock(self, key: str) -> "_KeyLock":
+        """
+        Method for getting a context manager, which holds the lock of provided key.
+
+        :param key: Key of the lock
+        :return: Context manager holding the lock
+        """
+        return _KeyLock(self, key)
+
+    def __len__(self) -> int:
+        # Amount of keys, which are locked or waited for
+        with self._locks_lock:
+            return len(self._locks)
+
+
+class _KeyLock:
+    """
+    Context manager holding a single lock of KeyLocks.
+    """
+
+    def __init__(self, locks: KeyLocks, key: str):
+        self.locks = locks
+        self.key = key
+
+    def __enter__(self) -> None:
+        with self.locks._locks_lock:
+            lock, waiting = self.locks._locks.get(self.key, (threading.Lock(), 0))
+            self.locks._locks[self.key] = (lock, waiting + 1)
+        lock.acquire()
+
+    def __exit__(self, *args) -> None:
+        with self.locks._locks_lock:
+            lock, waiting = self.locks._locks[self.key]
+            if waiting == 1:
+                del self.locks._locks[self.key]
+            else:
+                self.locks._locks[self.key] = (lock, waiting - 1)
+        lock.release()
+
+
+_variant_caches: Dict[Tuple[str, int], VariantCache] = {}
+_variant_caches_lock = threading.Lock()
+
+
+def get_variant_cache() -> VariantCache:
+    """
+    Function for getting the variant cache configured in settings.
+
+    :return: Process-wide VariantCache instance
+    """
+    config = (str(settings.IMAGES_VARIANT_CACHE_DIR), settings.IMAGES_VARIANT_CACHE_MAX_BYTES)
+    with _variant_caches_lock:
+        if config not in _variant_caches:
+            _variant_caches[config] = VariantCache(*config)
+        return _variant_caches[config]
+
+
+def get_image_variant(image_file, width: int, height: int, extension: str) -> BinaryIO:
+    """
+    Function for getting a cached variant of a stored image, scaled to fit
+    provided size and encoded in provided format. The variant is built on first request,
+    while holding a resize slot (see apps.images.admission.resize_slot).
+
+    :param image_file: Stored image's file (e.g. Image.image)
+    :param width: Intended width of the variant (0 keeps aspect ratio, or original size)
+    :param height: Intended height of the variant (0 keeps aspect ratio, or original size)
+    :param extension: Extension of variant's format, one of image_types' keys
+    :return: Variant's file, opened for reading
+    """
+    img_format = image_types[extension.lower()]
+    cache = get_variant_cache()
+    # Variants are rebuilt, when the format's encoder profile changes
+    profile = get_encoder_profile(img_format)
+    key = cache.make_key(
+        image_file.name, width, height, img_format, profile["resample"], sorted(profile["options"].items())
+    )
+
+    def build(output: BinaryIO) -> None:
+        with image_file.open("rb") as source, resize_slot():
+            img = PillowImage.open(source)
+            if width or height:
+                img = resize_image(img, get_output_size(img.width, img.height, width, height), img_format)
+            encode_image(img, output, img_format)
+
+    return cache.get_or_create(key, img_format.lower(), build)
+
+
+_negotiated_locks = KeyLocks()
+
+
+def parse_accept(header: str) -> Dict[str, float]:
+    """
+    Function for parsing an "Accept" header.
+
+    :param header: Value of the header
+    :return: Dict of quality values ("q" parameters) by media ranges
+    """
+    accepted = {}
+    for item in header.split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[media_range.lower()] = max(quality, accepted.get(media_range.lower(), 0.0))
+    return accepted
+
+
+def is_encodable(img_format: str) -> bool:
+    # Some formats (e.g. AVIF) are supported only by some builds of Pillow
+    PillowImage.init()
+    return img_format in PillowImage.SAVE
+
+
+def get_accepted_format(accept: str, img_format: Optional[str]) -> Optional[str]:
+    """
+    Function for choosing the best format of a stored image for a client, out of IMAGES_NEGOTIATED_FORMATS.
+    Only formats listed in the header explicitly are chosen, since wildcards ("image/*", "*/*")
+    are sent also by clients, which do not support them. Formats with equal quality values
+    are chosen in the order of the setting.
+
+    :param accept: Value of request's "Accept" header
+    :param img_format: Pillow's format name of the stored image
+    :return: Extension of the chosen format (one of NEGOTIABLE_FORMATS' keys), or None if the stored file should be sent
+    """
+    if img_format not in NEGOTIATED_SOURCE_FORMATS or not accept:
+        return None
+    accepted = parse_accept(accept)
+    mime_type = get_mime_type(img_format)
+    stored_quality = accepted.get(
+        mime_type, accepted.get(mime_type.split("/")[0] + "/*", accepted.get("*/*", 0.0))
+    )
+    best, best_quality = None, 0.0
+    for extension in settings.IMAGES_NEGOTIATED_FORMATS:
+        negotiated_format = NEGOTIABLE_FORMATS.get(extension)
+        if negotiated_format is None or not is_encodable(negotiated_format):
+            continue
+        quality = accepted.get(get_mime_type(negotiated_format), 0.0)
+        if quality > best_quality:
+            best, best_quality = extension, quality
+    return best if best_quality >= stored_quality else None
+
+
+def get_negotiated_name(name: str, extension: str) -> str:
+    """
+    Function for getting a name of a stored file's variant in a negotiated format,
+    which is kept next to the file (e.g. "images/ab/cd/abcd....jpg.webp").
+
+    :param name: Name or path of the stored file
+    :param extension: Extension of the negotiated format
+    :return: Name or path of the variant
+    """
+    return f"{name}.{extension}"
+
+
+def get_negotiated_variant(path: str, extension: str) -> Optional[str]:
+    """
+    Function for getting a variant of a stored file, re-encoded in a negotiated format with the format's
+    encoder profile. The variant is built on first request, while holding a resize slot
+    (see apps.images.admission.resize_slot), and it's stored next to the file (see get_negotiated_name),
+    so it can be sent the same way as the file itself. Files are never changed, so variants are never stale.
+    Pixels are rotated according to the file's EXIF orientation, as it's not applied to all formats by browsers
+    (e.g. to AVIF), and the rest of the EXIF data and the ICC color profile are kept.
+
+    :param path: Absolute path of the stored file
+    :param extension: Extension of the negotiated format, one of NEGOTIABLE_FORMATS' keys
+    :return: Path of the variant, or None if it's not smaller than the file, or the file is animated
+    """
+    variant_path = get_negotiated_name(path, extension)
+    if not os.path.exists(variant_path):
+        with _negotiated_locks.lock(variant_path):
+            # Another request might have built the variant while this one was waiting
+            if not os.path.exists(variant_path):
+                with PillowImage.open(path) as img:
+                    if getattr(img, "is_animated", False):
+                        return None
+                    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                    try:
+                        with os.fdopen(fd, "wb") as temp_file, resize_slot():
+                            metadata = {}
+                            if img.info.get("icc_profile"):
+                                metadata["icc_profile"] = img.info["icc_profile"]
+                            transposed = ImageOps.exif_transpose(img)
+                            exif = transposed.getexif()
+                            if exif:
+                                metadata["exif"] = exif.tobytes()
+                            encode_image(transposed, temp_file, NEGOTIABLE_FORMATS[extension], **metadata)
+                        os.replace(temp_path, variant_path)
+                    except BaseException:
+                        os.remove(temp_path)
+                        raise
+    if os.path.getsize(variant_path) >= os.path.getsize(path):
+        return None
+    return variant_path
+
+
+def get_negotiated_file(path: str, accept: str) -> Tuple[str, Optional[str]]:
+    """
+    Function for choosing a file, which should be sent to a client instead of a stored one,
+    based on the formats it accepts (see get_accepted_format and get_negotiated_variant).
+    If the variant is not built yet, and the server is busy resizing other images,
+    or the variant can't be built (e.g. the file can't be decoded), the stored file is sent.
+
+    :param path: Absolute path of the stored file
+    :param accept: Value of request's "Accept" header
+    :return: Tuple of path of the file to send, and extension of its negotiated format (None for the stored file)
+    """
+    extension = get_accepted_format(accept, image_types.get(os.path.splitext(path)[1][1:].lower()))
+    if extension is None:
+        return path, None
+    try:
+        variant_path = get_negotiated_variant(path, extension)
+    except ResizeCapacityError:
+        return path, None
+    except Exception as e:
+        logger.warning("Variant of %s in %s format could not be built: %s", path, extension, e)
+        return path, None
+    if variant_path is None:
+        return path, None
+    return variant_path, extension
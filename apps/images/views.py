@@ -1,21 +1,45 @@
-from django.db.models import Q
-from django.http import QueryDict
+import os
+from typing import Optional
+
+from PIL import Image as PillowImage
+from django.conf import settings
+from django.db.models import Q, QuerySet, prefetch_related_objects
+from django.http import QueryDict, FileResponse, HttpResponseBase, HttpRequest, Http404
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import APISettings
 from rest_framework.views import APIView
 
-from apps.images.forms import UploadImageForm
-from apps.images.models import Image
-from apps.images.serializers import PublicImageSerializer
-from apps.images.utils import get_error_response
+from apps.images.admission import ResizeCapacityError
+from apps.images.batch import create_images
+from apps.images.cache import get_cached_image, get_cached_list, get_cache_stats
+from apps.images.conditional import conditional_response, get_image_validators, get_list_etag, get_page_etag
+from apps.images.forms import UploadImageForm, RenderImageForm
+from apps.images.jobs import create_upload_job
+from apps.images.media import serve_file
+from apps.images.models import Image, Rendition, UploadJob
+from apps.images.pagination import ImageCursorPagination
+from apps.images.serializers import PublicImageSerializer, ImageRowSerializer, UploadJobSerializer
+from apps.images.streaming import get_streaming_json_response
+from apps.images.utils import get_error_response, get_mime_type, image_types
+from apps.images.variants import (
+    NEGOTIABLE_FORMATS, NEGOTIATED_SOURCE_FORMATS, get_image_variant, get_negotiated_file
+)
 
 
 class ImagesView(APIView):
     parser_classes = [MultiPartParser]
+    pagination_class = ImageCursorPagination
 
     @swagger_auto_schema(
         operation_summary="Returns a list of image objects",
@@ -24,7 +48,22 @@ class ImagesView(APIView):
                 'title', openapi.IN_QUERY,
                 description="Returns images, whose \"title\" contains this value",
                 type=openapi.TYPE_STRING
-            )
+            ),
+            openapi.Parameter(
+                'limit', openapi.IN_QUERY,
+                description="Enables pagination and sets the maximum amount of returned objects",
+                type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'cursor', openapi.IN_QUERY,
+                description="Pagination cursor, taken from \"next\" or \"previous\" link of a previous page",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                'stream', openapi.IN_QUERY,
+                description="If \"true\", unpaginated list is streamed, using constant memory",
+                type=openapi.TYPE_BOOLEAN
+            ),
         ], responses={
             200: openapi.Response('response description', PublicImageSerializer)
         },
@@ -37,11 +76,73 @@ class ImagesView(APIView):
         URL Query parameter:
         - **title** - (*optional*) If provided, will filter out objects, whose "title" property
         does not contain provided text (case-insensitive).
+        - **limit** - (*optional*) If provided, the list will be paginated, and at most
+        this many objects will be returned (capped by the server's maximum page size).
+        - **cursor** - (*optional*) Cursor pointing at the requested page. Paginated responses
+        contain "next" and "previous" links with cursors already filled in.
+        - **stream** - (*optional*) If "true", and the list is not paginated, the response
+        will be streamed in chunks. Recommended for very large lists.
+
+        Paginated responses are ordered by "id" and have the following form:
+        `{"next": <url or null>, "previous": <url or null>, "results": [<image objects>]}`.
+
+        Responses (apart from streamed ones) contain an "ETag" header. If it's sent back in "If-None-Match" header,
+        and the list (or the page) has not changed since, the response will be empty, with status 304.
         """
         query = self.create_image_query(request.query_params)
         images = Image.objects.filter(query)
-        serializer = PublicImageSerializer(images, many=True)
-        return Response(serializer.data)
+        paginator = self.pagination_class()
+        if paginator.get_page_size(request) is not None:
+            # Validators of the whole list would cost a scan of all of its rows for every page
+            try:
+                etag = get_page_etag(images, request, paginator)
+            except APIException as e:
+                return get_error_response(str(e.detail), e.status_code)
+        elif request.query_params.get("stream", "").lower() in ("true", "1"):
+            # Streamed lists are meant for lists too long to be read twice
+            return self.get_list_response(request, images)
+        else:
+            etag = get_list_etag(images, request)
+        return conditional_response(request, etag, None, lambda: self.get_list_response(request, images, etag))
+
+    def get_list_response(self, request: Request, images: QuerySet, etag: Optional[str] = None) -> HttpResponseBase:
+        """
+        Method for creating a full response of the GET method.
+        Serialized pages and lists (apart from streamed ones) are cached under their ETags.
+
+        :param request: Handled request
+        :param images: Filtered queryset of listed image objects
+        :param etag: Current ETag of the list or page (not used by streamed lists)
+        :return: Response with the list (paginated or streamed, if requested)
+        """
+        paginator = self.pagination_class()
+        is_paginated = paginator.get_page_size(request) is not None
+        if not is_paginated and request.query_params.get("stream", "").lower() in ("true", "1"):
+            return get_streaming_json_response(
+                ImageRowSerializer.get_rows(images), ImageRowSerializer, settings.IMAGES_STREAM_CHUNK_SIZE
+            )
+        try:
+            data = get_cached_list(request, etag, lambda: self.serialize_list(request, images, paginator))
+        except APIException as e:
+            return get_error_response(str(e.detail), e.status_code)
+        return Response(data)
+
+    def serialize_list(self, request: Request, images: QuerySet, paginator: ImageCursorPagination):
+        """
+        Method for serializing a list of image objects, paginated if requested.
+
+        :param request: Handled request
+        :param images: Filtered queryset of listed image objects
+        :param paginator: Paginator of the list
+        :return: Serialized list, or serialized page with links to neighbouring pages
+        """
+        rows = ImageRowSerializer.get_rows(images)
+        page = paginator.paginate_queryset(rows, request, view=self)
+        if page is not None:
+            serializer = ImageRowSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+        serializer = ImageRowSerializer(rows, many=True)
+        return serializer.data
 
     @swagger_auto_schema(
         operation_summary="Upload image",
@@ -57,10 +158,18 @@ class ImagesView(APIView):
             ),
             openapi.Parameter(
                 'image', openapi.IN_FORM, description="Image's file", type=openapi.TYPE_FILE, required=True
-            )
+            ),
+            openapi.Parameter(
+                'async', openapi.IN_QUERY,
+                description="If \"true\", the image is processed in the background",
+                type=openapi.TYPE_BOOLEAN
+            ),
         ],
         responses={
-            200: openapi.Response('response description', PublicImageSerializer)
+            201: openapi.Response('response description', PublicImageSerializer),
+            202: openapi.Response('response description', UploadJobSerializer),
+            413: openapi.Response('Uploaded file exceeds a size limit'),
+            503: openapi.Response('Server is busy resizing other images, retry after "Retry-After" seconds'),
         },
         security=[]
     )
@@ -76,11 +185,34 @@ class ImagesView(APIView):
             - If one of them is excluded or equal to 0, the image will be scaled
             to match the provided size, while keeping original aspect ratio.
             - If both are not provided or are equal to 0, the image's size will be left intact.
-        - **image** - (*required*) Image's file. If a file with exactly the same name exists already
-        on the server, a suffix will be added to differentiate them.
+        - **image** - (*required*) Image's file. It's stored under a unique, random name,
+        while its original name is kept by the image object.
+
+        Files larger than the server's limit, and images with too many pixels are rejected
+        with status 413, before they are decoded. Too large requested sizes are rejected with status 400.
+        If the server is busy resizing other images, the upload is rejected with status 503,
+        and should be retried after the amount of seconds given in "Retry-After" header.
+
+        URL Query parameter:
+        - **async** - (*optional*) If "true", the uploaded file is stored and processed in the background.
+        The response (202) contains an upload job, whose status can be followed using the URL
+        from the "Location" header. The image object is created once the processing has finished.
         """
         serializer = UploadImageForm(request.POST, request.FILES)
         if serializer.is_valid():
+            if request.query_params.get("async", "").lower() in ("true", "1"):
+                job = create_upload_job(
+                    title=serializer.cleaned_data["title"],
+                    width=serializer.cleaned_data["width"] or 0,
+                    height=serializer.cleaned_data["height"] or 0,
+                    image=serializer.cleaned_data["image"]
+                )
+                return Response(
+                    UploadJobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={"Location": request.build_absolute_uri(
+                        reverse("upload_job_view", kwargs={"job_id": job.id})
+                    )}
+                )
             try:
                 new_obj = Image.create(
                     title=serializer.cleaned_data["title"],
@@ -88,10 +220,12 @@ class ImagesView(APIView):
                     height=serializer.cleaned_data["height"],
                     image=serializer.cleaned_data["image"]
                 )
+            except ResizeCapacityError as e:
+                return get_busy_response(e)
             except Exception as e:
                 return get_error_response(str(e), status.HTTP_400_BAD_REQUEST)
             return Response(PublicImageSerializer(new_obj).data, status=status.HTTP_201_CREATED)
-        return get_error_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        return get_error_response(serializer.errors, get_form_error_status(serializer))
 
     @classmethod
     def create_image_query(cls, args: QueryDict) -> Q:
@@ -107,6 +241,147 @@ class ImagesView(APIView):
         return query
 
 
+def get_busy_response(error: ResizeCapacityError) -> Response:
+    """
+    Function for creating a response to a request rejected by admission control.
+
+    :param error: Raised ResizeCapacityError
+    :return: Error Response with status 503 and "Retry-After" header
+    """
+    response = get_error_response(str(error), status.HTTP_503_SERVICE_UNAVAILABLE)
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def get_form_error_status(form: UploadImageForm) -> int:
+    """
+    Function for getting status of a response to an invalid upload form.
+
+    :param form: Invalid upload form
+    :return: 413 if the uploaded file exceeds a limit, 400 otherwise
+    """
+    if form.is_too_large():
+        return status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    return status.HTTP_400_BAD_REQUEST
+
+
+class BatchImagesView(APIView):
+    parser_classes = [MultiPartParser]
+
+    @swagger_auto_schema(
+        operation_summary="Upload many images at once",
+        manual_parameters=[
+            openapi.Parameter(
+                'title', openapi.IN_FORM, description="Images' titles", type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_STRING), collection_format="multi"
+            ),
+            openapi.Parameter(
+                'width', openapi.IN_FORM, description="Images' final widths. Must be >= 0",
+                type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_INTEGER), collection_format="multi"
+            ),
+            openapi.Parameter(
+                'height', openapi.IN_FORM, description="Images' final heights. Must be >= 0",
+                type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_INTEGER), collection_format="multi"
+            ),
+            openapi.Parameter(
+                'image', openapi.IN_FORM, description="Images' files", type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_FILE), collection_format="multi", required=True
+            ),
+        ],
+        responses={
+            201: openapi.Response('All images were uploaded'),
+            207: openapi.Response('Some of the images could not be uploaded'),
+        },
+        security=[]
+    )
+    def post(self, request: Request) -> Response:
+        """
+        API Endpoint for uploading and resizing many images in a single request.
+
+        Form data parameters (each one can be repeated):
+        - **image** - (*required*) Images' files.
+        - **title**, **width** and **height** - (*optional*) Parameters of images,
+        matched with files by their order. They work the same way as when uploading
+        a single image, and can be left empty for some of the images.
+
+        The response contains "results" - a list with an item for each uploaded file, in the same order.
+        Each item contains "status" (201, 400, or 413 for too large files) and either "image"
+        (created image object) or "error".
+        Status of the response is 201 if all images were uploaded, and 207 otherwise.
+        """
+        files = request.FILES.getlist("image")
+        if not files:
+            return get_error_response({"image": ["This field is required."]}, status.HTTP_400_BAD_REQUEST)
+        if len(files) > settings.IMAGES_BATCH_MAX_FILES:
+            return get_error_response(
+                f"Too many files, at most {settings.IMAGES_BATCH_MAX_FILES} can be uploaded at once",
+                status.HTTP_400_BAD_REQUEST
+            )
+        results = [None] * len(files)
+        items = []
+        for index, file in enumerate(files):
+            data = {}
+            for name in ("title", "width", "height"):
+                values = request.POST.getlist(name)
+                if index < len(values):
+                    data[name] = values[index]
+            form = UploadImageForm(data, {"image": file})
+            if form.is_valid():
+                items.append((index, form.cleaned_data))
+            else:
+                results[index] = {"status": get_form_error_status(form), "error": form.errors}
+
+        created_images = create_images([item for _, item in items])
+        # Renditions of all created image objects are fetched in a single query
+        prefetch_related_objects([created for created in created_images if isinstance(created, Image)], "renditions")
+        for (index, _), created in zip(items, created_images):
+            if isinstance(created, Image):
+                results[index] = {"status": status.HTTP_201_CREATED, "image": PublicImageSerializer(created).data}
+            else:
+                results[index] = {"status": status.HTTP_400_BAD_REQUEST, "error": str(created)}
+
+        all_created = all(result["status"] == status.HTTP_201_CREATED for result in results)
+        return Response(
+            {"results": results},
+            status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS
+        )
+
+
+@require_safe
+def serve_media(request: HttpRequest, name: str) -> HttpResponseBase:
+    """
+    View serving files of image objects from MEDIA_ROOT. Only files, which belong to an existing
+    image object or its rendition, are served, under their original names. Sending is handed off to the front proxy,
+    if one is configured. JPEG and PNG files are sent re-encoded in a smaller format (e.g. WebP),
+    if the client accepts it (see apps.images.variants.get_negotiated_file).
+
+    :param request: Handled request
+    :param name: Name of the file, relative to MEDIA_ROOT
+    :return: Response sending the file
+    """
+    original_name = Image.objects.filter(image=name).values_list("original_name", flat=True).first()
+    if original_name is None:
+        rendition = Rendition.objects.filter(file=name).values_list("image__original_name", "width").first()
+        if rendition is None:
+            raise Http404(f"File {name} not found")
+        original_name = Rendition.get_original_name(*rendition)
+    try:
+        path = Image.image.field.storage.path(name)
+        path, extension = get_negotiated_file(path, request.META.get("HTTP_ACCEPT", ""))
+        content_type = None
+        if extension:
+            content_type = get_mime_type(NEGOTIABLE_FORMATS[extension])
+            original_name = f"{os.path.splitext(original_name)[0]}.{extension}" if original_name else ""
+        response = serve_file(request, path, content_type=content_type, filename=original_name or None)
+    except FileNotFoundError:
+        raise Http404(f"File {name} not found")
+    stored_format = image_types.get(os.path.splitext(name)[1][1:].lower())
+    if settings.IMAGES_NEGOTIATED_FORMATS and stored_format in NEGOTIATED_SOURCE_FORMATS:
+        # Sent file depends on formats accepted by the client
+        patch_vary_headers(response, ["Accept"])
+    return response
+
+
 class SingleImageView(APIView):
     @swagger_auto_schema(
         operation_summary="Get image object",
@@ -121,10 +396,144 @@ class SingleImageView(APIView):
 
         URL parameter:
         - **image_id** - (*required*) Image object's id.
+
+        Responses contain "ETag" and "Last-Modified" headers. If they're sent back in "If-None-Match"
+        or "If-Modified-Since" headers, and the object has not changed since,
+        the response will be empty, with status 304.
         """
-        image = Image.objects.filter(pk=image_id).first()
-        if image:
-            serializer = PublicImageSerializer(image)
-            return Response(serializer.data)
+        etag, last_modified = get_image_validators(image_id)
+        if not etag:
+            return get_error_response(f"Image with id.{image_id} not found", status.HTTP_404_NOT_FOUND)
+        return conditional_response(
+            request, etag, last_modified,
+            lambda: Response(get_cached_image(
+                image_id, etag,
+                lambda: PublicImageSerializer(Image.objects.prefetch_related("renditions").get(pk=image_id)).data
+            ))
+        )
+
+
+class UploadJobView(APIView):
+    @swagger_auto_schema(
+        operation_summary="Get status of an asynchronous upload",
+        responses={
+            200: openapi.Response('response description', UploadJobSerializer)
+        },
+        security=[]
+    )
+    def get(self, request: Request, job_id: int) -> Response:
+        """
+        API Endpoint for retrieving an upload job, created by uploading an image with "async=true".
+
+        URL parameter:
+        - **job_id** - (*required*) Upload job's id.
+
+        Job's "status" is one of: "pending", "processing", "done" or "failed".
+        Once it's "done", "image" contains the created image object.
+        If it has "failed", "error" describes the reason.
+        """
+        job = UploadJob.objects.select_related("image").filter(pk=job_id).first()
+        if job:
+            return Response(UploadJobSerializer(job).data)
         else:
+            return get_error_response(f"Upload job with id.{job_id} not found", status.HTTP_404_NOT_FOUND)
+
+
+class CacheStatsView(APIView):
+    # Counters tell about the traffic of the server, so they're only shown to staff users
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Get image cache statistics",
+        responses={
+            200: openapi.Response('response description'),
+            403: openapi.Response('User is not a staff user'),
+        }
+    )
+    def get(self, request: Request) -> Response:
+        """
+        API Endpoint for retrieving hit and miss counters of the cache of serialized image objects.
+        Only available to staff users.
+
+        Response has the form: `{"hits": {"image": <int>, "list": <int>}, "misses": {"image": <int>, "list": <int>}}`.
+        """
+        return Response(get_cache_stats())
+
+
+class IgnoreFormatQueryNegotiation(DefaultContentNegotiation):
+    """
+    Content negotiation, which does not treat the "format" query parameter
+    as a renderer override, so that views can use it for their own purpose.
+    """
+    settings = APISettings({"URL_FORMAT_OVERRIDE": None})
+
+
+class RenderImageView(APIView):
+    content_negotiation_class = IgnoreFormatQueryNegotiation
+
+    @swagger_auto_schema(
+        operation_summary="Get resized and/or re-encoded image file",
+        manual_parameters=[
+            openapi.Parameter(
+                'w', openapi.IN_QUERY, description="Variant's width. Must be >= 0", type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'h', openapi.IN_QUERY, description="Variant's height. Must be >= 0", type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'format', openapi.IN_QUERY, description="Variant's format (file extension)",
+                type=openapi.TYPE_STRING, enum=list(image_types)
+            ),
+        ],
+        responses={
+            200: openapi.Response('Image file', schema=openapi.Schema(type=openapi.TYPE_FILE)),
+            400: openapi.Response('Invalid parameters, or the stored file can not be decoded'),
+            404: openapi.Response('Image object or its file not found'),
+            503: openapi.Response('Server is busy resizing other images, retry after "Retry-After" seconds'),
+        },
+        security=[]
+    )
+    def get(self, request: Request, image_id: int) -> FileResponse:
+        """
+        API Endpoint for retrieving a variant of an image object's file.
+        Variants are created on first request, and cached on the server afterwards.
+
+        URL parameter:
+        - **image_id** - (*required*) Image object's id.
+
+        URL Query parameters:
+        - **w** and **h** - (*optional*) They describe variant's size, in the same
+        way as "width" and "height" do, when uploading an image.
+        - **format** - (*optional*) Variant's format, given as a file extension.
+        If excluded, the format of the stored image is kept (if it's one of the formats above, otherwise
+        the response has status 400).
+
+        If the variant is not cached yet, and the server is busy resizing other images,
+        the response has status 503, and the request should be retried after "Retry-After" seconds.
+        """
+        form = RenderImageForm(request.query_params)
+        if not form.is_valid():
+            return get_error_response(form.errors, status.HTTP_400_BAD_REQUEST)
+        image = Image.objects.filter(pk=image_id).first()
+        if not image:
             return get_error_response(f"Image with id.{image_id} not found", status.HTTP_404_NOT_FOUND)
+        extension = (form.cleaned_data["format"] or os.path.splitext(image.image.name)[1][1:]).lower()
+        if extension not in image_types:
+            # Files uploaded without resizing keep any extension Pillow accepts
+            return get_error_response(
+                f"Format of the stored file (.{extension}) can not be kept, provide \"format\"",
+                status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            variant = get_image_variant(
+                image.image, form.cleaned_data["w"] or 0, form.cleaned_data["h"] or 0, extension
+            )
+        except ResizeCapacityError as e:
+            return get_busy_response(e)
+        except FileNotFoundError:
+            return get_error_response(f"File of image with id.{image_id} not found", status.HTTP_404_NOT_FOUND)
+        except (OSError, ValueError, PillowImage.DecompressionBombError):
+            return get_error_response(
+                f"File of image with id.{image_id} can not be decoded", status.HTTP_400_BAD_REQUEST
+            )
+        return FileResponse(variant, content_type=get_mime_type(image_types[extension]))
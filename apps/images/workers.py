@@ -0,0 +1,14 @@
+import django
+
+from apps.images.admission import use_parent_slots
+
+
+def init_worker() -> None:
+    """
+    Initializer of processes of the pool resizing batch uploads (see apps.images.batch.get_process_pool).
+    They are spawned, so they set up Django themselves. It's kept apart from the rest of the app,
+    as it's imported by the processes before Django (and its models) are set up.
+    """
+    django.setup()
+    # Slots of submitted images are held by the submitting process
+    use_parent_slots()
@@ -0,0 +1,179 @@
+"""
+Load test of read endpoints (image list and single image object) served by:
+- "wsgi" - DRF views, under a WSGI server with a pool of worker threads,
+- "asgi sync" - the same DRF views under uvicorn, where Django runs each of them in a thread,
+- "asgi async" - async views using the async ORM (IMAGES_ASYNC_VIEWS setting), under uvicorn.
+Concurrent clients keep sending requests over keep-alive connections, and requests per second,
+and 50th and 99th percentiles of latency are reported.
+
+Usage:
+    python -m benchmarks.asgi_views --rows 200 --clients 32 --workers 8 --duration 10
+    python -m benchmarks.asgi_views --cached
+
+By default responses are not cached (IMAGES_CACHE_TIMEOUT is set to 0), so every request reads the database.
+Every server runs in a fresh process, with a temporary database, so no data is modified.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.client import HTTPConnection
+
+from benchmarks.utils import setup_django, temporary_database
+
+MODES = ["wsgi", "asgi sync", "asgi async"]
+
+
+def fill_images(rows: int) -> None:
+    from apps.images.models import Image, Rendition
+    images = Image.objects.bulk_create(
+        Image(title=f"Image {i}", width=1920, height=1280, image=f"images/image_{i}.jpg") for i in range(rows)
+    )
+    Rendition.objects.bulk_create(
+        Rendition(image=image, width=width, height=width * 2 // 3, file=f"images/image_{image.pk}_{width}.jpg")
+        for image in images for width in (320, 640, 1280)
+    )
+
+
+def serve(mode: str, rows: int, workers: int, cached: bool) -> None:
+    os.environ["IMAGES_ASYNC_VIEWS"] = "true" if mode == "asgi async" else "false"
+    if not cached:
+        os.environ["IMAGES_CACHE_TIMEOUT"] = "0"
+    setup_django("PythonTaskWojDra.settings_test")
+
+    with temporary_database():
+        fill_images(rows)
+        if mode == "wsgi":
+            from django.core.handlers.wsgi import WSGIHandler
+            from django.core.servers.basehttp import WSGIRequestHandler
+            from benchmarks.upload_limits import PooledWSGIServer
+
+            class QuietHandler(WSGIRequestHandler):
+                def log_message(self, *args) -> None:
+                    pass
+
+            server = PooledWSGIServer(("127.0.0.1", 0), QuietHandler, workers)
+            server.set_app(WSGIHandler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            print(json.dumps({"port": server.server_address[1]}), flush=True)
+            sys.stdin.read()
+            server.shutdown()
+            server.pool.shutdown()
+            return
+
+        import socket
+        import uvicorn
+        from django.core.handlers.asgi import ASGIHandler
+
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        # Connections are queued until the server starts accepting them
+        sock.listen(1024)
+        config = uvicorn.Config(ASGIHandler(), log_level="warning", access_log=False, lifespan="off")
+        server = uvicorn.Server(config)
+
+        async def run() -> None:
+            task = asyncio.create_task(server.serve(sockets=[sock]))
+            print(json.dumps({"port": sock.getsockname()[1]}), flush=True)
+            await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+            server.should_exit = True
+            await task
+
+        asyncio.run(run())
+
+
+def load(port: int, paths: list, clients: int, duration: float) -> dict:
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + duration
+
+    def client(index: int) -> None:
+        connection = HTTPConnection("127.0.0.1", port, timeout=60)
+        request = index
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            connection.request("GET", paths[request % len(paths)])
+            response = connection.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - start)
+            if response.status != 200:
+                errors.append(response.status)
+            request += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99)],
+        "errors": len(errors),
+    }
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.asgi_views", "--serve", mode,
+            "--rows", str(args.rows), "--workers", str(args.workers), *(["--cached"] if args.cached else []),
+        ],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    try:
+        port = json.loads(server.stdout.readline())["port"]
+        paths = [f"/images/?title=Image%20{i}" for i in range(10, 20)]
+        paths += [f"/images/{image_id}" for image_id in range(1, args.rows + 1, max(args.rows // 50, 1))]
+        # Warm-up, e.g. of database connections and caches
+        load(port, paths, args.clients, 1)
+        return load(port, paths, args.clients, args.duration)
+    finally:
+        server.stdin.close()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8, help="Threads of the WSGI server")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--cached", action="store_true", help="Serve responses from the cache")
+    parser.add_argument("--serve", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.rows, args.workers, args.cached)
+        return
+
+    try:
+        import uvicorn  # noqa: F401
+        modes = MODES
+    except ImportError:
+        print("uvicorn is not installed, ASGI modes are skipped")
+        modes = MODES[:1]
+    print(
+        f"rows: {args.rows}, clients: {args.clients}, WSGI threads: {args.workers}, "
+        f"duration: {args.duration:.0f} s, {'cached' if args.cached else 'not cached'}"
+    )
+    print(f"{'mode':>10} {'req/s':>8} {'p50 [ms]':>9} {'p99 [ms]':>9} {'errors':>7}")
+    for mode in modes:
+        result = run_mode(mode, args)
+        print(
+            f"{mode:>10} {result['rps']:8.0f} {result['p50'] * 1000:9.1f} {result['p99'] * 1000:9.1f} "
+            f"{result['errors']:7d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
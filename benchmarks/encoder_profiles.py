@@ -0,0 +1,84 @@
+"""
+Benchmark of encoder profiles (IMAGES_ENCODER_PROFILES setting), reporting resize and encode time,
+and output size, of the configured profile of every format, and of alternatives differing in single options.
+
+Usage:
+    python -m benchmarks.encoder_profiles --source-size 3000 2000 --target-width 1200
+    python -m benchmarks.encoder_profiles --profile '{"JPEG": {"quality": 85}}'
+
+Profiles given with --profile are measured in addition to the alternatives below.
+"""
+import argparse
+import json
+import os
+import tempfile
+from io import BytesIO
+
+from benchmarks.resize_modes import create_source
+from benchmarks.utils import setup_django, measure
+
+# Options changed by the measured alternatives of configured profiles
+ALTERNATIVES = {
+    "JPEG": [
+        {"optimize": False, "progressive": False}, {"quality": 60}, {"quality": 85}, {"quality": 95},
+    ],
+    "PNG": [{"compress_level": 1}, {"compress_level": 9}, {"optimize": True}],
+    "WEBP": [{"method": 0}, {"method": 6}, {"quality": 60}, {"quality": 90}, {"lossless": True}],
+    "TIFF": [{"compression": "tiff_lzw"}, {"compression": "tiff_adobe_deflate"}],
+}
+RESAMPLE_ALTERNATIVES = ["nearest", "bilinear", "lanczos"]
+
+
+def get_alternatives(img_format: str, extra: dict) -> list:
+    alternatives = [{}]
+    alternatives += ALTERNATIVES.get(img_format, [])
+    alternatives += [{"resample": resample} for resample in RESAMPLE_ALTERNATIVES]
+    if img_format in extra:
+        alternatives.append(extra[img_format])
+    return alternatives
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source-size", type=int, nargs=2, default=[3000, 2000])
+    parser.add_argument("--target-width", type=int, default=1200)
+    parser.add_argument("--profile", type=json.loads, default={}, help="JSON object with profiles to measure")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from PIL import Image as PillowImage
+    from django.conf import settings
+    from apps.images.utils import encode_image, get_output_size, image_types, resize_image
+
+    configured = settings.IMAGES_ENCODER_PROFILES
+    extra = {img_format.upper(): options for img_format, options in args.profile.items()}
+    print(f"source: {args.source_size[0]}x{args.source_size[1]}, target width: {args.target_width}")
+    print(f"{'format':>6} {'time [ms]':>10} {'size [KiB]':>11}  profile")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "source.png")
+        create_source(path, "PNG", *args.source_size)
+        source = PillowImage.open(path)
+        source.load()
+        output_size = get_output_size(source.width, source.height, args.target_width, 0)
+
+        for img_format in dict.fromkeys(image_types.values()):
+            img = source.convert("P") if img_format == "GIF" else source
+            for changes in get_alternatives(img_format, extra):
+                profile = {**configured.get(img_format, {}), **changes}
+                settings.IMAGES_ENCODER_PROFILES = {**configured, img_format: profile}
+                output = BytesIO()
+
+                def resize_and_encode() -> None:
+                    output.seek(0)
+                    output.truncate()
+                    encode_image(resize_image(img, output_size, img_format), output, img_format)
+
+                elapsed = measure(resize_and_encode, args.repeat)
+                label = "configured" if not changes else ", ".join(f"{k}={v}" for k, v in changes.items())
+                print(f"{img_format:>6} {elapsed * 1000:10.1f} {len(output.getvalue()) / 1024:11.1f}  {label}")
+        settings.IMAGES_ENCODER_PROFILES = configured
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark of bandwidth saved by format negotiation (IMAGES_NEGOTIATED_FORMATS setting). Every file of a sample
+corpus is re-encoded into negotiable formats with their encoder profiles, like get_negotiated_variant does,
+and total sizes of sent files are compared with the ones of stored files. Encoding time is the one-off cost
+of building a variant, which is paid by the first request only.
+
+Usage:
+    python -m benchmarks.format_negotiation --sizes 640 1280 1920 --count 5
+    python -m benchmarks.format_negotiation --corpus path/to/images
+
+Without --corpus, photo-like JPEG and PNG files, and flat-color PNG graphics, are generated.
+Files, whose variant would not be smaller, are counted with their stored size (as they are sent as they are).
+"""
+import argparse
+import os
+import tempfile
+import time
+from io import BytesIO
+from typing import List
+
+from benchmarks.resize_modes import create_source
+from benchmarks.utils import setup_django
+
+
+def create_graphic(path: str, width: int, height: int) -> None:
+    from PIL import Image as PillowImage, ImageDraw
+    # Flat shapes with few colors, resembling a logo or a diagram
+    img = PillowImage.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for index in range(8):
+        box = [width * index // 10, height * index // 12, width * (index + 3) // 10, height * (index + 4) // 12]
+        draw.rectangle(box, fill=((index * 60) % 256, (index * 110) % 256, (index * 170) % 256))
+    img.save(path, format="PNG")
+
+
+def create_corpus(directory: str, sizes: List[int], count: int) -> List[str]:
+    paths = []
+    for width in sizes:
+        height = width * 2 // 3
+        for index in range(count):
+            # Sizes differ slightly, so encoders do not get identical inputs
+            size = (width + index, height + index)
+            for name, create in (
+                    (f"photo_{width}_{index}.jpg", lambda path: create_source(path, "JPEG", *size)),
+                    (f"photo_{width}_{index}.png", lambda path: create_source(path, "PNG", *size)),
+                    (f"graphic_{width}_{index}.png", lambda path: create_graphic(path, *size)),
+            ):
+                paths.append(os.path.join(directory, name))
+                create(paths[-1])
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Folder with JPEG and PNG files (generated, if not provided)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[640, 1280, 1920])
+    parser.add_argument("--count", type=int, default=3, help="Generated files of every kind and size")
+    args = parser.parse_args()
+
+    setup_django()
+    from PIL import Image as PillowImage
+    from apps.images.utils import encode_image, image_types
+    from apps.images.variants import NEGOTIABLE_FORMATS, NEGOTIATED_SOURCE_FORMATS, is_encodable
+
+    formats = {
+        extension: img_format for extension, img_format in NEGOTIABLE_FORMATS.items() if is_encodable(img_format)
+    }
+    print(f"negotiable formats supported by Pillow: {', '.join(formats) or 'none'}")
+    with tempfile.TemporaryDirectory() as directory:
+        if args.corpus:
+            paths = [os.path.join(args.corpus, name) for name in sorted(os.listdir(args.corpus))]
+        else:
+            paths = create_corpus(directory, args.sizes, args.count)
+        paths = [
+            path for path in paths
+            if image_types.get(os.path.splitext(path)[1][1:].lower()) in NEGOTIATED_SOURCE_FORMATS
+        ]
+
+        stored_total = {}
+        sent_total = {extension: {} for extension in formats}
+        encode_time = {extension: 0.0 for extension in formats}
+        for path in paths:
+            kind = os.path.basename(path).split("_")[0] + os.path.splitext(path)[1] if not args.corpus else "all"
+            stored_size = os.path.getsize(path)
+            stored_total[kind] = stored_total.get(kind, 0) + stored_size
+            with PillowImage.open(path) as img:
+                img.load()
+                for extension, img_format in formats.items():
+                    output = BytesIO()
+                    start = time.perf_counter()
+                    encode_image(img, output, img_format)
+                    encode_time[extension] += time.perf_counter() - start
+                    sent_size = min(len(output.getvalue()), stored_size)
+                    sent_total[extension][kind] = sent_total[extension].get(kind, 0) + sent_size
+
+        print(f"files: {len(paths)}")
+        print(f"{'kind':>12} {'format':>7} {'stored [KiB]':>13} {'sent [KiB]':>11} {'saved':>7}")
+        for kind, stored in stored_total.items():
+            for extension in formats:
+                sent = sent_total[extension][kind]
+                print(
+                    f"{kind:>12} {extension:>7} {stored / 1024:13.1f} {sent / 1024:11.1f} "
+                    f"{(1 - sent / stored) * 100:6.1f}%"
+                )
+        stored = sum(stored_total.values())
+        for extension in formats:
+            sent = sum(sent_total[extension].values())
+            print(
+                f"{'total':>12} {extension:>7} {stored / 1024:13.1f} {sent / 1024:11.1f} "
+                f"{(1 - sent / stored) * 100:6.1f}%"
+                f"  (encoding: {encode_time[extension] / max(len(paths), 1) * 1000:.0f} ms per file)"
+            )
+
+
+if __name__ == "__main__":
+    main()
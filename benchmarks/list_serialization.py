@@ -0,0 +1,55 @@
+"""
+Benchmark of serializing image lists with PublicImageSerializer (model instances)
+and ImageRowSerializer (values_list rows), including the database query and JSON rendering.
+
+Usage:
+    python -m benchmarks.list_serialization --rows 1000 10000 100000
+
+A temporary database is created for the run, so real data is never modified.
+"""
+import argparse
+
+from benchmarks.utils import setup_django, temporary_database, measure
+
+
+def fill_images(rows: int, batch_size: int = 10000) -> None:
+    from apps.images.models import Image
+    Image.objects.all().delete()
+    for start in range(0, rows, batch_size):
+        Image.objects.bulk_create(
+            Image(title=f"Image {i}", width=640, height=480, image=f"images/image_{i}.jpg")
+            for i in range(start, min(start + batch_size, rows))
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from apps.images.models import Image
+    from apps.images.serializers import PublicImageSerializer, ImageRowSerializer
+
+    renderer = JSONRenderer()
+
+    def model_serializer() -> bytes:
+        return renderer.render(PublicImageSerializer(Image.objects.prefetch_related("renditions"), many=True).data)
+
+    def row_serializer() -> bytes:
+        return renderer.render(ImageRowSerializer(ImageRowSerializer.get_rows(Image.objects.all())).data)
+
+    with temporary_database():
+        print(f"{'rows':>8} {'model [ms]':>11} {'rows [ms]':>10} {'speedup':>8}")
+        for rows in args.rows:
+            fill_images(rows)
+            assert model_serializer() == row_serializer(), "Serializers' outputs differ"
+            model_time = measure(model_serializer, args.repeat)
+            row_time = measure(row_serializer, args.repeat)
+            print(f"{rows:>8} {model_time * 1000:11.1f} {row_time * 1000:10.1f} {model_time / row_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark of prepare_image's resize modes ("fidelity" and "speed"),
+reporting CPU time and peak memory for every format in image_types.
+
+Usage:
+    python -m benchmarks.resize_modes --source-size 6000 4000 --target-width 300
+
+Every measurement runs in a fresh process, so that its peak resident memory
+(ru_maxrss) is not affected by previous runs.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import setup_django
+
+MODES = ["fidelity", "speed"]
+
+
+def create_source(path: str, img_format: str, width: int, height: int) -> None:
+    from PIL import Image as PillowImage
+    # Gradient with some noise, roughly resembling a photo
+    img = PillowImage.linear_gradient("L").resize((width, height))
+    noise = PillowImage.effect_noise((width, height), 32)
+    img = PillowImage.merge("RGB", (img, noise, img.transpose(PillowImage.Transpose.FLIP_LEFT_RIGHT)))
+    if img_format == "GIF":
+        img = img.convert("P")
+    img.save(path, format=img_format)
+
+
+def memory_kb(field: str) -> int:
+    # ru_maxrss is inherited from the parent process across exec on Linux, /proc is not
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def worker(path: str, mode: str, width: int) -> None:
+    os.environ["IMAGES_RESIZE_MODE"] = mode
+    setup_django()
+    from django.core.files import File
+    from apps.images.utils import prepare_image
+
+    rss_before = memory_kb("VmRSS")
+    cpu_start = time.process_time()
+    with open(path, "rb") as source:
+        result, _, _ = prepare_image(File(source, name=path), width, 0)
+        result.close()
+    cpu = time.process_time() - cpu_start
+    peak = memory_kb("VmHWM") - rss_before
+    print(json.dumps({"cpu": cpu, "peak_kb": peak}))
+
+
+def run_worker(path: str, mode: str, width: int) -> dict:
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.resize_modes", "--worker", path, mode, str(width)],
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source-size", type=int, nargs=2, default=[6000, 4000])
+    parser.add_argument("--target-width", type=int, default=300)
+    parser.add_argument("--worker", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        path, mode, width = args.worker
+        worker(path, mode, int(width))
+        return
+
+    setup_django()
+    from apps.images.utils import image_types
+
+    formats = {img_format: extension for extension, img_format in reversed(image_types.items())}
+    print(f"source: {args.source_size[0]}x{args.source_size[1]}, target width: {args.target_width}")
+    print(f"{'format':>6} {'mode':>9} {'cpu [ms]':>9} {'peak [MiB]':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for img_format, extension in formats.items():
+            path = os.path.join(directory, f"source.{extension}")
+            create_source(path, img_format, *args.source_size)
+            for mode in MODES:
+                result = run_worker(path, mode, args.target_width)
+                print(f"{img_format:>6} {mode:>9} {result['cpu'] * 1000:9.1f} {result['peak_kb'] / 1024:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark of the "title" search used by the image list endpoint,
+with and without the trigram index on UPPER("title").
+
+Usage (against a PostgreSQL database configured in settings):
+    python -m benchmarks.title_search --rows 10000 100000 1000000
+
+A temporary database is created for the run, so real data is never modified.
+On backends other than PostgreSQL the index does not exist, and only
+the baseline timings are reported.
+"""
+import argparse
+import importlib
+import random
+import string
+
+from benchmarks.utils import setup_django, temporary_database, measure
+
+SEARCHED_TITLE = "sunset"
+
+
+def random_title(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_letters + " ", k=rng.randint(10, 60)))
+
+
+def fill_images(rows: int, seed: int = 0, batch_size: int = 10000) -> None:
+    from apps.images.models import Image
+    rng = random.Random(seed)
+    Image.objects.all().delete()
+    for start in range(0, rows, batch_size):
+        count = min(batch_size, rows - start)
+        Image.objects.bulk_create(
+            Image(
+                # Roughly 0.1% of titles contain the searched text
+                title=random_title(rng) if rng.random() > 0.001 else f"Big {SEARCHED_TITLE} photo",
+                width=100, height=100, image="images/benchmark.png",
+            ) for _ in range(count)
+        )
+
+
+def search() -> list:
+    from django.http import QueryDict
+    from apps.images.models import Image
+    from apps.images.views import ImagesView
+    query = ImagesView.create_image_query(QueryDict(f"title={SEARCHED_TITLE.upper()}"))
+    return list(Image.objects.filter(query).values_list("id", flat=True))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from apps.images.models import Image
+
+    # The index exists only on PostgreSQL, so it is not a part of model's Meta
+    migration = importlib.import_module("apps.images.migrations.0003_image_title_trigram_index").Migration
+    index = migration.operations[1].index
+    with temporary_database():
+        print(f"backend: {connection.vendor}")
+        print(f"{'rows':>10} {'no index [ms]':>15} {'index [ms]':>12}")
+        for rows in args.rows:
+            fill_images(rows)
+            is_postgresql = connection.vendor == "postgresql"
+            with connection.schema_editor() as editor:
+                if is_postgresql:
+                    editor.remove_index(Image, index)
+            if is_postgresql:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {Image._meta.db_table}")
+            before = measure(search, args.repeat)
+            after = None
+            if is_postgresql:
+                with connection.schema_editor() as editor:
+                    editor.add_index(Image, index)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {Image._meta.db_table}")
+                after = measure(search, args.repeat)
+            after_text = f"{after * 1000:12.2f}" if after is not None else f"{'n/a':>12}"
+            print(f"{rows:>10} {before * 1000:15.2f} {after_text}")
+
+
+if __name__ == "__main__":
+    main()
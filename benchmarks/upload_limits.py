@@ -0,0 +1,189 @@
+"""
+Load test of the upload endpoint under malicious input. Attackers keep uploading
+a decompression bomb (a small PNG file with a huge amount of pixels), while a client
+measures latency of listing images, served by the same pool of worker threads.
+It's run with the upload limits (IMAGES_MAX_PIXELS, IMAGES_MAX_UPLOAD_SIZE) enabled and disabled.
+Once there are as many attackers as workers, without the limits all workers are busy decoding bombs.
+
+Usage:
+    python -m benchmarks.upload_limits --bomb-size 8000 8000 --workers 4 --attackers 4 --duration 10
+
+Every run uses a fresh process, a temporary database and a temporary media folder,
+so that its peak resident memory (VmHWM) is not affected by other runs, and no data is modified.
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from wsgiref.simple_server import WSGIServer
+
+from benchmarks.resize_modes import memory_kb
+from benchmarks.utils import setup_django, temporary_database
+
+MODES = ["limits", "no limits"]
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    WSGI server handling requests with a fixed amount of worker threads, like a threaded application server.
+    """
+
+    def __init__(self, address, handler, workers: int):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address) -> None:
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def create_bomb(path: str, width: int, height: int) -> None:
+    from PIL import Image as PillowImage
+    # Single colour compresses extremely well, so the file is tiny compared to its decoded size
+    PillowImage.new("RGB", (width, height), color="red").save(path, format="PNG", optimize=True)
+
+
+def post_file(port: int, path: str, width: int) -> int:
+    from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+    from django.urls import reverse
+
+    with open(path, "rb") as file:
+        body = encode_multipart(BOUNDARY, {"image": file, "width": width})
+    connection = HTTPConnection("127.0.0.1", port, timeout=300)
+    try:
+        connection.request("POST", reverse("images_view"), body, {"Content-Type": MULTIPART_CONTENT})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def get_list(port: int) -> float:
+    from django.urls import reverse
+
+    start = time.perf_counter()
+    connection = HTTPConnection("127.0.0.1", port, timeout=300)
+    try:
+        connection.request("GET", reverse("images_view") + "?limit=10")
+        connection.getresponse().read()
+    finally:
+        connection.close()
+    return time.perf_counter() - start
+
+
+def worker(directory: str, mode: str, workers: int, attackers: int, duration: float) -> None:
+    setup_django("PythonTaskWojDra.settings_test")
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import WSGIRequestHandler
+
+    settings.MEDIA_ROOT = os.path.join(directory, "media")
+    if mode == "no limits":
+        settings.IMAGES_MAX_PIXELS = 0
+        settings.IMAGES_MAX_UPLOAD_SIZE = 0
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args) -> None:
+            pass
+
+    with temporary_database():
+        server = PooledWSGIServer(("127.0.0.1", 0), QuietHandler, workers)
+        server.set_app(WSGIHandler())
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        rss_before = memory_kb("VmRSS")
+        deadline = time.perf_counter() + duration
+        statuses = []
+        latencies = []
+
+        widths = itertools.count(100)
+
+        def attack() -> None:
+            while time.perf_counter() < deadline:
+                # Every upload requests another width, so it's not served from an already stored file
+                statuses.append(post_file(port, os.path.join(directory, "bomb.png"), next(widths)))
+
+        attacker_threads = [threading.Thread(target=attack) for _ in range(attackers)]
+        for thread in attacker_threads:
+            thread.start()
+        while time.perf_counter() < deadline:
+            latencies.append(get_list(port))
+            time.sleep(0.05)
+        for thread in attacker_threads:
+            thread.join()
+        server.shutdown()
+        server.pool.shutdown()
+
+    latencies.sort()
+    print(json.dumps({
+        "requests": len(latencies),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "max": latencies[-1],
+        "bombs": len(statuses),
+        "statuses": sorted(set(statuses)),
+        "peak_kb": memory_kb("VmHWM") - rss_before,
+    }))
+
+
+def run_worker(directory: str, mode: str, args: argparse.Namespace) -> dict:
+    output = subprocess.check_output([
+        sys.executable, "-m", "benchmarks.upload_limits",
+        "--worker", directory, mode, str(args.workers), str(args.attackers), str(args.duration),
+    ])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bomb-size", type=int, nargs=2, default=[8000, 8000])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--attackers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--worker", nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        directory, mode, workers, attackers, duration = args.worker
+        worker(directory, mode, int(workers), int(attackers), float(duration))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bomb.png")
+        create_bomb(path, *args.bomb_size)
+        print(
+            f"bomb: {args.bomb_size[0]}x{args.bomb_size[1]} ({os.path.getsize(path) / 1024:.0f} KiB), "
+            f"workers: {args.workers}, attackers: {args.attackers}, duration: {args.duration:.0f} s"
+        )
+        print(
+            f"{'mode':>9} {'lists':>6} {'p50 [ms]':>9} {'p95 [ms]':>9} {'max [ms]':>9} "
+            f"{'bombs':>6} {'statuses':>10} {'peak [MiB]':>11}"
+        )
+        for mode in MODES:
+            result = run_worker(directory, mode, args)
+            print(
+                f"{mode:>9} {result['requests']:6d} {result['p50'] * 1000:9.1f} {result['p95'] * 1000:9.1f} "
+                f"{result['max'] * 1000:9.1f} {result['bombs']:6d} {','.join(map(str, result['statuses'])):>10} "
+                f"{result['peak_kb'] / 1024:11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
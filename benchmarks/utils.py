@@ -0,0 +1,47 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+def setup_django(settings_module: str = "PythonTaskWojDra.settings") -> None:
+    """
+    Function for configuring Django, so that benchmarks can be launched as plain scripts.
+
+    :param settings_module: Settings module used, unless DJANGO_SETTINGS_MODULE is already set
+    """
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+@contextmanager
+def temporary_database() -> Iterator[None]:
+    """
+    Context manager creating a throwaway, fully migrated copy of the default database
+    (named like Django's test database), so that benchmarks never touch real data.
+    """
+    from django.db import connection
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func: Callable[[], object], repeat: int = 5) -> float:
+    """
+    Function for measuring median wall-clock time of a callable.
+
+    :param func: Measured callable
+    :param repeat: How many times the callable is run
+    :return: Median run time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
@@ -5,3 +5,11 @@ import pytest
 def api_client():
     from rest_framework.test import APIClient
     return APIClient()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    from django.core.cache import caches
+    yield
+    for cache in caches.all():
+        cache.clear()
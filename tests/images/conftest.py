@@ -1,14 +1,19 @@
 import os
+import re
+import struct
+import zlib
 from io import BytesIO
 from typing import List
 
 import pytest
 from PIL import Image as PillowImage
+from django.conf import settings
 from django.core.files import File
 from django.urls import reverse
 from rest_framework.response import Response
 
-from apps.images.models import Image
+from apps.images.models import Image, Rendition, UploadJob
+from apps.images.variants import NEGOTIABLE_FORMATS, get_negotiated_name
 
 test_simple_images = [
     {
@@ -34,6 +39,24 @@ test_simple_images = [
 ]
 
 
+def is_sharded_image_url(url: str, extension: str) -> bool:
+    return re.search(rf"(^|/)images/([0-9a-f]{{2}})/([0-9a-f]{{2}})/\2\3[0-9a-f]{{28}}\.{extension}$", url) is not None
+
+
+def remove_image_files() -> None:
+    paths = [image.image.path for image in Image.objects.all()]
+    paths += [rendition.file.path for rendition in Rendition.objects.all()]
+    for path in paths:
+        for removed in [path, *(get_negotiated_name(path, extension) for extension in NEGOTIABLE_FORMATS)]:
+            if os.path.exists(removed):
+                os.remove(removed)
+    # Remove emptied shard folders as well
+    images_dir = os.path.join(settings.MEDIA_ROOT, "images")
+    for root, _, _ in os.walk(images_dir, topdown=False):
+        if root != images_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
 @pytest.fixture()
 def create_images():
     def inner_create_images(image_templates: List[dict]) -> List[Image]:
@@ -57,18 +80,14 @@ def create_images():
 
     yield inner_create_images
 
-    for image in Image.objects.all():
-        if os.path.exists(image.image.path):
-            os.remove(image.image.path)
+    remove_image_files()
 
 
 @pytest.fixture()
 def remove_images_afterwards():
     yield
 
-    for image in Image.objects.all():
-        if os.path.exists(image.image.path):
-            os.remove(image.image.path)
+    remove_image_files()
 
 
 @pytest.fixture()
@@ -83,6 +102,22 @@ def create_image_file():
     yield inner_create_images
 
 
+@pytest.fixture()
+def create_png_header():
+    def inner_create_png_header(filename: str, width: int, height: int) -> None:
+        # PNG file declaring the provided size, with no actual pixel data (like a decompression bomb)
+        def chunk(chunk_type: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+        with open(filename, "wb") as file:
+            file.write(b"\x89PNG\r\n\x1a\n")
+            file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+            file.write(chunk(b"IDAT", zlib.compress(b"")))
+            file.write(chunk(b"IEND", b""))
+
+    yield inner_create_png_header
+
+
 @pytest.fixture()
 def post_image():
     from rest_framework.test import APIClient
@@ -108,3 +143,36 @@ def post_image():
         return response
 
     yield inner_post_image
+
+
+@pytest.fixture()
+def variant_cache_dir(settings, tmp_path):
+    settings.IMAGES_VARIANT_CACHE_DIR = tmp_path / "variants"
+    yield settings.IMAGES_VARIANT_CACHE_DIR
+
+
+@pytest.fixture()
+def remove_upload_jobs_afterwards():
+    yield
+
+    for job in UploadJob.objects.all():
+        if job.upload and os.path.exists(job.upload.path):
+            os.remove(job.upload.path)
+
+
+@pytest.fixture()
+def create_upload_job(create_image_file):
+    def inner_create_upload_job(
+            filename: str, file_format: str, width: int, height: int,
+            resize_width: int = 0, resize_height: int = 0, title: str = ""
+    ) -> UploadJob:
+        create_image_file(filename, file_format, width, height)
+        with open(filename, "rb") as test_file:
+            job = UploadJob.objects.create(
+                title=title, width=resize_width, height=resize_height,
+                filename=filename, upload=File(test_file, name=filename)
+            )
+        os.remove(filename)
+        return job
+
+    yield inner_create_upload_job
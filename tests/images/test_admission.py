@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image as PillowImage
+from django.urls import reverse
+
+from apps.images.admission import (
+    ResizeCapacityError, ResizeLimiter, get_resize_limiter, resize_slot, waiting_for_slots
+)
+from apps.images.batch import get_process_pool, submit_with_slot
+from apps.images.models import Image
+
+from .conftest import test_simple_images
+
+
+@pytest.fixture()
+def saturated_limiter(settings):
+    settings.IMAGES_RESIZE_CONCURRENCY = 1
+    settings.IMAGES_RESIZE_QUEUE_TIMEOUT = 0
+    settings.IMAGES_RESIZE_RETRY_AFTER = 7
+    limiter = get_resize_limiter()
+    acquired, fd = limiter.acquire(0)
+    assert acquired
+
+    yield limiter
+
+    limiter.release(fd)
+
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_resize_limiter(shared, tmp_path):
+    limiter = ResizeLimiter(2, str(tmp_path) if shared else None)
+
+    first = limiter.acquire(0)
+    second = limiter.acquire(0)
+    third = limiter.acquire(0)
+
+    # Check if only the configured amount of slots can be taken
+    assert first[0] and second[0]
+    assert third == (False, None)
+
+    # Check if released slots can be taken again
+    limiter.release(first[1])
+    fourth = limiter.acquire(0)
+    assert fourth[0]
+    limiter.release(second[1])
+    limiter.release(fourth[1])
+
+
+def test_resize_limiter_shared(tmp_path):
+    # Limiters of different processes, sharing the lock folder
+    first_limiter = ResizeLimiter(1, str(tmp_path))
+    second_limiter = ResizeLimiter(1, str(tmp_path))
+
+    acquired, fd = first_limiter.acquire(0)
+    start = time.monotonic()
+
+    # Check if the slot is taken for the other limiter, which waits for the timeout
+    assert acquired
+    assert second_limiter.acquire(0.1) == (False, None)
+    assert time.monotonic() - start >= 0.09
+
+    # Check if the slot is free once released
+    first_limiter.release(fd)
+    acquired, fd = second_limiter.acquire(0)
+    assert acquired
+    second_limiter.release(fd)
+
+
+def test_resize_slot(saturated_limiter):
+    # Check if a request is rejected, when all slots are taken
+    with pytest.raises(ResizeCapacityError) as error:
+        with resize_slot():
+            pass
+    assert error.value.retry_after == 7
+
+
+def test_resize_slot_disabled(saturated_limiter, settings):
+    settings.IMAGES_RESIZE_CONCURRENCY = 0
+
+    # Check if slots are not limited, when the limit is disabled
+    with resize_slot():
+        assert get_resize_limiter() is None
+
+
+def test_waiting_for_slots(saturated_limiter):
+    released = threading.Timer(0.1, saturated_limiter.release, [None])
+    released.start()
+
+    # Check if the slot is waited for, until it's released
+    with waiting_for_slots(), resize_slot():
+        assert not released.is_alive()
+    saturated_limiter.acquire(0)
+
+
+@pytest.mark.django_db
+def test_images_view_post_busy(
+        api_client, post_image, create_image_file, create_images, saturated_limiter, remove_images_afterwards
+):
+    create_images(test_simple_images[:1])
+    create_image_file("test.png", "PNG", 300, 200)
+
+    response = post_image(api_client, "test", "test.png", 150, 0)
+
+    # Check if the upload is rejected, and can be retried later
+    assert response.status_code == 503
+    assert response["Retry-After"] == "7"
+    assert "busy" in response.data["error"]
+    assert Image.objects.count() == 1
+
+    # Check if reading is not affected
+    response = api_client.get(reverse('images_view'))
+    assert response.status_code == 200
+    assert len(response.data) == 1
+
+
+@pytest.mark.django_db
+def test_images_view_post_busy_not_resized(
+        api_client, post_image, create_image_file, saturated_limiter, remove_images_afterwards
+):
+    # Narrower than the smallest rendition
+    create_image_file("test.png", "PNG", 300, 200)
+
+    response = post_image(api_client, "test", "test.png", 0, 0)
+
+    # Check if images, which are neither resized, nor get renditions, do not need a slot
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_images_view_post_busy_renditions(api_client, post_image, create_image_file, saturated_limiter):
+    create_image_file("test.png", "PNG", 400, 200)
+
+    response = post_image(api_client, "test", "test.png", 0, 0)
+
+    # Check if images, which are not resized, still need a slot to create their renditions
+    assert response.status_code == 503
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db
+def test_render_image_view_busy(api_client, create_images, variant_cache_dir, saturated_limiter):
+    image = create_images(test_simple_images[:1])[0]
+    url = reverse('render_image_view', kwargs={'image_id': image.id}) + "?w=100"
+
+    response = api_client.get(url)
+
+    # Check if the variant is not built, when all slots are taken
+    assert response.status_code == 503
+    assert response["Retry-After"] == "7"
+
+    # Check if the variant is built, once a slot is free
+    saturated_limiter.release(None)
+    response = api_client.get(url)
+    saturated_limiter.acquire(0)
+    assert response.status_code == 200
+
+
+def test_batch_resizing_holds_slots(saturated_limiter):
+    buffer = BytesIO()
+    PillowImage.new("RGB", (300, 200), "red").save(buffer, format="PNG")
+    futures = []
+    submitting = threading.Thread(
+        target=lambda: futures.append(submit_with_slot(get_process_pool(), buffer.getvalue(), "test.png", 150, 0, []))
+    )
+    submitting.start()
+    time.sleep(0.2)
+
+    # Check if images are not submitted to the process pool, while all slots are taken
+    assert submitting.is_alive()
+
+    saturated_limiter.release(None)
+    submitting.join()
+    path, width, height, _ = futures[0].result(timeout=30)
+
+    # Check if the image is resized by the pool, once a slot is free, and the slot is freed afterwards
+    assert (width, height) == (150, 100)
+    os.remove(path)
+    acquired, fd = saturated_limiter.acquire(0)
+    assert acquired
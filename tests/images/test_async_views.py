@@ -0,0 +1,115 @@
+import os
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from apps.images.async_views import images_view, single_image_view
+from apps.images.models import Image
+
+from .conftest import test_simple_images
+
+
+def get_async(view, url: str, *args, **headers):
+    response = async_to_sync(view)(RequestFactory().get(url, **headers), *args)
+    # Responses of DRF views are rendered by Django's request handler
+    if hasattr(response, "render"):
+        response.render()
+    return response
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'query, delegated', [
+        ("", False), ("?title=e", False), ("?title=missing", False), ("?limit=2", True), ("?stream=true", True),
+    ]
+)
+def test_async_images_view_get(query, delegated, api_client, create_images):
+    create_images(test_simple_images)
+    url = reverse('images_view') + query
+
+    expected = api_client.get(url)
+    # Responses are cached, so the async view has to build its own
+    caches["default"].clear()
+    response = get_async(images_view, url)
+    content = b"".join(response.streaming_content) if response.streaming else response.content
+
+    # Check if the async view returns the same content as the DRF view
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/json"
+    assert content == (b"".join(expected.streaming_content) if expected.streaming else expected.content)
+    assert response.get("ETag") == expected.get("ETag")
+
+    # Check if only paginated and streamed lists are handed over to the DRF view
+    assert (type(response) is not HttpResponse) == delegated
+
+
+@pytest.mark.django_db
+def test_async_images_view_get_not_modified(api_client, create_images):
+    create_images(test_simple_images)
+    url = reverse('images_view')
+    etag = get_async(images_view, url)["ETag"]
+
+    response = get_async(images_view, url, HTTP_IF_NONE_MATCH=etag)
+
+    # Check if an unchanged list is not sent again
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+
+@pytest.mark.django_db
+def test_async_images_view_get_browsable(create_images):
+    create_images(test_simple_images[:1])
+
+    response = get_async(images_view, reverse('images_view'), HTTP_ACCEPT="text/html")
+
+    # Check if the browsable API is still served by the DRF view
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/html")
+
+
+@pytest.mark.django_db
+def test_async_images_view_post(create_image_file, remove_images_afterwards):
+    create_image_file("test.png", "PNG", 300, 200)
+    with open("test.png", "rb") as file:
+        request = RequestFactory().post(reverse('images_view'), {"title": "async", "width": 150, "image": file})
+    os.remove("test.png")
+
+    response = async_to_sync(images_view)(request)
+
+    # Check if uploads are handled by the DRF view
+    assert response.status_code == 201
+    assert Image.objects.get().title == "async"
+
+
+@pytest.mark.django_db
+def test_async_single_image_view_get(api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    url = reverse('single_image_view', kwargs={'image_id': image.id})
+
+    expected = api_client.get(url)
+    caches["default"].clear()
+    response = get_async(single_image_view, url, image.id)
+
+    # Check if the async view returns the same content and validators as the DRF view
+    assert response.status_code == 200
+    assert response.content == expected.content
+    assert response["ETag"] == expected["ETag"]
+    assert response["Last-Modified"] == expected["Last-Modified"]
+
+    response = get_async(single_image_view, url, image.id, HTTP_IF_NONE_MATCH=expected["ETag"])
+
+    # Check if an unchanged object is not sent again
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_async_single_image_view_get_not_found():
+    response = get_async(single_image_view, reverse('single_image_view', kwargs={'image_id': 1}), 1)
+
+    # Check if error occurred
+    assert response.status_code == 404
+    assert b"not found" in response.content
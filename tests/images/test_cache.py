@@ -0,0 +1,151 @@
+import pytest
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from rest_framework.request import Request
+
+from apps.images.models import Image
+from apps.images.cache import get_cached_image, get_cache_stats, get_list_key
+
+from .conftest import test_simple_images
+
+
+@pytest.mark.django_db
+def test_get_cached_image():
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"id": 1}
+
+    first = get_cached_image(1, '"a"', build)
+    second = get_cached_image(1, '"a"', build)
+    third = get_cached_image(1, '"b"', build)
+
+    # Check if the data was built only on misses (including a changed ETag), and counted
+    assert first == second == third == {"id": 1}
+    assert len(calls) == 2
+    assert get_cache_stats() == {"hits": {"image": 1, "list": 0}, "misses": {"image": 2, "list": 0}}
+
+
+@pytest.mark.parametrize(
+    'first_query, second_query, same_key', [
+        ("title=a&limit=2", "limit=2&title=a", True),
+        ("title=a", "title=A", False),
+        ("title=a", "title=a&limit=2", False),
+    ]
+)
+def test_get_list_key(first_query, second_query, same_key):
+    factory = RequestFactory()
+    first = get_list_key(Request(factory.get("/images/?" + first_query)), '"a"')
+    second = get_list_key(Request(factory.get("/images/?" + second_query)), '"a"')
+
+    # Check if keys are the same only for equivalent queries
+    assert (first == second) == same_key
+
+
+@pytest.mark.django_db
+def test_single_image_view_cache(api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    url = reverse('single_image_view', kwargs={'image_id': image.id})
+
+    api_client.get(url)
+    cached = api_client.get(url)
+    image.title = "changed"
+    image.save()
+    changed = api_client.get(url)
+
+    # Check if the object was cached, and the changed object was not served from the cache
+    assert cached.data.get("title") == test_simple_images[0]["title"]
+    assert changed.data.get("title") == "changed"
+    assert get_cache_stats()["hits"]["image"] == 1
+    assert get_cache_stats()["misses"]["image"] == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'query', [{}, {'title': 'e'}, {'limit': 2}]
+)
+def test_images_view_get_list_cache(query, api_client, create_images):
+    images = create_images(test_simple_images[:3])
+    url = reverse('images_view') + '?' + urlencode(query)
+
+    first = api_client.get(url)
+    cached = api_client.get(url)
+    images[0].image.delete(save=False)
+    images[0].delete()
+    changed = api_client.get(url)
+
+    # Check if the list was cached, and the changed list was not served from the cache
+    assert cached.data == first.data
+    assert changed.data != first.data
+    assert get_cache_stats()["hits"]["list"] == 1
+    assert get_cache_stats()["misses"]["list"] == 2
+
+
+@pytest.mark.django_db
+def test_images_view_get_list_cache_invalidated_by_upload(
+        api_client, create_images, post_image, create_image_file, remove_images_afterwards
+):
+    create_images(test_simple_images[:1])
+    url = reverse('images_view')
+    api_client.get(url)
+
+    create_image_file("test.png", "PNG", 10, 10)
+    post_image(api_client, "new", "test.png", 0, 0)
+    response = api_client.get(url)
+
+    # Check if the uploaded image is listed
+    assert [item["title"] for item in response.data] == [test_simple_images[0]["title"], "new"]
+
+
+@pytest.mark.django_db
+def test_cache_stats_view(api_client, create_images, admin_user):
+    image = create_images(test_simple_images[:1])[0]
+    api_client.get(reverse('single_image_view', kwargs={'image_id': image.id}))
+    api_client.get(reverse('single_image_view', kwargs={'image_id': image.id}))
+    api_client.get(reverse('images_view'))
+
+    response = api_client.get(reverse('cache_stats_view'))
+
+    # Check if counters are not shown to anonymous users
+    assert response.status_code == 403
+
+    api_client.force_authenticate(admin_user)
+    response = api_client.get(reverse('cache_stats_view'))
+
+    # Check if counters are exposed to staff users
+    assert response.status_code == 200
+    assert response.data == {"hits": {"image": 1, "list": 0}, "misses": {"image": 1, "list": 1}}
+
+
+@pytest.mark.django_db
+def test_single_image_view_cache_changed_elsewhere(api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    url = reverse('single_image_view', kwargs={'image_id': image.id})
+    etag = api_client.get(url)["ETag"]
+
+    # e.g. by another process, with its own cache, or a bulk update
+    Image.objects.filter(pk=image.id).update(title="changed", updated_at=timezone.now())
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Check if the changed object is sent under its new ETag, instead of the cached one
+    assert response.status_code == 200
+    assert response.data["title"] == "changed"
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_images_view_get_list_cache_size_limit(api_client, create_images, settings):
+    create_images(test_simple_images[:3])
+    settings.IMAGES_MAX_PAGE_SIZE = 2
+
+    api_client.get(reverse('images_view'))
+    api_client.get(reverse('images_view'))
+    api_client.get(reverse('images_view') + '?' + urlencode({'limit': 2}))
+    api_client.get(reverse('images_view') + '?' + urlencode({'limit': 2}))
+
+    # Check if unpaginated lists longer than the largest page are not cached, while pages are
+    assert get_cache_stats()["hits"]["list"] == 1
+    assert get_cache_stats()["misses"]["list"] == 3
@@ -0,0 +1,131 @@
+import os
+from datetime import timedelta
+
+import pytest
+from PIL import Image as PillowImage
+from django.db import connection
+from django.utils import timezone
+
+from apps.images.jobs import process_upload_job, requeue_stale_jobs
+from apps.images.models import Image, UploadJob
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'title, resize_width, resize_height, expected_title, expected_width, expected_height', [
+        ("example", 0, 0, "example", 300, 200),
+        ("", 150, 0, "test", 150, 100),
+        ("resized", 30, 40, "resized", 30, 40),
+    ]
+)
+def test_process_upload_job(
+        title, resize_width, resize_height, expected_title, expected_width, expected_height,
+        create_upload_job, remove_images_afterwards, remove_upload_jobs_afterwards
+):
+    job = create_upload_job("test.png", "PNG", 300, 200, resize_width, resize_height, title)
+    upload_path = job.upload.path
+
+    processed = process_upload_job(job.id)
+    job.refresh_from_db()
+    saved_image = PillowImage.open(job.image.image.path)
+
+    # Check if the job has finished and created an image object
+    assert processed
+    assert job.status == UploadJob.Status.DONE
+    assert job.image.title == expected_title
+    assert (job.image.width, job.image.height) == (expected_width, expected_height)
+    assert saved_image.size == (expected_width, expected_height)
+    # Check if the uploaded file has been removed
+    assert not job.upload
+    assert not os.path.exists(upload_path)
+
+
+@pytest.mark.django_db
+def test_process_upload_job_failed(
+        create_upload_job, remove_images_afterwards, remove_upload_jobs_afterwards
+):
+    job = create_upload_job("test.ico", "ICO", 100, 100, 50, 50)
+
+    process_upload_job(job.id)
+    job.refresh_from_db()
+
+    # Check if the job has failed, without creating an image object
+    assert job.status == UploadJob.Status.FAILED
+    assert job.error == 'File format "ico" is not supported'
+    assert job.image is None
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_process_upload_job_no_transaction(
+        create_upload_job, remove_images_afterwards, remove_upload_jobs_afterwards, monkeypatch
+):
+    job = create_upload_job("test.png", "PNG", 300, 200, 150, 0)
+    in_atomic_block = []
+    create = Image.create
+
+    def create_image(**kwargs):
+        in_atomic_block.append(connection.in_atomic_block)
+        return create(**kwargs)
+
+    monkeypatch.setattr(Image, "create", create_image)
+    process_upload_job(job.id)
+
+    # Check if the image is resized outside of a transaction, so no rows are locked meanwhile
+    assert in_atomic_block == [False]
+    assert UploadJob.objects.get(pk=job.id).status == UploadJob.Status.DONE
+
+
+@pytest.mark.django_db
+def test_process_upload_job_not_saved(
+        create_upload_job, remove_images_afterwards, remove_upload_jobs_afterwards, monkeypatch
+):
+    job = create_upload_job("test.png", "PNG", 300, 200)
+    save = UploadJob.save
+
+    def save_job(self, *args, **kwargs):
+        if self.status == UploadJob.Status.DONE:
+            raise ValueError("Job could not be saved")
+        return save(self, *args, **kwargs)
+
+    monkeypatch.setattr(UploadJob, "save", save_job)
+    process_upload_job(job.id)
+    job.refresh_from_db()
+
+    # Check if the job fails, without leaving its image object behind
+    assert job.status == UploadJob.Status.FAILED
+    assert job.error == "Job could not be saved"
+    assert job.image is None
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'status', [UploadJob.Status.PROCESSING, UploadJob.Status.DONE, UploadJob.Status.FAILED]
+)
+def test_process_upload_job_not_pending(
+        status, create_upload_job, remove_images_afterwards, remove_upload_jobs_afterwards
+):
+    job = create_upload_job("test.png", "PNG", 100, 100)
+    UploadJob.objects.filter(pk=job.id).update(status=status)
+
+    # Check if jobs, which are not pending, are not processed again
+    assert process_upload_job(job.id) is None
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db
+def test_requeue_stale_jobs(create_upload_job, remove_upload_jobs_afterwards):
+    stale = create_upload_job("stale.png", "PNG", 100, 100)
+    recent = create_upload_job("recent.png", "PNG", 100, 100)
+    UploadJob.objects.filter(pk=stale.id).update(
+        status=UploadJob.Status.PROCESSING, updated_at=timezone.now() - timedelta(hours=1)
+    )
+    UploadJob.objects.filter(pk=recent.id).update(status=UploadJob.Status.PROCESSING)
+
+    requeued = requeue_stale_jobs(timedelta(minutes=30))
+
+    # Check if only the stale job was requeued
+    assert requeued == 1
+    assert UploadJob.objects.get(pk=stale.id).status == UploadJob.Status.PENDING
+    assert UploadJob.objects.get(pk=recent.id).status == UploadJob.Status.PROCESSING
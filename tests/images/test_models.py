@@ -3,10 +3,10 @@ import os
 import pytest
 from django.core.files import File
 
-from apps.images.models import Image
+from apps.images.models import Image, Rendition
 from PIL import Image as PillowImage
 
-from .conftest import test_simple_images
+from .conftest import test_simple_images, is_sharded_image_url
 
 
 @pytest.mark.django_db
@@ -39,7 +39,7 @@ def test_image_create(
     assert created.title == title
     assert created.width == width
     assert created.height == height
-    assert filename in created.url
+    assert is_sharded_image_url(created.url, extension)
 
     # Check if saved image's parameters are as expected
     assert saved_image
@@ -59,18 +59,16 @@ def test_image_create_same_filename(
         create_image_file, remove_images_afterwards
 ):
     filename = f"{file}.{extension}"
-    create_image_file(filename, file_format, 100, 100)
-    with open(filename, "rb") as test_file:
-        first_created = Image.create(
-            "test1", 100, 100, File(test_file)
-        )
-        second_created = Image.create(
-            "test2", 100, 100, File(test_file)
-        )
-        third_created = Image.create(
-            "test3", 100, 100, File(test_file)
-        )
-    os.remove(filename)
+    created = []
+    # Files with the same name, but different content
+    for width in (100, 101, 102):
+        create_image_file(filename, file_format, width, 100)
+        with open(filename, "rb") as test_file:
+            created.append(Image.create(
+                f"test{width}", 0, 0, File(test_file)
+            ))
+        os.remove(filename)
+    first_created, second_created, third_created = created
 
     # check if all the file names are different
     assert first_created
@@ -98,3 +96,99 @@ def test_image_str(create_images):
     for image in images:
         assert image
         assert str(image) == f"Image \"{image.title}\", {image.width}x{image.height}"
+
+
+@pytest.mark.django_db
+def test_image_create_same_content(create_image_file, remove_images_afterwards, monkeypatch):
+    create_image_file("same.png", "PNG", 100, 50)
+    with open("same.png", "rb") as test_file:
+        first_created = Image.create("first", 50, 0, File(test_file))
+
+    def prepare_image(*args):
+        raise AssertionError("Image prepared again")
+
+    monkeypatch.setattr("apps.images.models.prepare_image_with_renditions", prepare_image)
+    with open("same.png", "rb") as test_file:
+        second_created = Image.create("second", 50, 0, File(test_file))
+    os.remove("same.png")
+
+    # Check if the same content with the same parameters shares the stored file, without preparing it again
+    assert second_created.id != first_created.id
+    assert second_created.image.name == first_created.image.name
+    assert second_created.title == "second"
+    assert (second_created.width, second_created.height) == (50, 25)
+    assert second_created.content_hash == first_created.content_hash != ""
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'width, height, filename', [
+        (60, 0, "same.png"),
+        (0, 0, "same.png"),
+        (50, 0, "same.gif"),
+    ]
+)
+def test_image_create_same_content_other_parameters(
+        width, height, filename, create_image_file, remove_images_afterwards
+):
+    create_image_file("same.png", "PNG", 100, 50)
+    with open("same.png", "rb") as test_file:
+        first_created = Image.create("", 50, 0, File(test_file))
+        test_file.seek(0)
+        second_created = Image.create("", width, height, File(test_file, name=filename))
+    os.remove("same.png")
+
+    # Check if other sizes or formats of the same content are stored separately
+    assert second_created.content_hash == first_created.content_hash
+    assert second_created.image.name != first_created.image.name
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'file_format, extension', [
+        ("PNG", "png"),
+        ("JPEG", "jpg"),
+    ]
+)
+def test_image_create_renditions(file_format, extension, create_image_file, remove_images_afterwards, settings):
+    settings.IMAGES_RENDITION_WIDTHS = [320, 640, 1280]
+    filename = f"renditions.{extension}"
+    create_image_file(filename, file_format, 1000, 500)
+    with open(filename, "rb") as test_file:
+        created = Image.create("renditions", 800, 0, File(test_file))
+    os.remove(filename)
+
+    renditions = list(created.renditions.all())
+
+    # Check if renditions smaller than the image are created, ordered by width
+    assert [(rendition.width, rendition.height) for rendition in renditions] == [(320, 160), (640, 320)]
+    for rendition in renditions:
+        assert is_sharded_image_url(rendition.url, extension)
+        with PillowImage.open(rendition.file.path) as saved_image:
+            assert saved_image.size == (rendition.width, rendition.height)
+            assert saved_image.format == file_format
+    assert str(renditions[0]) == f"Rendition of image {created.id}, 320x160"
+
+
+@pytest.mark.django_db
+def test_image_create_renditions_disabled(create_image_file, remove_images_afterwards, settings):
+    settings.IMAGES_RENDITION_WIDTHS = []
+    create_image_file("renditions.png", "PNG", 1000, 500)
+    with open("renditions.png", "rb") as test_file:
+        Image.create("renditions", 0, 0, File(test_file))
+    os.remove("renditions.png")
+
+    # Check if no renditions are created, when no widths are configured
+    assert not Rendition.objects.exists()
+
+
+@pytest.mark.parametrize(
+    'image_original_name, width, expected', [
+        ("photo.jpg", 320, "photo_320w.jpg"),
+        ("my.photo.png", 640, "my.photo_640w.png"),
+        ("", 320, ""),
+    ]
+)
+def test_rendition_get_original_name(image_original_name, width, expected):
+    # Check if renditions are served under names derived from their image objects' ones
+    assert Rendition.get_original_name(image_original_name, width) == expected
@@ -0,0 +1,117 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.db.middleware import PIN_COOKIE, ReplicaPinningMiddleware
+from apps.db.routers import ReplicaRouter, request_routing
+from apps.images.models import Image
+
+from .conftest import test_simple_images
+
+# The "replica" database (see settings_test) is a separate SQLite database, which is never written to,
+# so objects are only found there, if reads go to the primary database. Tests are not wrapped in transactions,
+# as reads inside them go to the primary database.
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DB_REPLICAS = ["replica"]
+
+
+@pytest.mark.django_db(databases=["default", "replica"], transaction=True)
+def test_reads_go_to_replica(api_client, replica, create_images):
+    image = create_images(test_simple_images[:1])[0]
+
+    # Check if the image object was written to the primary database only
+    assert Image.objects.using(DEFAULT_DB_ALIAS).count() == 1
+    assert Image.objects.using("replica").count() == 0
+
+    # Check if reads of requests go to the replica
+    assert api_client.get(reverse('images_view')).data == []
+    assert api_client.get(reverse('single_image_view', kwargs={'image_id': image.id})).status_code == 404
+
+
+@pytest.mark.django_db(databases=["default", "replica"], transaction=True)
+def test_write_pins_client(api_client, settings, replica, post_image, create_image_file, remove_images_afterwards):
+    create_image_file("test.png", "PNG", 300, 200)
+    response = post_image(api_client, "pinned", "test.png", 150, 100)
+
+    # Check if the client writing to the database gets the pin cookie
+    assert response.status_code == 201
+    assert response.cookies[PIN_COOKIE]["max-age"] == settings.DB_REPLICA_PIN_SECONDS
+
+    # Check if the pinned client reads its own write, while other clients read from the replica
+    assert [item["title"] for item in api_client.get(reverse('images_view')).data] == ["pinned"]
+    assert APIClient().get(reverse('images_view')).data == []
+
+
+@pytest.mark.django_db
+def test_no_pinning_without_replicas(api_client, post_image, create_image_file, remove_images_afterwards):
+    create_image_file("test.png", "PNG", 300, 200)
+    response = post_image(api_client, "primary", "test.png", 150, 100)
+
+    # Check if the cookie is not set, when there are no replicas
+    assert response.status_code == 201
+    assert PIN_COOKIE not in response.cookies
+
+
+@pytest.mark.django_db(databases=["default", "replica"], transaction=True)
+def test_replica_reads_not_cached_after_change(api_client, replica, create_images):
+    create_images(test_simple_images[:1])
+    assert APIClient().get(reverse('images_view')).data == []
+
+    api_client.cookies[PIN_COOKIE] = "1"
+    response = api_client.get(reverse('images_view'))
+
+    # Check if a list read from a lagging replica is not cached for clients reading from the primary database
+    assert [item["title"] for item in response.data] == [test_simple_images[0]["title"]]
+
+
+@pytest.mark.django_db(databases=["default", "replica"], transaction=True)
+def test_replica_router(replica):
+    router = ReplicaRouter()
+
+    # Check if reads outside requests (e.g. of background workers) go to the primary database
+    assert router.db_for_read(Image) == DEFAULT_DB_ALIAS
+
+    with request_routing(pinned=False) as routing:
+        # Check if reads of requests go to replicas, except inside transactions of the primary database
+        assert router.db_for_read(Image) == "replica"
+        with transaction.atomic():
+            assert router.db_for_read(Image) == DEFAULT_DB_ALIAS
+
+        # Check if writes go to the primary database, and pin the rest of the request to it
+        assert router.db_for_write(Image) == DEFAULT_DB_ALIAS
+        assert routing.wrote
+        assert router.db_for_read(Image) == DEFAULT_DB_ALIAS
+
+    # Check if migrations skip replicas
+    assert router.allow_migrate("replica", "images") is False
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, "images") is None
+
+
+def test_replica_pinning_middleware_async(replica):
+    async def view(request):
+        ReplicaRouter().db_for_write(Image)
+        return HttpResponse()
+
+    middleware = ReplicaPinningMiddleware(view)
+    response = async_to_sync(middleware)(RequestFactory().get("/"))
+
+    # Check if async requests are handled without a thread, and get the pin cookie after writing
+    assert response.cookies[PIN_COOKIE].value == "1"
+
+
+def test_replica_router_one_replica_per_request(settings):
+    # The router only picks aliases, so the second replica does not need to exist
+    settings.DB_REPLICAS = ["replica", "other_replica"]
+    router = ReplicaRouter()
+
+    # Check if all reads of a request go to the same replica
+    for _ in range(5):
+        with request_routing(pinned=False):
+            assert len({router.db_for_read(Image) for _ in range(10)}) == 1
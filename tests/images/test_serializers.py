@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from django.core.files import File
+from rest_framework.renderers import JSONRenderer
+
+from apps.images.models import Image
+from apps.images.serializers import PublicImageSerializer, ImageRowSerializer, get_image_url_builder
+
+from .conftest import test_simple_images
+
+test_unusual_images = [
+    {
+        "title": "Zażółć \"gęślą\" jaźń", "file": "zażółć gęślą",
+        "extension": "png", "width": 10, "height": 20
+    },
+    {
+        "title": "", "file": "100% #1 & co?",
+        "extension": "png", "width": 1, "height": 1
+    },
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'templates', [[], test_simple_images, test_unusual_images]
+)
+def test_image_row_serializer_equivalence(templates, create_images):
+    create_images(templates)
+    queryset = Image.objects.order_by("id")
+
+    expected = JSONRenderer().render(PublicImageSerializer(queryset, many=True).data)
+    result = JSONRenderer().render(ImageRowSerializer(ImageRowSerializer.get_rows(queryset), many=True).data)
+
+    # Check if the fast serializer's output is byte-identical to the model serializer's
+    assert result == expected
+
+
+@pytest.mark.django_db
+def test_image_row_serializer_queries(create_images, django_assert_num_queries):
+    create_images(test_simple_images)
+
+    with django_assert_num_queries(2):
+        data = ImageRowSerializer(ImageRowSerializer.get_rows(Image.objects.all()), many=True).data
+
+    # Check if all objects were serialized with a single query, and their renditions with another one
+    assert len(data) == len(test_simple_images)
+
+
+@pytest.mark.parametrize(
+    'name', [
+        "images/test.png", "images/zażółć gęślą.png", "images/100% #1 & co?.png",
+        "images/./test.png", ".hidden/test.png", "/images/test.png", "images\\test.png", "images//test.png",
+    ]
+)
+def test_get_image_url_builder(name):
+    storage = Image._meta.get_field("image").storage
+
+    # Check if the URL is the same as the one built by the storage
+    assert get_image_url_builder()(name) == storage.url(name)
+
+
+@pytest.mark.django_db
+def test_public_image_serializer_renditions(create_image_file, remove_images_afterwards, settings):
+    settings.IMAGES_RENDITION_WIDTHS = [30, 60]
+    create_image_file("test.png", "PNG", 100, 50)
+    with open("test.png", "rb") as test_file:
+        image = Image.create("", 0, 0, File(test_file))
+    os.remove("test.png")
+    small, large = image.renditions.all()
+    queryset = Image.objects.order_by("id")
+
+    data = PublicImageSerializer(image).data
+
+    # Check if renditions and srcset list files from the smallest one
+    assert data["renditions"] == [
+        {"url": small.url, "width": 30, "height": 15}, {"url": large.url, "width": 60, "height": 30}
+    ]
+    assert data["srcset"] == f"{small.url} 30w, {large.url} 60w, {image.url} 100w"
+
+    # Check if the fast serializer's output is byte-identical to the model serializer's
+    expected = JSONRenderer().render(PublicImageSerializer(queryset, many=True).data)
+    result = JSONRenderer().render(ImageRowSerializer(ImageRowSerializer.get_rows(queryset), many=True).data)
+    assert result == expected
@@ -0,0 +1,295 @@
+import os
+
+import pytest
+from PIL import Image as PillowImage
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from apps.images.models import Image, Rendition
+from apps.images.storage import (
+    create_missing_renditions, get_migrated_name, image_upload_to, migrate_image_files, ImageStorage
+)
+from apps.images.variants import get_negotiated_variant
+
+from .conftest import is_sharded_image_url, test_simple_images
+
+
+@pytest.fixture
+def create_flat_images(remove_images_afterwards):
+    storage = Image._meta.get_field("image").storage
+    names = []
+
+    def inner_create_flat_images(count: int) -> list:
+        images = []
+        for i in range(count):
+            name = storage.save(f"images/flat_{i}.png", ContentFile(f"content {i}".encode()))
+            names.append(name)
+            images.append(Image.objects.create(title=f"flat {i}", width=1, height=1, image=name))
+        return images
+
+    yield inner_create_flat_images
+
+    for name in names:
+        storage.delete(name)
+
+
+def test_image_upload_to():
+    names = [image_upload_to(None, "Some File.PNG") for _ in range(3)]
+
+    # Check if names are sharded, random and keep the extension
+    for name in names:
+        assert is_sharded_image_url(name, "png")
+    assert len(set(names)) == 3
+
+
+@pytest.mark.django_db
+def test_image_storage_same_names(create_image_file, remove_images_afterwards, monkeypatch):
+    storage = Image._meta.get_field("image").storage
+    assert isinstance(storage, ImageStorage)
+
+    def exists(name):
+        raise AssertionError(f"Existence of {name} checked")
+
+    monkeypatch.setattr(ImageStorage, "exists", exists)
+    images = []
+    for width in range(10, 15):
+        create_image_file("image.png", "PNG", width, 10)
+        with open("image.png", "rb") as test_file:
+            images.append(Image.create("", 0, 0, File(test_file)))
+        os.remove("image.png")
+
+    # Check if files with the same name are stored under different names, without checking them
+    assert len({image.image.name for image in images}) == 5
+    for image in images:
+        assert image.original_name == "image.png"
+        assert image.title == "image"
+
+
+def test_image_storage_collision(tmp_path):
+    storage = ImageStorage(location=tmp_path)
+    name = image_upload_to(None, "test.png")
+
+    first = storage.save(name, ContentFile(b"first"))
+    second = storage.save(name, ContentFile(b"second"))
+
+    # Check if the existing file is not overwritten, and a new name is drawn in the same folder
+    assert first == name
+    assert second != name
+    assert is_sharded_image_url(second, "png")
+    assert os.path.dirname(second) == os.path.dirname(name)
+    with storage.open(first) as file:
+        assert file.read() == b"first"
+    with storage.open(second) as file:
+        assert file.read() == b"second"
+
+
+def test_image_storage_not_sharded(tmp_path):
+    storage = ImageStorage(location=tmp_path)
+
+    first = storage.save("uploads/test.png", ContentFile(b"first"))
+    second = storage.save("uploads/test.png", ContentFile(b"second"))
+
+    # Check if other files are named like by FileSystemStorage
+    assert first == "uploads/test.png"
+    assert second.startswith("uploads/test_") and second.endswith(".png")
+
+
+@pytest.mark.django_db
+def test_migrate_image_files(create_flat_images, django_capture_on_commit_callbacks):
+    images = create_flat_images(5)
+    storage = Image._meta.get_field("image").storage
+
+    with django_capture_on_commit_callbacks(execute=True):
+        results = list(migrate_image_files(batch_size=2))
+
+    # Check if all files were migrated in batches
+    assert results == [(2, 0), (2, 0), (1, 0)]
+    for i, image in enumerate(images):
+        migrated = Image.objects.get(id=image.id)
+        assert migrated.image.name == get_migrated_name(image.image.name)
+        assert is_sharded_image_url(migrated.url, "png")
+        assert migrated.updated_at > image.updated_at
+        assert migrated.original_name == f"flat_{i}.png"
+        with migrated.image.open("rb") as file:
+            assert file.read() == f"content {i}".encode()
+        # Check if old files were removed
+        assert not storage.exists(image.image.name)
+
+    # Check if running the migration again does nothing
+    assert list(migrate_image_files()) == []
+
+
+@pytest.mark.django_db
+def test_migrate_image_files_keep_old(create_flat_images, django_capture_on_commit_callbacks):
+    images = create_flat_images(2)
+    storage = Image._meta.get_field("image").storage
+
+    with django_capture_on_commit_callbacks(execute=True):
+        list(migrate_image_files(keep_old=True))
+
+    # Check if old files were left in place
+    for image in images:
+        assert storage.exists(image.image.name)
+
+
+@pytest.mark.django_db
+def test_migrate_image_files_resumed(create_flat_images, django_capture_on_commit_callbacks):
+    image = create_flat_images(1)[0]
+    storage = Image._meta.get_field("image").storage
+    # Incomplete copy, left by an interrupted migration
+    storage.save(get_migrated_name(image.image.name), ContentFile(b"cont"))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        results = list(migrate_image_files())
+
+    # Check if the file was copied again
+    migrated = Image.objects.get(id=image.id)
+    assert results == [(1, 0)]
+    assert migrated.image.name == get_migrated_name(image.image.name)
+    with migrated.image.open("rb") as file:
+        assert file.read() == b"content 0"
+
+
+@pytest.mark.django_db
+def test_migrate_image_files_missing(create_flat_images, django_capture_on_commit_callbacks):
+    images = create_flat_images(2)
+    images[0].image.storage.delete(images[0].image.name)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        results = list(migrate_image_files())
+
+    # Check if objects with missing files are left unchanged
+    assert results == [(1, 1)]
+    assert Image.objects.get(id=images[0].id).image.name == images[0].image.name
+    assert Image.objects.get(id=images[1].id).image.name == get_migrated_name(images[1].image.name)
+
+
+@pytest.mark.django_db
+def test_migrate_image_files_command(create_flat_images, capsys):
+    create_flat_images(3)
+
+    call_command("migrate_image_files", "--batch-size", "2")
+
+    # Check if the command reports migrated files
+    assert "Done: migrated 3 file(s), 0 failed" in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_create_missing_renditions(create_images):
+    # 576 px wide JPEG, and 300 px wide PNG, which is narrower than any rendition
+    wide, narrow = create_images([test_simple_images[2], test_simple_images[0]])
+    copy = Image.objects.create(title="copy", width=wide.width, height=wide.height, image=wide.image.name)
+    missing = Image.objects.create(title="missing", width=1000, height=1000, image="images/missing.png")
+
+    results = list(create_missing_renditions(batch_size=2))
+
+    # Check if renditions were created for wide images, out of a single resize of their shared file
+    assert results == [(2, 0), (0, 1)]
+    renditions = {rendition.image_id: rendition for rendition in Rendition.objects.all()}
+    assert set(renditions) == {wide.id, copy.id}
+    assert (renditions[wide.id].width, renditions[wide.id].height) == (320, 680)
+    assert renditions[wide.id].file.name == renditions[copy.id].file.name
+    assert is_sharded_image_url(renditions[wide.id].url, "jpg")
+    with PillowImage.open(renditions[wide.id].file.path) as img:
+        assert img.size == (320, 680)
+
+    # Check if updated objects get new ETags, and others are left unchanged
+    assert Image.objects.get(id=wide.id).updated_at > wide.updated_at
+    assert Image.objects.get(id=narrow.id).updated_at == narrow.updated_at
+    assert Image.objects.get(id=missing.id).updated_at == missing.updated_at
+
+    # Check if running it again only retries the failed object
+    assert list(create_missing_renditions()) == [(0, 1)]
+
+
+@pytest.mark.django_db
+def test_create_missing_renditions_shares_existing(create_images):
+    image = create_images([test_simple_images[2]])[0]
+    list(create_missing_renditions())
+    copy = Image.objects.create(title="copy", width=image.width, height=image.height, image=image.image.name)
+
+    # Check if a new object sharing the file gets the existing renditions
+    assert list(create_missing_renditions()) == [(1, 0)]
+    assert Rendition.objects.get(image=copy).file.name == Rendition.objects.get(image=image).file.name
+
+
+@pytest.mark.django_db
+def test_create_renditions_command(create_images, capsys):
+    create_images([test_simple_images[2]])
+
+    call_command("create_renditions")
+
+    # Check if the command reports updated objects
+    assert "Done: created renditions of 1 image(s), 0 failed" in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_release_image_files(create_image_file, remove_images_afterwards, django_capture_on_commit_callbacks):
+    create_image_file("shared.png", "PNG", 10, 10)
+    with open("shared.png", "rb") as test_file:
+        images = [Image.create("", 0, 0, File(test_file)) for _ in range(2)]
+    os.remove("shared.png")
+    storage = images[0].image.storage
+    name = images[0].image.name
+
+    with django_capture_on_commit_callbacks(execute=True):
+        images[0].delete()
+
+    # Check if the shared file is kept, while another object uses it
+    assert storage.exists(name)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        images[1].delete()
+
+    # Check if the file is removed with the last object using it
+    assert not storage.exists(name)
+
+
+@pytest.mark.django_db
+def test_release_rendition_files(
+        create_image_file, remove_images_afterwards, django_capture_on_commit_callbacks, settings
+):
+    settings.IMAGES_RENDITION_WIDTHS = [40, 20]
+    create_image_file("shared.png", "PNG", 100, 50)
+    with open("shared.png", "rb") as test_file:
+        images = [Image.create("", 0, 0, File(test_file)) for _ in range(2)]
+    os.remove("shared.png")
+    names = [rendition.file.name for rendition in images[0].renditions.all()]
+    storage = images[0].image.storage
+
+    # Check if renditions' files are shared as well
+    assert len(names) == 2
+    assert sorted(rendition.file.name for rendition in images[1].renditions.all()) == sorted(names)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        images[0].delete()
+
+    # Check if shared rendition files are kept, while another object uses them
+    assert all(storage.exists(name) for name in names)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        images[1].delete()
+
+    # Check if rendition files are removed with the last object using them
+    assert not any(storage.exists(name) for name in names)
+
+
+@pytest.mark.django_db
+def test_release_image_files_negotiated(
+        create_image_file, remove_images_afterwards, django_capture_on_commit_callbacks, settings
+):
+    settings.IMAGES_RENDITION_WIDTHS = []
+    create_image_file("negotiated.png", "PNG", 30, 20)
+    with open("negotiated.png", "rb") as test_file:
+        image = Image.create("", 0, 0, File(test_file))
+    os.remove("negotiated.png")
+    variant = get_negotiated_variant(image.image.path, "webp")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        image.delete()
+
+    # Check if variants in negotiated formats are removed together with the stored file
+    assert variant == image.image.path + ".webp"
+    assert not os.path.exists(image.image.path)
+    assert not os.path.exists(variant)
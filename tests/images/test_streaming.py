@@ -0,0 +1,50 @@
+import json
+
+import pytest
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from apps.images.streaming import stream_json_array
+
+
+class ValueSerializer(serializers.Serializer):
+    value = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+@pytest.mark.parametrize(
+    'count, chunk_size', [
+        (0, 1),
+        (1, 1),
+        (5, 2),
+        (6, 3),
+        (10, 100),
+    ]
+)
+def test_stream_json_array(count, chunk_size):
+    objects = [{"value": i, "name": f"żółw {i}"} for i in range(count)]
+
+    chunks = list(stream_json_array(objects, ValueSerializer, chunk_size))
+    content = b"".join(chunks)
+
+    # Check if streamed content is identical to rendering the whole list at once
+    assert content == JSONRenderer().render(ValueSerializer(objects, many=True).data)
+    assert json.loads(content) == objects
+    # Check if objects were rendered in chunks (opening and closing brackets are separate)
+    assert len(chunks) == 2 + -(-count // chunk_size)
+
+
+def test_stream_json_array_is_lazy():
+    consumed = []
+
+    def objects():
+        for i in range(10):
+            consumed.append(i)
+            yield {"value": i, "name": str(i)}
+
+    stream = stream_json_array(objects(), ValueSerializer, 3)
+    next(stream)
+    next(stream)
+
+    # Check if only the first chunk has been read from the source
+    assert consumed == [0, 1, 2]
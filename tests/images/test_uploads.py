@@ -0,0 +1,45 @@
+import hashlib
+
+import pytest
+from django.core.files.uploadhandler import StopFutureHandlers
+
+from apps.images.uploads import HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler
+
+
+def receive_file(handler, content: bytes, chunk_size: int = 100):
+    handler.handle_raw_input(None, {}, len(content), "boundary")
+    try:
+        handler.new_file("image", "test.bmp", "image/bmp", len(content))
+    except StopFutureHandlers:
+        # Raised by the memory handler, when it takes the file
+        pass
+    for start in range(0, len(content), chunk_size):
+        handler.receive_data_chunk(content[start:start + chunk_size], start)
+    return handler.file_complete(len(content))
+
+
+@pytest.mark.parametrize('handler_class', [HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler])
+def test_upload_handler_content_hash(handler_class, settings):
+    content = bytes(range(256)) * 4
+
+    file = receive_file(handler_class(), content)
+
+    # Check if the file is received whole, with the hash of its content
+    assert file.size == len(content)
+    assert file.read() == content
+    assert file.content_hash == hashlib.sha256(content).hexdigest()
+    file.close()
+
+
+@pytest.mark.parametrize('handler_class', [HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler])
+def test_upload_handler_oversized_file(handler_class, settings):
+    settings.IMAGES_MAX_UPLOAD_SIZE = 250
+    content = bytes(range(256)) * 4
+
+    file = receive_file(handler_class(), content)
+
+    # Check if the data of a file exceeding the limit is dropped while receiving it, but its size is kept
+    assert file.size == len(content)
+    assert file.read() == b""
+    assert not hasattr(file, "content_hash")
+    file.close()
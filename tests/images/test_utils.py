@@ -1,10 +1,18 @@
 import os
+import subprocess
+import sys
+from io import BytesIO
 
 import pytest
+from django.conf import settings
 from django.core.files import File
 from PIL import Image as PillowImage
 
-from apps.images.utils import get_error_response, prepare_image, ImagePreparationError
+from apps.images.storage import ImageStorage, image_upload_to
+from apps.images.utils import (
+    check_image_limits, encode_image, get_encoder_profile, get_error_response, prepare_image,
+    prepare_image_with_renditions, resize_image, ImagePreparationError, ImageTooLargeError, TemporaryImageFile
+)
 
 
 @pytest.mark.parametrize(
@@ -43,6 +51,9 @@ def test_prepare_image(
         result_file, result_width, result_height = prepare_image(
             File(file_binary, name=filename), resize_width, resize_height
         )
+        # Original file is returned, if its size does not change
+        result_image = PillowImage.open(result_file)
+        result_image.load()
     os.remove(filename)
 
     if resize_width or resize_height:
@@ -54,8 +65,6 @@ def test_prepare_image(
         resize_width = width
         resize_height = height
 
-    result_image = PillowImage.open(result_file)
-
     # Check if the resulting image matches provided parameters
     assert result_file
     assert result_image
@@ -114,3 +123,293 @@ def test_prepare_image_not_supported_format(
         except ImagePreparationError as e:
             assert str(e) == f"File format \"{extension}\" is not supported"
     os.remove(filename)
+
+
+@pytest.mark.parametrize(
+    'filename, file_format, resize_width, resize_height', [
+        ("test.jpg", "JPEG", 100, 0),
+        ("test.jpg", "JPEG", 333, 111),
+        ("test.png", "PNG", 100, 0),
+        ("test.webp", "WEBP", 0, 50),
+        ("test.png", "PNG", 2000, 0),
+    ]
+)
+def test_prepare_image_speed_mode(
+        filename, file_format, resize_width, resize_height,
+        create_image_file, settings
+):
+    settings.IMAGES_RESIZE_MODE = "speed"
+    create_image_file(filename, file_format, 1600, 1200)
+    with open(filename, "rb") as file_binary:
+        result_file, result_width, result_height = prepare_image(
+            File(file_binary, name=filename), resize_width, resize_height
+        )
+    os.remove(filename)
+
+    resize_width = resize_width or int(1600 * resize_height / 1200)
+    resize_height = resize_height or int(1200 * resize_width / 1600)
+    result_image = PillowImage.open(result_file)
+
+    # Check if the resulting image matches provided parameters
+    assert result_image.format == file_format
+    assert result_image.size == (resize_width, resize_height)
+    assert (result_width, result_height) == (resize_width, resize_height)
+
+
+@pytest.mark.parametrize(
+    'mode, expected_decoded_size', [
+        ("fidelity", (1600, 1200)),
+        ("speed", (200, 150)),
+    ]
+)
+def test_resize_image_jpeg_draft(mode, expected_decoded_size, create_image_file, settings):
+    settings.IMAGES_RESIZE_MODE = mode
+    create_image_file("test.jpg", "JPEG", 1600, 1200)
+    img = PillowImage.open("test.jpg")
+
+    result = resize_image(img, (120, 90))
+    os.remove("test.jpg")
+
+    # Check if JPEG was decoded at a reduced scale only in "speed" mode
+    assert result.size == (120, 90)
+    assert img.size == expected_decoded_size
+
+
+@pytest.mark.parametrize(
+    'filename, file_format, width, height, resize_width, resize_height', [
+        ("test.png", "PNG", 400, 300, 400, 300),
+        ("test.gif", "GIF", 400, 300, 400, 0),
+        ("test.jpg", "JPEG", 400, 300, 0, 300),
+    ]
+)
+def test_prepare_image_same_size(
+        filename, file_format, width, height, resize_width, resize_height,
+        create_image_file
+):
+    create_image_file(filename, file_format, width, height)
+    with open(filename, "rb") as file_binary:
+        file = File(file_binary, name=filename)
+        result_file, result_width, result_height = prepare_image(
+            file, resize_width, resize_height
+        )
+
+        # Check if the original file is passed through, without re-encoding
+        assert result_file is file
+        assert result_file.tell() == 0
+        assert (result_width, result_height) == (width, height)
+    os.remove(filename)
+
+
+def test_prepare_image_same_size_different_format(create_image_file):
+    # PNG file with an extension of another format
+    create_image_file("test.jpg", "PNG", 400, 300)
+    with open("test.jpg", "rb") as file_binary:
+        file = File(file_binary, name="test.jpg")
+        result_file, result_width, result_height = prepare_image(file, 400, 300)
+        result_image = PillowImage.open(result_file)
+
+        # Check if the image is re-encoded to match its extension
+        assert result_file is not file
+        assert result_image.format == "JPEG"
+        assert result_image.size == (400, 300)
+    os.remove("test.jpg")
+
+
+def test_prepare_image_temporary_file(create_image_file, tmp_path):
+    create_image_file("test.png", "PNG", 400, 300)
+    with open("test.png", "rb") as file_binary:
+        result_file, _, _ = prepare_image(File(file_binary, name="test.png"), 200, 0)
+    os.remove("test.png")
+    path = result_file.temporary_file_path()
+
+    # Check if the resized image is encoded into a temporary file, which is moved into the storage
+    assert isinstance(result_file, TemporaryImageFile)
+    assert os.path.exists(path)
+    name = ImageStorage(location=tmp_path).save(image_upload_to(None, "test.png"), result_file)
+    assert not os.path.exists(path)
+    assert PillowImage.open(tmp_path / name).size == (200, 150)
+
+    # Check if closing a moved file does not fail
+    result_file.close()
+
+
+def test_temporary_image_file_close():
+    file = TemporaryImageFile("test.png")
+    file.write(b"test")
+    path = file.temporary_file_path()
+
+    # Check if the temporary file is removed, once it's closed
+    assert path.endswith(".png")
+    file.close()
+    assert not os.path.exists(path)
+
+
+# Run in a separate process, so its peak RSS (which includes Pillow's buffers, unlike Python's heap) is not
+# affected by other tests
+PREPARE_IMAGE_MEMORY_SCRIPT = """
+import resource, sys
+import django
+django.setup()
+from apps.images.storage import ImageStorage, image_upload_to
+from apps.images.utils import TemporaryImageFile, prepare_image
+
+upload = TemporaryImageFile("noise.png", sys.argv[1])
+storage = ImageStorage(location=sys.argv[2])
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+result_file, width, height = prepare_image(upload, int(sys.argv[3]), 0)
+name = storage.save(image_upload_to(None, "noise.png"), result_file)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(width, height, storage.size(name), (after - before) * 1024)
+"""
+
+
+def test_prepare_image_memory(tmp_path):
+    # Noise does not compress, so files are as large as the pixel data (~12 MB each)
+    size = (2048, 2048)
+    output_width = 2000
+    path = str(tmp_path / "noise.png")
+    PillowImage.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).save(path, format="PNG")
+    (tmp_path / "storage").mkdir()
+
+    process = subprocess.run(
+        [sys.executable, "-c", PREPARE_IMAGE_MEMORY_SCRIPT, path, str(tmp_path / "storage"), str(output_width)],
+        capture_output=True, text=True, cwd=settings.BASE_DIR, check=True
+    )
+    width, height, stored_size, rss_growth = map(int, process.stdout.split())
+
+    # Check if the peak memory of the resize is bounded by the decoded pixels of both images
+    # (plus encoders' buffers), so neither the uploaded, nor the resulting file was buffered in memory as a whole
+    assert (width, height) == (output_width, output_width)
+    assert stored_size > 10 * 1024 ** 2
+    pixels = size[0] * size[1] * 3 + output_width * output_width * 3
+    assert rss_growth < pixels + 8 * 1024 ** 2
+
+
+@pytest.mark.parametrize(
+    'image_size, output_size, error', [
+        ((100, 100), None, None),
+        ((100, 100), (8192, 50), None),
+        ((10000, 5001), None, ImageTooLargeError),
+        ((100, 100), (8193, 50), ImagePreparationError),
+        ((100, 100), (50, 8193), ImagePreparationError),
+    ]
+)
+def test_check_image_limits(image_size, output_size, error):
+    # Check if sizes above the limits are rejected
+    if error:
+        with pytest.raises(error):
+            check_image_limits(image_size, output_size)
+    else:
+        check_image_limits(image_size, output_size)
+
+
+def test_prepare_image_too_many_pixels(create_image_file, settings):
+    settings.IMAGES_MAX_PIXELS = 100
+    create_image_file("test.png", "PNG", 20, 20)
+
+    # Check if images with too many pixels are not prepared
+    with open("test.png", "rb") as file_binary:
+        with pytest.raises(ImageTooLargeError):
+            prepare_image(File(file_binary, name="test.png"), 10, 0)
+    os.remove("test.png")
+
+
+def test_get_encoder_profile(settings):
+    settings.IMAGES_ENCODER_PROFILES = {"JPEG": {"resample": "Lanczos", "quality": 90}, "GIF": {}}
+
+    # Check if profiles are split into the filter and encoder's options
+    assert get_encoder_profile("JPEG") == {"resample": PillowImage.Resampling.LANCZOS, "options": {"quality": 90}}
+    assert get_encoder_profile("GIF") == {"resample": None, "options": {}}
+    assert get_encoder_profile("BMP") == {"resample": None, "options": {}}
+
+
+@pytest.mark.parametrize(
+    'resample, expected', [
+        ("nearest", PillowImage.Resampling.NEAREST),
+        ("lanczos", PillowImage.Resampling.LANCZOS),
+    ]
+)
+def test_resize_image_resample(resample, expected, settings, monkeypatch):
+    settings.IMAGES_ENCODER_PROFILES = {"PNG": {"resample": resample}}
+    used = []
+    original_resize = PillowImage.Image.resize
+
+    def resize(img, size, resample=None, *args, **kwargs):
+        used.append(resample)
+        return original_resize(img, size, resample, *args, **kwargs)
+
+    monkeypatch.setattr(PillowImage.Image, "resize", resize)
+    result = resize_image(PillowImage.new("RGB", (40, 30)), (20, 15), "PNG")
+
+    # Check if the filter of the output format's profile is used
+    assert result.size == (20, 15)
+    assert used == [expected]
+
+
+def test_encode_image_options(settings):
+    img = PillowImage.effect_noise((200, 150), 64).convert("RGB")
+    outputs = {}
+    for level in (0, 9):
+        settings.IMAGES_ENCODER_PROFILES = {"PNG": {"compress_level": level}}
+        outputs[level] = BytesIO()
+        encode_image(img, outputs[level], "PNG")
+
+    # Check if encoder's options are applied
+    assert len(outputs[9].getvalue()) < len(outputs[0].getvalue())
+
+    settings.IMAGES_ENCODER_PROFILES = {"JPEG": {"quality": 60, "progressive": True}}
+    output = BytesIO()
+    encode_image(img, output, "JPEG")
+    output.seek(0)
+    assert PillowImage.open(output).info.get("progressive")
+
+
+@pytest.mark.parametrize(
+    'width, rendition_widths, expected_size, expected_renditions', [
+        (0, [320, 640, 1280], (1500, 1000), [(1280, 853), (640, 426), (320, 213)]),
+        (700, [640, 320, 640, 1280], (700, 466), [(640, 426), (320, 213)]),
+        (300, [320, 640], (300, 200), []),
+    ]
+)
+def test_prepare_image_with_renditions(
+        width, rendition_widths, expected_size, expected_renditions, create_image_file, monkeypatch
+):
+    create_image_file("test.png", "PNG", 1500, 1000)
+    decoded = []
+    original_load = PillowImage.Image.load
+
+    def load(img):
+        if getattr(img, "tile", None):
+            decoded.append(img.size)
+        return original_load(img)
+
+    resized = []
+    original_resize_image = resize_image
+
+    def resize(img, output_size, img_format=None):
+        resized.append((img.size, output_size))
+        return original_resize_image(img, output_size, img_format)
+
+    monkeypatch.setattr(PillowImage.Image, "load", load)
+    monkeypatch.setattr("apps.images.utils.resize_image", resize)
+    with open("test.png", "rb") as file_binary:
+        result, result_width, result_height, renditions = prepare_image_with_renditions(
+            File(file_binary, name="test.png"), width, 0, rendition_widths
+        )
+    os.remove("test.png")
+
+    # Check if the source is decoded once, and renditions are scaled step by step, from the largest
+    assert decoded == [(1500, 1000)]
+    sizes = [(1500, 1000), *([expected_size] if width else []), *expected_renditions]
+    assert resized == list(zip(sizes, sizes[1:]))
+
+    # Check if renditions' files have expected sizes and the same format
+    assert (result_width, result_height) == expected_size
+    assert [(rendition_width, rendition_height) for _, rendition_width, rendition_height in renditions] \
+        == expected_renditions
+    for rendition, rendition_width, rendition_height in renditions:
+        with PillowImage.open(rendition.temporary_file_path()) as img:
+            assert img.size == (rendition_width, rendition_height)
+            assert img.format == "PNG"
+        rendition.close()
+    result.close()
@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+
+import pytest
+from PIL import ExifTags, Image as PillowImage, ImageCms
+
+from apps.images.admission import ResizeCapacityError
+from apps.images.variants import (
+    VariantCache, get_accepted_format, get_negotiated_file, get_negotiated_variant, parse_accept
+)
+
+
+def write_bytes(content: bytes):
+    def build(output):
+        output.write(content)
+    return build
+
+
+def test_variant_cache_make_key():
+    # Check if keys are deterministic and depend on every part
+    assert VariantCache.make_key("images/a.png", 10, 0, "PNG") == VariantCache.make_key("images/a.png", 10, 0, "PNG")
+    assert VariantCache.make_key("images/a.png", 10, 0, "PNG") != VariantCache.make_key("images/a.png", 0, 10, "PNG")
+    assert VariantCache.make_key("images/a.png", 10, 0, "PNG") != VariantCache.make_key("images/a.png", 10, 0, "GIF")
+
+
+def test_variant_cache_get_or_create(tmp_path):
+    cache = VariantCache(tmp_path, 1000)
+    calls = []
+
+    def build(output):
+        calls.append(1)
+        output.write(b"variant")
+
+    with cache.get_or_create("abcd", "png", build) as first:
+        first_content = first.read()
+    with cache.get_or_create("abcd", "png", build) as second:
+        second_content = second.read()
+
+    # Check if the variant was built once, and stored under its key
+    assert first_content == second_content == b"variant"
+    assert len(calls) == 1
+    assert cache.get_path("abcd", "png").read_bytes() == b"variant"
+
+
+def test_variant_cache_build_error(tmp_path):
+    cache = VariantCache(tmp_path, 1000)
+
+    def build(output):
+        output.write(b"partial")
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        cache.get_or_create("abcd", "png", build)
+
+    # Check if neither the variant, nor a temporary file was left behind
+    assert not list(tmp_path.glob("*/*"))
+
+
+def test_variant_cache_eviction(tmp_path):
+    cache = VariantCache(tmp_path, 350)
+    for i, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.get_or_create(key, "png", write_bytes(b"x" * 100)).close()
+        # Make modification times distinct and ordered
+        os.utime(cache.get_path(key, "png"), (i, i))
+
+    # Use the oldest variant, so that the middle one becomes least recently used
+    cache.get_or_create("aa01", "png", write_bytes(b"")).close()
+    cache.get_or_create("dd04", "png", write_bytes(b"x" * 100)).close()
+
+    # Check if the least recently used variant was removed to fit the limit
+    assert cache.get_path("aa01", "png").exists()
+    assert not cache.get_path("bb02", "png").exists()
+    assert cache.get_path("cc03", "png").exists()
+    assert cache.get_path("dd04", "png").exists()
+
+
+def test_variant_cache_eviction_low_water(tmp_path, monkeypatch):
+    cache = VariantCache(tmp_path, 1000)
+    scans = []
+    evict = cache.evict
+
+    def counted():
+        scans.append(1)
+        evict()
+
+    monkeypatch.setattr(cache, "evict", counted)
+    for i in range(200):
+        cache.get_or_create(f"{i:04x}", "png", write_bytes(b"x" * 10)).close()
+
+    # Check if the cache fits its limit, but is not scanned on every miss after exceeding it
+    # (once to find its initial size, then once per 100 bytes added - the space freed below the limit)
+    assert sum(path.stat().st_size for path in tmp_path.glob("*/*")) <= 1000
+    assert len(scans) == 11
+
+
+def test_variant_cache_coalescing(tmp_path):
+    cache = VariantCache(tmp_path, 1000)
+    calls = []
+    results = []
+
+    def build(output):
+        calls.append(1)
+        time.sleep(0.1)
+        output.write(b"variant")
+
+    def request():
+        with cache.get_or_create("abcd", "png", build) as variant:
+            results.append(variant.read())
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Check if concurrent misses built the variant only once
+    assert len(calls) == 1
+    assert results == [b"variant"] * 8
+    assert not cache._key_locks
+
+
+def test_parse_accept():
+    accepted = parse_accept("image/avif,image/webp, image/*;q=0.8 ,*/*; q=0.5,text/html;q=x,")
+
+    # Check if quality values are parsed, with the default of 1
+    assert accepted == {"image/avif": 1.0, "image/webp": 1.0, "image/*": 0.8, "*/*": 0.5, "text/html": 0.0}
+
+
+@pytest.mark.parametrize(
+    'accept, img_format, negotiated, expected', [
+        ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", "JPEG", ["avif", "webp"], "avif"),
+        ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", "PNG", ["webp", "avif"], "webp"),
+        ("image/webp,*/*", "JPEG", ["avif", "webp"], "webp"),
+        ("image/avif;q=0.5,image/webp;q=0.9", "JPEG", ["avif", "webp"], "webp"),
+        ("image/webp;q=0.5,image/jpeg", "JPEG", ["avif", "webp"], None),
+        ("image/webp;q=0.5,image/*;q=0.4", "JPEG", ["avif", "webp"], "webp"),
+        ("image/*,*/*", "JPEG", ["avif", "webp"], None),
+        ("", "JPEG", ["avif", "webp"], None),
+        ("image/avif,image/webp", "GIF", ["avif", "webp"], None),
+        ("image/avif,image/webp", "WEBP", ["avif", "webp"], None),
+        ("image/avif,image/webp", "JPEG", [], None),
+        ("image/avif,image/webp", "JPEG", ["jxl", "webp"], "webp"),
+    ]
+)
+def test_get_accepted_format(accept, img_format, negotiated, expected, settings, monkeypatch):
+    settings.IMAGES_NEGOTIATED_FORMATS = negotiated
+    # AVIF is supported only by some builds of Pillow
+    monkeypatch.setattr("apps.images.variants.is_encodable", lambda negotiated_format: True)
+
+    # Check if the best explicitly accepted format is chosen, only if it's preferred over the stored one
+    assert get_accepted_format(accept, img_format) == expected
+
+
+def test_get_accepted_format_not_encodable(settings, monkeypatch):
+    settings.IMAGES_NEGOTIATED_FORMATS = ["avif", "webp"]
+    monkeypatch.setattr("apps.images.variants.is_encodable", lambda negotiated_format: negotiated_format != "AVIF")
+
+    # Check if formats, which the installed Pillow can't encode, are skipped
+    assert get_accepted_format("image/avif,image/webp", "JPEG") == "webp"
+
+
+def test_get_negotiated_variant(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.png")
+    PillowImage.new("RGB", (300, 200), "red").save(path)
+    calls = []
+    original_open = PillowImage.open
+
+    def open_image(*args, **kwargs):
+        calls.append(args[0])
+        return original_open(*args, **kwargs)
+
+    monkeypatch.setattr(PillowImage, "open", open_image)
+    first = get_negotiated_variant(path, "webp")
+    second = get_negotiated_variant(path, "webp")
+
+    # Check if the variant is built once, and kept next to the stored file
+    assert first == second == path + ".webp"
+    assert calls == [path]
+    with original_open(first) as img:
+        assert img.format == "WEBP"
+        assert img.size == (300, 200)
+    assert sorted(os.listdir(tmp_path)) == ["test.png", "test.png.webp"]
+
+
+def test_get_negotiated_variant_not_smaller(tmp_path):
+    path = str(tmp_path / "test.jpg")
+    PillowImage.new("RGB", (1, 1), "red").save(path, quality=1)
+    with open(path + ".webp", "wb") as variant:
+        variant.write(b"x" * (os.path.getsize(path) + 1))
+
+    # Check if the stored file is sent, when the variant is not smaller
+    assert get_negotiated_variant(path, "webp") is None
+
+
+def test_get_negotiated_variant_metadata(tmp_path):
+    path = str(tmp_path / "test.jpg")
+    exif = PillowImage.Exif()
+    # Rotated by 90 degrees clockwise, like photos taken with a camera held upright
+    exif[ExifTags.Base.Orientation] = 6
+    exif[ExifTags.Base.Make] = "Camera"
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    PillowImage.new("RGB", (300, 200), "red").save(path, exif=exif, icc_profile=icc_profile)
+
+    variant_path = get_negotiated_variant(path, "webp")
+
+    # Check if the variant is stored upright, with the rest of the metadata kept
+    with PillowImage.open(variant_path) as img:
+        assert img.size == (200, 300)
+        assert img.info["icc_profile"] == icc_profile
+        assert ExifTags.Base.Orientation not in img.getexif()
+        assert img.getexif()[ExifTags.Base.Make] == "Camera"
+
+
+def test_get_negotiated_file_broken(tmp_path, settings):
+    settings.IMAGES_NEGOTIATED_FORMATS = ["webp"]
+    path = str(tmp_path / "test.jpg")
+    with open(path, "wb") as file:
+        file.write(b"not an image")
+
+    # Check if the stored file is sent, when the variant can't be built
+    assert get_negotiated_file(path, "image/webp") == (path, None)
+    assert os.listdir(tmp_path) == ["test.jpg"]
+
+
+def test_get_negotiated_file_busy(tmp_path, settings, monkeypatch):
+    settings.IMAGES_NEGOTIATED_FORMATS = ["webp"]
+    path = str(tmp_path / "test.png")
+    PillowImage.new("RGB", (300, 200), "red").save(path)
+
+    def get_busy_variant(*args):
+        raise ResizeCapacityError(1)
+
+    monkeypatch.setattr("apps.images.variants.get_negotiated_variant", get_busy_variant)
+
+    # Check if the stored file is sent, when the variant can't be built at the moment
+    assert get_negotiated_file(path, "image/webp") == (path, None)
@@ -35,3 +35,38 @@ def test_single_image_view_get_not_found(image_id, api_client):
     assert response.data == {
         "error": f"Image with id.{image_id} not found"
     }
+
+
+@pytest.mark.django_db
+def test_single_image_view_get_not_modified(api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    url = reverse('single_image_view', kwargs={'image_id': image.id})
+
+    response = api_client.get(url)
+    etag = response["ETag"]
+    not_modified = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    not_modified_since = api_client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+
+    # Check if validators are returned, and unchanged objects are not sent again
+    assert response.status_code == 200
+    assert etag.startswith('"')
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified["ETag"] == etag
+    assert not_modified_since.status_code == 304
+
+
+@pytest.mark.django_db
+def test_single_image_view_get_modified(api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    url = reverse('single_image_view', kwargs={'image_id': image.id})
+    etag = api_client.get(url)["ETag"]
+
+    image.title = "changed"
+    image.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Check if the changed object is sent again, with a new ETag
+    assert response.status_code == 200
+    assert response.data.get("title") == "changed"
+    assert response["ETag"] != etag
@@ -2,7 +2,7 @@ import pytest
 from django.urls import reverse
 from django.utils.http import urlencode
 
-from .conftest import test_simple_images
+from .conftest import test_simple_images, is_sharded_image_url
 
 
 @pytest.mark.django_db
@@ -35,7 +35,7 @@ def test_images_view_get_list(count, api_client, create_images):
         linked = linked[0] if len(linked) == 1 else None
 
         assert linked is not None
-        assert f"{template['file']}.{template['extension']}" in linked.get("url", "")
+        assert is_sharded_image_url(linked.get("url", ""), template["extension"])
         assert linked.get("width") == template["width"]
         assert linked.get("height") == template["height"]
 
@@ -60,3 +60,183 @@ def test_images_view_get_list_title_search(
     # Check if the search gave us expected amount of items
     assert response.status_code == 200
     assert len(response.data) == expected_count
+
+
+def collect_pages(api_client, url):
+    pages = []
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == 200
+        pages.append(response.data["results"])
+        url = response.data["next"]
+    return pages
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'limit, expected_page_sizes', [
+        (1, [1, 1, 1, 1, 1]),
+        (2, [2, 2, 1]),
+        (5, [5]),
+        (10, [5]),
+    ]
+)
+def test_images_view_get_list_paginated(
+        limit, expected_page_sizes, api_client, create_images
+):
+    images = create_images(test_simple_images)
+    url = reverse('images_view') + '?' + urlencode({'limit': limit})
+
+    pages = collect_pages(api_client, url)
+
+    # Check if pages have expected sizes, and together contain all objects ordered by id
+    assert [len(page) for page in pages] == expected_page_sizes
+    assert [item["id"] for page in pages for item in page] == sorted(image.id for image in images)
+
+
+@pytest.mark.django_db
+def test_images_view_get_list_paginated_title_search(api_client, create_images):
+    create_images(test_simple_images)
+    url = reverse('images_view') + '?' + urlencode({'title': 'a', 'limit': 1})
+
+    pages = collect_pages(api_client, url)
+
+    # Check if the filter is kept between pages
+    assert [item["title"] for page in pages for item in page] == ["example", "another"]
+
+
+@pytest.mark.django_db
+def test_images_view_get_list_paginated_max_page_size(api_client, create_images, settings):
+    settings.IMAGES_MAX_PAGE_SIZE = 3
+    create_images(test_simple_images)
+    url = reverse('images_view') + '?' + urlencode({'limit': 1000})
+
+    response = api_client.get(url)
+
+    # Check if the page size has been capped
+    assert response.status_code == 200
+    assert len(response.data["results"]) == 3
+    assert response.data["next"]
+    assert response.data["previous"] is None
+
+
+@pytest.mark.django_db
+def test_images_view_get_list_paginated_invalid_cursor(api_client):
+    url = reverse('images_view') + '?' + urlencode({'cursor': 'not-a-cursor'})
+
+    response = api_client.get(url)
+
+    # Check if error occurred
+    assert response.status_code == 404
+    assert response.data == {"error": "Invalid cursor"}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'chunk_size, title', [
+        (1, None),
+        (2, None),
+        (1000, None),
+        (2, 'e'),
+        (2, 'Non-existing'),
+    ]
+)
+def test_images_view_get_list_stream(chunk_size, title, api_client, create_images, settings):
+    settings.IMAGES_STREAM_CHUNK_SIZE = chunk_size
+    create_images(test_simple_images)
+    params = {'title': title} if title else {}
+    url = reverse('images_view') + '?' + urlencode(params)
+
+    expected = api_client.get(url)
+    response = api_client.get(url + '&' + urlencode({'stream': 'true'}))
+
+    # Check if the streamed content is the same as the regular response
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "application/json"
+    assert b"".join(response.streaming_content) == expected.content
+
+
+@pytest.mark.django_db
+def test_images_view_get_list_not_modified(api_client, create_images):
+    create_images(test_simple_images[:2])
+    url = reverse('images_view')
+
+    response = api_client.get(url)
+    not_modified = api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    other_query = api_client.get(url + '?' + urlencode({'title': 'a'}))
+
+    # Check if unchanged lists are not sent again, and ETags depend on the query
+    assert response.status_code == 200
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == response["ETag"]
+    assert other_query["ETag"] != response["ETag"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'change', ['create', 'update', 'delete']
+)
+def test_images_view_get_list_modified(change, api_client, create_images):
+    images = create_images(test_simple_images[:2])
+    url = reverse('images_view')
+    etag = api_client.get(url)["ETag"]
+
+    if change == 'create':
+        create_images(test_simple_images[2:3])
+    elif change == 'update':
+        images[0].title = "changed"
+        images[0].save()
+    else:
+        images[0].image.delete(save=False)
+        images[0].delete()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Check if any change of the list makes it sent again
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'changed, page_changed', [(0, True), (1, True), (2, False), (4, False)]
+)
+def test_images_view_get_page_modified(changed, page_changed, api_client, create_images):
+    images = create_images(test_simple_images)
+    url = reverse('images_view') + '?' + urlencode({'limit': 2})
+    etag = api_client.get(url)["ETag"]
+
+    images[changed].title = "changed"
+    images[changed].save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Check if only changes of the page's own objects change its ETag
+    assert response.status_code == (200 if page_changed else 304)
+
+
+@pytest.mark.django_db
+def test_images_view_get_page_validators_cost(api_client, create_images, django_assert_max_num_queries):
+    create_images(test_simple_images)
+    url = reverse('images_view') + '?' + urlencode({'limit': 2})
+    etag = api_client.get(url)["ETag"]
+
+    with django_assert_max_num_queries(1) as queries:
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Check if the ETag of a page is computed from the page only, without aggregating the whole list
+    assert response.status_code == 304
+    assert "COUNT(" not in queries.captured_queries[0]["sql"].upper()
+    assert "LIMIT 3" in queries.captured_queries[0]["sql"].upper()
+
+
+@pytest.mark.django_db
+def test_images_view_get_stream_no_etag(api_client, create_images):
+    create_images(test_simple_images[:2])
+
+    response = api_client.get(reverse('images_view') + '?' + urlencode({'stream': 'true'}))
+    content = b"".join(response.streaming_content)
+
+    # Check if streamed lists are sent without validators, which would cost another pass over the list
+    assert response.status_code == 200
+    assert "ETag" not in response
+    assert content.startswith(b"[")
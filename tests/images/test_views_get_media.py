@@ -0,0 +1,189 @@
+import os
+
+import pytest
+from django.core.files import File
+from django.urls import reverse
+
+from apps.images.models import Image
+from apps.images.variants import get_negotiated_name
+
+from .conftest import test_simple_images
+
+
+def get_media(api_client, image, **headers):
+    return api_client.get(image.url, **headers)
+
+
+@pytest.mark.django_db
+def test_serve_media(api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    with open(image.image.path, "rb") as file:
+        content = file.read()
+
+    response = get_media(api_client, image)
+
+    # Check if the whole file is sent
+    assert response.status_code == 200
+    assert response["Content-Type"] == "image/png"
+    assert response["Accept-Ranges"] == "bytes"
+    assert int(response["Content-Length"]) == len(content)
+    assert b"".join(response.streaming_content) == content
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'original_name, expected_disposition', [
+        ("photo.png", 'inline; filename="photo.png"'),
+        ('my "best"\r\nphoto.png', 'inline; filename="my \\"best\\"photo.png"'),
+        ("zdjęcie 1.png", "inline; filename*=utf-8''zdj%C4%99cie%201.png"),
+    ]
+)
+def test_serve_media_original_name(original_name, expected_disposition, api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    image.original_name = original_name
+    image.save()
+
+    response = get_media(api_client, image)
+
+    # Check if the file is sent under its original name
+    assert response.status_code == 200
+    assert response["Content-Disposition"] == expected_disposition
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'header, expected_range', [
+        ("bytes=0-9", lambda size: (0, 9)),
+        ("bytes=10-", lambda size: (10, size - 1)),
+        ("bytes=-5", lambda size: (size - 5, size - 1)),
+        ("bytes=5-100000", lambda size: (5, size - 1)),
+    ]
+)
+def test_serve_media_range(header, expected_range, api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+    with open(image.image.path, "rb") as file:
+        content = file.read()
+    first, last = expected_range(len(content))
+
+    response = get_media(api_client, image, HTTP_RANGE=header)
+
+    # Check if only the requested range is sent
+    assert response.status_code == 206
+    assert response["Content-Type"] == "image/png"
+    assert response["Content-Length"] == str(last - first + 1)
+    assert response["Content-Range"] == f"bytes {first}-{last}/{len(content)}"
+    assert b"".join(response.streaming_content) == content[first:last + 1]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'header', ["bytes=100000-", "bytes=-0", "bytes=20-10"]
+)
+def test_serve_media_range_not_satisfiable(header, api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+
+    response = get_media(api_client, image, HTTP_RANGE=header)
+
+    # Check if error occurred
+    assert response.status_code == 416
+    assert response["Content-Range"].startswith("bytes */")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'accel, header, expected_prefix', [
+        ("x-accel-redirect", "X-Accel-Redirect", "/protected-media/images/"),
+        ("X-Sendfile", "X-Sendfile", "/"),
+    ]
+)
+def test_serve_media_accel(accel, header, expected_prefix, api_client, create_images, settings):
+    settings.IMAGES_MEDIA_ACCEL = accel
+    image = create_images(test_simple_images[:1])[0]
+
+    response = get_media(api_client, image)
+
+    # Check if sending is handed off to the proxy
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response[header].startswith(expected_prefix)
+    assert response[header].endswith(image.image.name.split("/")[-1])
+    assert response["Content-Type"] == "image/png"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name', ["images/missing.png", "uploads/test.png", "../settings.py"]
+)
+def test_serve_media_not_found(name, api_client):
+    response = api_client.get(reverse('media', kwargs={'name': name}))
+
+    # Check if files, which do not belong to an image object, are not served
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_serve_media_post_not_allowed(api_client, create_images):
+    image = create_images(test_simple_images[:1])[0]
+
+    response = api_client.post(image.url)
+
+    # Check if only safe methods are allowed
+    assert response.status_code == 405
+    assert Image.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_serve_media_rendition(api_client, create_image_file, remove_images_afterwards, settings):
+    settings.IMAGES_RENDITION_WIDTHS = [50]
+    create_image_file("photo.png", "PNG", 100, 60)
+    with open("photo.png", "rb") as test_file:
+        image = Image.create("", 0, 0, File(test_file))
+    os.remove("photo.png")
+    rendition = image.renditions.get()
+
+    response = get_media(api_client, rendition)
+
+    # Check if rendition's file is served, under a name derived from its image object's one
+    assert response.status_code == 200
+    assert response["Content-Disposition"] == 'inline; filename="photo_50w.png"'
+    with open(rendition.file.path, "rb") as file:
+        assert b"".join(response.streaming_content) == file.read()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'accept, expected_type, expected_filename', [
+        ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", "image/webp", "photo.webp"),
+        ("image/*,*/*;q=0.8", "image/png", "photo.png"),
+        ("", "image/png", "photo.png"),
+    ]
+)
+def test_serve_media_negotiated(accept, expected_type, expected_filename, api_client, create_images, settings):
+    settings.IMAGES_NEGOTIATED_FORMATS = ["webp"]
+    image = create_images(test_simple_images[:1])[0]
+    image.original_name = "photo.png"
+    image.save()
+
+    response = get_media(api_client, image, HTTP_ACCEPT=accept)
+    content = b"".join(response.streaming_content)
+
+    # Check if the format accepted by the client is sent, and caches are told it depends on the header
+    assert response.status_code == 200
+    assert response["Content-Type"] == expected_type
+    assert response["Content-Disposition"] == f'inline; filename="{expected_filename}"'
+    assert response["Vary"] == "Accept"
+    expected_name = get_negotiated_name(image.image.name, "webp") if expected_type == "image/webp" else image.image.name
+    with open(image.image.storage.path(expected_name), "rb") as file:
+        assert content == file.read()
+
+
+@pytest.mark.django_db
+def test_serve_media_not_negotiated(api_client, create_images, settings):
+    settings.IMAGES_NEGOTIATED_FORMATS = ["webp"]
+    image = create_images(test_simple_images[1:2])[0]
+
+    response = get_media(api_client, image, HTTP_ACCEPT="image/webp,*/*")
+
+    # Check if files in other formats (GIF) are sent as they are
+    assert response["Content-Type"] == "image/gif"
+    assert not response.has_header("Vary")
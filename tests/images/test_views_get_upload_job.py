@@ -0,0 +1,49 @@
+import pytest
+from django.urls import reverse
+
+from apps.images.jobs import process_upload_job
+
+
+@pytest.mark.django_db
+def test_upload_job_view_get_pending(api_client, create_upload_job, remove_upload_jobs_afterwards):
+    job = create_upload_job("test.png", "PNG", 100, 100)
+    url = reverse('upload_job_view', kwargs={'job_id': job.id})
+
+    response = api_client.get(url)
+
+    # Check if the job is pending, without an image
+    assert response.status_code == 200
+    assert response.data.get("id") == job.id
+    assert response.data.get("status") == "pending"
+    assert response.data.get("image") is None
+
+
+@pytest.mark.django_db
+def test_upload_job_view_get_done(
+        api_client, create_upload_job, remove_images_afterwards, remove_upload_jobs_afterwards
+):
+    job = create_upload_job("test.png", "PNG", 100, 100, 50, 0, "done")
+    process_upload_job(job.id)
+    job.refresh_from_db()
+    url = reverse('upload_job_view', kwargs={'job_id': job.id})
+
+    response = api_client.get(url)
+
+    # Check if the finished job contains created image object
+    assert response.status_code == 200
+    assert response.data.get("status") == "done"
+    assert response.data.get("error") == ""
+    assert response.data.get("image") == {
+        "id": job.image.id, "url": job.image.url, "title": "done", "width": 50, "height": 50,
+        "renditions": [], "srcset": f"{job.image.url} 50w"
+    }
+
+
+@pytest.mark.django_db
+def test_upload_job_view_get_not_found(api_client):
+    url = reverse('upload_job_view', kwargs={'job_id': 7})
+    response = api_client.get(url)
+
+    # Check if error occurred
+    assert response.status_code == 404
+    assert response.data == {"error": "Upload job with id.7 not found"}
@@ -0,0 +1,172 @@
+import os
+
+import pytest
+from PIL import Image as PillowImage
+from django.urls import reverse
+
+from apps.images.models import Image
+
+
+@pytest.fixture()
+def post_batch():
+    def inner_post_batch(api_client, files, **fields):
+        url = reverse('batch_images_view')
+        opened = [open(filename, "rb") for filename in files]
+        try:
+            response = api_client.post(url, {"image": opened, **fields}, format="multipart")
+        finally:
+            for file, filename in zip(opened, files):
+                file.close()
+                os.remove(filename)
+        return response
+
+    yield inner_post_batch
+
+
+@pytest.mark.django_db
+def test_batch_images_view_post(api_client, post_batch, create_image_file, remove_images_afterwards):
+    create_image_file("first.png", "PNG", 300, 200)
+    create_image_file("second.jpg", "JPEG", 576, 1224)
+    create_image_file("third.gif", "GIF", 120, 52)
+
+    response = post_batch(
+        api_client, ["first.png", "second.jpg", "third.gif"],
+        title=["one", "", "three"], width=[150, 0, 120], height=[0, 612, 52]
+    )
+    results = response.data["results"]
+
+    # Check if all images were created, and results are in input order
+    assert response.status_code == 201
+    assert [result["status"] for result in results] == [201, 201, 201]
+    assert [result["image"]["title"] for result in results] == ["one", "second", "three"]
+    assert [(result["image"]["width"], result["image"]["height"]) for result in results] == [
+        (150, 100), (288, 612), (120, 52)
+    ]
+    assert Image.objects.count() == 3
+    for result in results:
+        created = Image.objects.get(id=result["image"]["id"])
+        saved_image = PillowImage.open(created.image.path)
+        assert saved_image.size == (created.width, created.height)
+
+
+@pytest.mark.django_db
+def test_batch_images_view_post_partial_failure(
+        api_client, post_batch, create_image_file, remove_images_afterwards
+):
+    create_image_file("first.png", "PNG", 300, 200)
+    create_image_file("second.ico", "ICO", 100, 100)
+    create_image_file("third.png", "PNG", 100, 100)
+
+    response = post_batch(
+        api_client, ["first.png", "second.ico", "third.png"],
+        width=[100, 50, -1]
+    )
+    results = response.data["results"]
+
+    # Check if only the valid image was created, and errors are reported per item
+    assert response.status_code == 207
+    assert [result["status"] for result in results] == [201, 400, 400]
+    assert results[0]["image"]["width"] == 100
+    assert results[1]["error"] == 'File format "ico" is not supported'
+    assert results[2]["error"] == {"width": ["Ensure this value is greater than or equal to 0."]}
+    assert list(Image.objects.values_list("id", flat=True)) == [results[0]["image"]["id"]]
+
+
+@pytest.mark.django_db
+def test_batch_images_view_post_too_many_files(
+        api_client, post_batch, create_image_file, settings
+):
+    settings.IMAGES_BATCH_MAX_FILES = 1
+    create_image_file("first.png", "PNG", 10, 10)
+    create_image_file("second.png", "PNG", 10, 10)
+
+    response = post_batch(api_client, ["first.png", "second.png"])
+
+    # Check if error occurred
+    assert response.status_code == 400
+    assert response.data == {"error": "Too many files, at most 1 can be uploaded at once"}
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db
+def test_batch_images_view_post_no_image(api_client):
+    response = api_client.post(reverse('batch_images_view'), {"title": "test"}, format="multipart")
+
+    # Check if error occurred
+    assert response.status_code == 400
+    assert response.data == {'error': {'image': ['This field is required.']}}
+
+
+@pytest.mark.django_db
+def test_batch_images_view_post_same_content(
+        api_client, post_batch, create_image_file, remove_images_afterwards
+):
+    create_image_file("stored.png", "PNG", 40, 20)
+    with open("stored.png", "rb") as stored_file:
+        content = stored_file.read()
+    for filename in ("first.png", "second.png", "third.png"):
+        with open(filename, "wb") as file:
+            file.write(content)
+    response = post_batch(api_client, ["stored.png"], width=[20])
+    stored_name = Image.objects.get().image.name
+
+    response = post_batch(
+        api_client, ["first.png", "second.png", "third.png"],
+        title=["one", "two", "three"], width=[20, 10, 10]
+    )
+    results = response.data["results"]
+
+    # Check if duplicates share files, both with stored images and within the batch
+    assert response.status_code == 201
+    assert [result["status"] for result in results] == [201, 201, 201]
+    assert [result["image"]["title"] for result in results] == ["one", "two", "three"]
+    first, second, third = [Image.objects.get(id=result["image"]["id"]) for result in results]
+    assert first.image.name == stored_name
+    assert second.image.name == third.image.name != stored_name
+    assert (second.width, second.height) == (third.width, third.height) == (10, 5)
+
+
+@pytest.mark.django_db
+def test_batch_images_view_post_too_many_pixels(
+        api_client, post_batch, create_image_file, create_png_header, remove_images_afterwards
+):
+    create_image_file("first.png", "PNG", 30, 20)
+    create_png_header("bomb.png", 8000, 8000)
+
+    response = post_batch(api_client, ["first.png", "bomb.png"])
+    results = response.data["results"]
+
+    # Check if only the image with too many pixels is rejected
+    assert response.status_code == 207
+    assert [result["status"] for result in results] == [201, 413]
+    assert list(results[1]["error"]) == ["image"]
+    assert Image.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_batch_images_view_post_renditions(
+        api_client, post_batch, create_image_file, remove_images_afterwards, settings
+):
+    settings.IMAGES_RENDITION_WIDTHS = [20, 40]
+    create_image_file("stored.png", "PNG", 100, 50)
+    with open("stored.png", "rb") as stored_file:
+        content = stored_file.read()
+    for filename in ("first.png", "second.png", "third.png"):
+        with open(filename, "wb") as file:
+            file.write(content)
+    post_batch(api_client, ["stored.png"], width=[80])
+    stored = Image.objects.get()
+
+    response = post_batch(api_client, ["first.png", "second.png", "third.png"], width=[60, 60, 80])
+    results = response.data["results"]
+
+    # Check if renditions are created for every image, and shared by duplicates
+    assert [result["status"] for result in results] == [201, 201, 201]
+    assert [
+        [(rendition["width"], rendition["height"]) for rendition in result["image"]["renditions"]]
+        for result in results
+    ] == [[(20, 10), (40, 20)]] * 3
+    first, second, third = [Image.objects.get(id=result["image"]["id"]) for result in results]
+    names = [[rendition.file.name for rendition in image.renditions.all()] for image in (first, second, third, stored)]
+    assert names[0] == names[1] != names[2] == names[3]
+    assert results[0]["image"]["srcset"].endswith(f"{first.url} 60w")
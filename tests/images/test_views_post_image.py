@@ -1,12 +1,17 @@
+import hashlib
+import os
+
 import pytest
 from PIL import Image as PillowImage
 from django.db.models import Q
 from django.http import QueryDict
 from django.urls import reverse
 
-from apps.images.models import Image
+from apps.images.models import Image, UploadJob
 from apps.images.views import ImagesView
 
+from .conftest import is_sharded_image_url
+
 
 @pytest.mark.django_db
 @pytest.mark.parametrize(
@@ -37,7 +42,7 @@ def test_images_view_post(
     assert response.data.get("title") == title
     assert response.data.get("width") == width
     assert response.data.get("height") == height
-    assert filename in response.data.get("url")
+    assert is_sharded_image_url(response.data.get("url"), extension)
 
     # Check if saved file is the same
     assert saved_image
@@ -199,3 +204,97 @@ def test_images_view_create_image_query(
 
     # Check if query is the same as expected
     assert query == expected
+
+
+@pytest.mark.django_db
+def test_images_view_post_async(
+        api_client, create_image_file, remove_upload_jobs_afterwards,
+        django_capture_on_commit_callbacks
+):
+    create_image_file("test.png", "PNG", 300, 200)
+    url = reverse('images_view') + "?async=true"
+
+    with open("test.png", "rb") as test_file, django_capture_on_commit_callbacks() as callbacks:
+        response = api_client.post(
+            url, {"title": "test", "width": 150, "image": test_file}, format="multipart"
+        )
+    os.remove("test.png")
+    job = UploadJob.objects.get(id=response.data.get("id"))
+
+    # Check if the upload has been queued, and no image object exists yet
+    assert response.status_code == 202
+    assert response.data.get("status") == "pending"
+    assert response["Location"].endswith(reverse('upload_job_view', kwargs={'job_id': job.id}))
+    assert len(callbacks) == 1
+    assert (job.title, job.width, job.height, job.filename) == ("test", 150, 0, "test.png")
+    assert not Image.objects.exists()
+    # Check if the hash of the upload, computed while it was received, is kept for the worker
+    with job.upload.open("rb") as upload:
+        assert job.content_hash == hashlib.sha256(upload.read()).hexdigest()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('max_memory_size', [2621440, 0])
+def test_images_view_post_content_hash(
+        max_memory_size, api_client, post_image, create_image_file, remove_images_afterwards, settings
+):
+    # Uploads larger than the limit are written to temporary files
+    settings.FILE_UPLOAD_MAX_MEMORY_SIZE = max_memory_size
+    create_image_file("test.png", "PNG", 300, 200)
+    with open("test.png", "rb") as test_file:
+        expected = hashlib.sha256(test_file.read()).hexdigest()
+
+    response = post_image(api_client, "test", "test.png", 0, 0)
+
+    # Check if the hash of the uploaded content was computed by the upload handler
+    assert response.status_code == 201
+    assert Image.objects.get(id=response.data.get("id")).content_hash == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('width, height', [(8000, 8000), (100000, 100000)])
+def test_images_view_post_too_many_pixels(
+        width, height, api_client, post_image, create_png_header, monkeypatch
+):
+    def load(*args):
+        raise AssertionError("Pixels decoded")
+
+    monkeypatch.setattr(PillowImage.Image, "load", load)
+    create_png_header("bomb.png", width, height)
+    response = post_image(api_client, "bomb", "bomb.png", 100, 0)
+
+    # Check if the image is rejected, without decoding it
+    assert response.status_code == 413
+    assert list(response.data["error"]) == ["image"]
+    assert "pixels" in response.data["error"]["image"][0]
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('max_memory_size', [2621440, 0])
+def test_images_view_post_file_too_large(max_memory_size, api_client, post_image, create_image_file, settings):
+    # Data of the file is dropped by either upload handler, once it exceeds the limit
+    settings.FILE_UPLOAD_MAX_MEMORY_SIZE = max_memory_size
+    settings.IMAGES_MAX_UPLOAD_SIZE = 100
+    create_image_file("test.bmp", "BMP", 20, 20)
+
+    response = post_image(api_client, "test", "test.bmp", 0, 0)
+
+    # Check if the file is rejected
+    assert response.status_code == 413
+    assert response.data["error"]["image"][0].startswith("File is too large")
+    assert not Image.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('width, height', [(10000, 0), (0, 10000), (1000, 0)])
+def test_images_view_post_output_too_large(width, height, api_client, post_image, create_image_file):
+    # Tall image, whose height grows past the limit with width of 1000
+    create_image_file("test.png", "PNG", 10, 100)
+
+    response = post_image(api_client, "test", "test.png", width, height)
+
+    # Check if the requested size is rejected
+    assert response.status_code == 400
+    assert "Resulting size" in response.data["error"]["__all__"][0]
+    assert not Image.objects.exists()
@@ -0,0 +1,140 @@
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image as PillowImage
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .conftest import test_simple_images
+
+
+def get_rendered(api_client, image_id, **params):
+    url = reverse('render_image_view', kwargs={'image_id': image_id}) + '?' + urlencode(params)
+    return api_client.get(url)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params, expected_width, expected_height, expected_format', [
+        ({}, 300, 200, "PNG"),
+        ({"w": 150}, 150, 100, "PNG"),
+        ({"h": 50}, 75, 50, "PNG"),
+        ({"w": 30, "h": 40}, 30, 40, "PNG"),
+        ({"w": 150, "format": "jpg"}, 150, 100, "JPEG"),
+        ({"format": "webp"}, 300, 200, "WEBP"),
+    ]
+)
+def test_render_image_view(
+        params, expected_width, expected_height, expected_format,
+        api_client, create_images, variant_cache_dir
+):
+    image = create_images(test_simple_images[:1])[0]
+
+    response = get_rendered(api_client, image.id, **params)
+    rendered = PillowImage.open(BytesIO(b"".join(response.streaming_content)))
+
+    # Check if the variant matches requested parameters
+    assert response.status_code == 200
+    assert response["Content-Type"] == PillowImage.MIME[expected_format]
+    assert rendered.format == expected_format
+    assert rendered.size == (expected_width, expected_height)
+
+
+@pytest.mark.django_db
+def test_render_image_view_cached(api_client, create_images, variant_cache_dir):
+    image = create_images(test_simple_images[:1])[0]
+
+    first = b"".join(get_rendered(api_client, image.id, w=100).streaming_content)
+    second = b"".join(get_rendered(api_client, image.id, w=100).streaming_content)
+    get_rendered(api_client, image.id, w=120)
+
+    # Check if the same variant was served from the cache, and another one was added
+    assert first == second
+    assert len(list(variant_cache_dir.glob("*/*"))) == 2
+
+
+@pytest.mark.django_db
+def test_render_image_view_encoder_profile(api_client, create_images, variant_cache_dir, settings):
+    image = create_images(test_simple_images[:1])[0]
+
+    settings.IMAGES_ENCODER_PROFILES = {"JPEG": {"quality": 90}}
+    first = b"".join(get_rendered(api_client, image.id, format="jpg").streaming_content)
+    settings.IMAGES_ENCODER_PROFILES = {"JPEG": {"quality": 10}}
+    second = b"".join(get_rendered(api_client, image.id, format="jpg").streaming_content)
+
+    # Check if the variant was built again, with the changed profile
+    assert first != second
+    assert len(list(variant_cache_dir.glob("*/*"))) == 2
+
+
+@pytest.mark.django_db
+def test_render_image_view_not_found(api_client, variant_cache_dir):
+    response = get_rendered(api_client, 12, w=100)
+
+    # Check if error occurred
+    assert response.status_code == 404
+    assert response.data == {"error": "Image with id.12 not found"}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'params, expected_error', [
+        ({"w": -1}, {'w': ['Ensure this value is greater than or equal to 0.']}),
+        ({"h": 100000}, {'h': ['Ensure this value is less than or equal to 8192.']}),
+        ({"format": "ico"}, {'format': ['Select a valid choice. ico is not one of the available choices.']}),
+    ]
+)
+def test_render_image_view_invalid_parameters(
+        params, expected_error, api_client, create_images, variant_cache_dir
+):
+    image = create_images(test_simple_images[:1])[0]
+
+    response = get_rendered(api_client, image.id, **params)
+
+    # Check if error occurred
+    assert response.status_code == 400
+    assert response.data == {"error": expected_error}
+
+
+@pytest.mark.django_db
+def test_render_image_view_output_size_limit(api_client, create_images, variant_cache_dir, settings):
+    settings.IMAGES_MAX_OUTPUT_SIZE = 50
+    image = create_images(test_simple_images[:1])[0]
+
+    response = get_rendered(api_client, image.id, w=100)
+
+    # Check if the requested size is limited by the setting
+    assert response.status_code == 400
+    assert response.data == {"error": {'w': ['Ensure this value is less than or equal to 50.']}}
+
+
+@pytest.mark.django_db
+def test_render_image_view_unsupported_stored_format(api_client, create_images, variant_cache_dir):
+    image = create_images([{**test_simple_images[0], "extension": "ico", "format": "ICO"}])[0]
+
+    response = get_rendered(api_client, image.id, w=100)
+    converted = get_rendered(api_client, image.id, w=100, format="png")
+
+    # Check if the stored format, which can not be kept, is rejected, unless another one is requested
+    assert response.status_code == 400
+    assert converted.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'content, expected_status', [(None, 404), (b"not an image", 400), (b"\x89PNG\r\n\x1a\ntruncated", 400)]
+)
+def test_render_image_view_broken_file(content, expected_status, api_client, create_images, variant_cache_dir):
+    image = create_images(test_simple_images[:1])[0]
+    if content is None:
+        os.remove(image.image.path)
+    else:
+        with open(image.image.path, "wb") as file:
+            file.write(content)
+
+    response = get_rendered(api_client, image.id, w=100)
+
+    # Check if a missing or corrupt stored file is reported, instead of failing the request
+    assert response.status_code == expected_status
+    assert "error" in response.data
@@ -0,0 +1,189 @@
+import gc
+import threading
+import time
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.utils import ConnectionHandler
+from django.urls import reverse
+
+from apps.db.pool import PoolTimeout, close_pools, get_pool_stats
+
+
+@pytest.fixture
+def pooled_connections(tmp_path, django_db_blocker):
+    # SQLite stands in for PostgreSQL, as the pool only uses the DB-API connections of the backend
+    connections = ConnectionHandler({
+        "default": {"ENGINE": "django.db.backends.dummy"},
+        "pooled": {
+            "ENGINE": "apps.db.sqlite3",
+            "NAME": str(tmp_path / "pooled.sqlite3"),
+            "CONN_HEALTH_CHECKS": True,
+            "POOL": {"SIZE": 2, "TIMEOUT": 0.5},
+        }
+    })
+    # The connections do not use the test database
+    with django_db_blocker.unblock():
+        yield connections
+        connections.close_all()
+    close_pools()
+
+
+def test_pool_reuses_connections(pooled_connections):
+    connection = pooled_connections["pooled"]
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE items (name TEXT)")
+        cursor.execute("INSERT INTO items VALUES ('first')")
+    raw_connection = connection.connection
+    connection.close()
+
+    # Check if a closed connection is returned to the pool, instead of being closed
+    stats = get_pool_stats()["pooled"]
+    assert stats["open"] == stats["idle"] == 1
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == stats["created"] == 1
+
+    other = pooled_connections.create_connection("pooled")
+    with other.cursor() as cursor:
+        cursor.execute("SELECT name FROM items")
+        rows = cursor.fetchall()
+
+    # Check if the next wrapper gets the same connection, in a usable state
+    assert other.connection is raw_connection
+    assert rows == [("first",)]
+    assert get_pool_stats()["pooled"]["created"] == 1
+    assert get_pool_stats()["pooled"]["checkouts"] == 2
+    other.close()
+
+
+def test_pool_size_limit(pooled_connections):
+    first, second, third = (pooled_connections.create_connection("pooled") for _ in range(3))
+    first.ensure_connection()
+    second.ensure_connection()
+
+    # Check if no more than "SIZE" connections are opened
+    with pytest.raises(PoolTimeout):
+        third.ensure_connection()
+    assert get_pool_stats()["pooled"]["timeouts"] == 1
+
+    raw_connection = first.connection
+    waiting = threading.Thread(target=third.ensure_connection)
+    waiting.start()
+    time.sleep(0.1)
+    first.close()
+    waiting.join()
+
+    # Check if a waiting checkout gets the returned connection
+    assert third.connection is raw_connection
+    stats = get_pool_stats()["pooled"]
+    assert stats["waits"] == 2
+    assert stats["created"] == 2
+    assert stats["in_use"] == 2
+    assert stats["max_wait_ms"] >= 100
+    second.close()
+    third.close()
+
+
+def test_pool_health_check(pooled_connections):
+    connection = pooled_connections["pooled"]
+    connection.ensure_connection()
+    raw_connection = connection.connection
+    connection.close()
+    # e.g. closed by the database server, while being idle
+    raw_connection.close()
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+    # Check if a broken idle connection is replaced
+    assert connection.connection is not raw_connection
+    assert get_pool_stats()["pooled"]["discarded"] == 1
+    assert get_pool_stats()["pooled"]["open"] == 1
+    connection.close()
+
+
+def test_pool_discards_connection_closed_in_transaction(pooled_connections, monkeypatch):
+    monkeypatch.setattr(transaction, "get_connection", lambda using: pooled_connections[using])
+    connection = pooled_connections["pooled"]
+    with transaction.atomic(using="pooled"):
+        connection.ensure_connection()
+        raw_connection = connection.connection
+        connection.close()
+
+    # Check if a connection closed inside an atomic block is not shared with other wrappers
+    other = pooled_connections.create_connection("pooled")
+    other.ensure_connection()
+    assert other.connection is not raw_connection
+    assert get_pool_stats()["pooled"]["discarded"] == 1
+    other.close()
+
+
+def test_pool_requests_in_threads(pooled_connections):
+    errors = []
+
+    def serve_request():
+        # Like a request handled in its own thread (e.g. by a thread-per-request server), which then exits
+        try:
+            with pooled_connections["pooled"].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            # Called by Django when the request finishes
+            pooled_connections["pooled"].close_if_unusable_or_obsolete()
+        except Exception as e:
+            errors.append(e)
+
+    for _ in range(5):
+        thread = threading.Thread(target=serve_request)
+        thread.start()
+        thread.join()
+
+    # Check if every request returned its connection, so the following ones did not wait for one
+    assert errors == []
+    stats = get_pool_stats()["pooled"]
+    assert stats["checkouts"] == 5
+    assert stats["open"] == stats["idle"] == 1
+    assert stats["timeouts"] == 0
+
+
+def test_pool_discards_connection_of_dropped_wrapper(pooled_connections):
+    connection = pooled_connections.create_connection("pooled")
+    connection.ensure_connection()
+    # e.g. of a thread, which exited without closing it
+    del connection
+    gc.collect()
+
+    # Check if the slot of the connection is freed
+    stats = get_pool_stats()["pooled"]
+    assert stats["open"] == stats["in_use"] == 0
+    assert stats["discarded"] == 1
+
+
+def test_pool_requires_no_conn_max_age(tmp_path):
+    connections = ConnectionHandler({
+        "default": {"ENGINE": "django.db.backends.dummy"},
+        "pooled": {
+            "ENGINE": "apps.db.sqlite3",
+            "NAME": str(tmp_path / "pooled.sqlite3"),
+            "CONN_MAX_AGE": 60,
+            "POOL": {"SIZE": 2},
+        }
+    })
+
+    # Check if persistent connections, which would keep their slots, are rejected
+    with pytest.raises(ImproperlyConfigured):
+        connections["pooled"]
+
+
+@pytest.mark.django_db
+def test_db_pool_stats_view(api_client, admin_user, pooled_connections):
+    connection = pooled_connections["pooled"]
+    connection.ensure_connection()
+    connection.close()
+
+    # Check if pool counters are only exposed to staff users
+    assert api_client.get(reverse('db_pool_stats_view')).status_code == 403
+    api_client.force_authenticate(admin_user)
+    response = api_client.get(reverse('db_pool_stats_view'))
+    assert response.status_code == 200
+    assert response.data["pooled"]["checkouts"] == 1
+    assert response.data["pooled"]["idle"] == 1
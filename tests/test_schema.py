@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from PythonTaskWojDra import schema
+
+
+@pytest.fixture
+def schema_dir(settings, monkeypatch, tmp_path):
+    settings.SCHEMA_DIR = str(tmp_path)
+    monkeypatch.setattr(schema, "_schema", None)
+    monkeypatch.setattr(schema, "_documents", {})
+    return tmp_path
+
+
+@pytest.fixture
+def count_generations(monkeypatch):
+    calls = []
+    generate_schema = schema.generate_schema
+
+    def counted():
+        calls.append(1)
+        return generate_schema()
+
+    monkeypatch.setattr(schema, "generate_schema", counted)
+    return calls
+
+
+@pytest.mark.parametrize(
+    'url, content_type', [
+        ("/swagger.json", "application/json"),
+        ("/swagger.yaml", "application/yaml"),
+        ("/?format=openapi", "application/openapi+json"),
+        ("/redoc/?format=openapi", "application/openapi+json"),
+    ]
+)
+def test_schema_view_get(url, content_type, api_client, schema_dir, count_generations):
+    responses = [api_client.get(url) for _ in range(3)]
+
+    # Check if the schema is generated only once and served with the same ETag
+    assert len(count_generations) == 1
+    for response in responses:
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith(content_type)
+        assert response["ETag"] == responses[0]["ETag"]
+        assert response.content == responses[0].content
+
+
+def test_schema_view_get_content(api_client, schema_dir):
+    response = api_client.get("/swagger.json")
+    document = json.loads(response.content)
+
+    # Check if the schema describes the API, without host taken from the request
+    assert document["info"]["title"] == "Python Task API"
+    assert reverse("images_view") in document["paths"]
+    assert "host" not in document
+
+
+def test_schema_view_get_not_modified(api_client, schema_dir):
+    etag = api_client.get("/swagger.json")["ETag"]
+    response = api_client.get("/swagger.json", HTTP_IF_NONE_MATCH=etag)
+
+    # Check if the schema is not sent again
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response["ETag"] == etag
+
+
+@pytest.mark.parametrize(
+    'url', ["/", "/swagger/", "/redoc/"]
+)
+def test_schema_view_get_ui(url, api_client, schema_dir, monkeypatch):
+    calls = []
+    get_schema = schema.schema_view.generator_class.get_schema
+
+    def counted(*args, **kwargs):
+        calls.append(1)
+        return get_schema(*args, **kwargs)
+
+    monkeypatch.setattr(schema.schema_view.generator_class, "get_schema", counted)
+    responses = [api_client.get(url) for _ in range(2)]
+
+    # Check if UI pages are rendered, without generating the schema
+    assert calls == []
+    for response in responses:
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/html")
+        assert b"Python Task API" in response.content
+
+
+def test_write_schema(api_client, schema_dir, count_generations):
+    call_command("write_schema")
+    files = {name: (schema_dir / name).read_bytes() for name in ("swagger.json", "swagger.yaml")}
+
+    # Check if written documents are served, without generating the schema
+    generations = len(count_generations)
+    assert api_client.get("/swagger.json").content == files["swagger.json"]
+    assert api_client.get("/swagger.yaml").content == files["swagger.yaml"]
+    assert len(count_generations) == generations
+
+
+def test_write_schema_up_to_date(schema_dir, count_generations):
+    call_command("write_schema")
+    call_command("write_schema")
+
+    # Check if documents are not regenerated, if the code has not changed
+    assert len(count_generations) == 1
+
+    call_command("write_schema", force=True)
+
+    # Check if documents are regenerated, if forced
+    assert len(count_generations) == 2
+
+
+def test_write_schema_outdated(api_client, schema_dir, count_generations):
+    call_command("write_schema")
+    (schema_dir / "swagger.json").write_text("{}")
+    (schema_dir / "swagger.fingerprint").write_text("outdated")
+
+    response = api_client.get("/swagger.json")
+
+    # Check if documents written from other code are ignored
+    assert json.loads(response.content) != {}
+    assert len(count_generations) == 2